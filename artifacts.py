@@ -0,0 +1,106 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from config import CONFIG
+import instrumentation as instr
+
+# create logger
+a_logger = logging.getLogger(__name__)
+a_logger.setLevel(logging.INFO)
+
+class ArtifactWriter(object):
+    '''
+    This class represents the writer of the plots and reports
+    generated by the bots, so they can be taken out of the decision
+    loop. Possible modes are:
+        sync: artifacts are written when they are submitted
+        async: artifacts are written by a background thread
+        none: artifacts are not written
+
+    Class variables
+    ---------------
+    mode: str, Optional
+          One of sync, async or none. Default: [images]artifacts or sync
+    executor: ThreadPoolExecutor
+              Single thread used in the async mode. Matplotlib is not
+              thread-safe, so all the artifacts are written by the same thread
+    futures: list
+             Pending artifacts in the async mode
+    '''
+    modes = ('sync', 'async', 'none')
+
+    def __init__(self, mode=None):
+        if mode is None:
+            mode = 'sync'
+            if CONFIG.has_option('images', 'artifacts'):
+                mode = CONFIG.get('images', 'artifacts')
+        if mode not in self.modes:
+            raise Exception("{0} is not a valid artifacts mode. Valid modes are: {1}".format(mode,
+                                                                                          ",".join(self.modes)))
+        self.mode = mode
+        self.executor = None
+        self.futures = []
+        if mode == 'async':
+            self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def submit(self, func, *args, **kwargs):
+        '''
+        Function to write an artifact
+
+        Parameters
+        ----------
+        func : function, Required
+               Function that writes the artifact
+        *args, **kwargs : passed to 'func'
+        '''
+        if self.mode == 'none':
+            return
+        if self.mode == 'sync':
+            self._write(func, *args, **kwargs)
+            return
+        self.futures = [f for f in self.futures if not f.done() or self._check(f)]
+        self.futures.append(self.executor.submit(self._write, func, *args, **kwargs))
+
+    def _write(self, func, *args, **kwargs):
+        with instr.span("artifact.{0}".format(getattr(func, '__name__', 'func'))):
+            func(*args, **kwargs)
+
+    def write_text(self, outfile, text):
+        '''
+        Function to write 'text' to 'outfile'. 'text' can be a
+        function returning the text, so it is only generated if needed
+        '''
+        self.submit(write_text, outfile, text)
+
+    def _check(self, future):
+        exc = future.exception()
+        if exc is not None:
+            a_logger.error("Artifact could not be written: {0}".format(exc))
+        return False
+
+    def close(self):
+        '''
+        Function to wait for the pending artifacts
+        '''
+        if self.executor is None:
+            return
+        for f in self.futures:
+            self._check(f)
+        self.futures = []
+        self.executor.shutdown(wait=True)
+        self.executor = None
+
+def write_text(outfile, text):
+    '''
+    Function to write 'text' to 'outfile'
+
+    Parameters
+    ----------
+    outfile : str, Required
+    text : str or function returning a str, Required
+    '''
+    if callable(text):
+        text = text()
+    f = open(outfile, 'w')
+    f.write(text)
+    f.close()
@@ -0,0 +1,379 @@
+'''
+Run TradeBot over a grid of (pair, timeframe, start, end) jobs
+using a pool of processes
+
+Usage: python batch_runner.py --pairs AUD_USD,EUR_GBP --timeframes D,H4
+                              --start '2018-01-01 22:00:00'
+                              --end '2019-01-01 22:00:00' --workers 4
+'''
+import logging
+import argparse
+import json
+import time
+import traceback
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from oanda.connect import Connect
+from config import CONFIG, config_to_dict, reset_config
+from candle_cache import CandleCache
+import resample
+from utils import periodToDelta
+from trade_bot import TradeBot, default_bulk
+from trade_records import TradeSink
+from checkpoint import Checkpoint, run_key
+import instrumentation as instr
+
+# create logger
+br_logger = logging.getLogger(__name__)
+br_logger.setLevel(logging.INFO)
+
+Job = namedtuple('Job', ['pair', 'timeframe', 'start', 'end', 'overrides', 'shard'])
+Job.__new__.__defaults__ = (None, None)
+
+class JobResult(object):
+    '''
+    This class represents the result of running one Job
+
+    Class variables
+    ---------------
+    job: Job, Required
+    tlist: list
+           List with the TradeRecord objects of the trades taken or None
+    elapsed: float
+             Seconds taken by the job
+    error: str
+           Traceback if the job failed, None otherwise
+    skipped: Bool
+             True if the job was not run because it had already finished
+    '''
+    def __init__(self, job, tlist=None, elapsed=None, error=None, skipped=False):
+        self.job = job
+        self.tlist = tlist
+        self.elapsed = elapsed
+        self.error = error
+        self.skipped = skipped
+
+    def summary(self):
+        '''
+        Returns
+        -------
+        dict with a summary of this result that can be serialized to JSON
+        '''
+        return {'pair': self.job.pair,
+                'timeframe': self.job.timeframe,
+                'start': self.job.start,
+                'end': self.job.end,
+                'overrides': self.job.overrides,
+                'shard': self.job.shard,
+                'ntrades': 0 if self.tlist is None else len(self.tlist),
+                'elapsed': self.elapsed,
+                'error': self.error,
+                'skipped': self.skipped}
+
+def make_grid(pairs, timeframes, start, end):
+    '''
+    Function to create the list of Jobs for every
+    combination of pair and timeframe
+
+    Parameters
+    ----------
+    pairs : list, Required
+            List of currency pairs. i.e. ['AUD_USD', 'EUR_GBP']
+    timeframes : list, Required
+                 List of timeframes. i.e. ['D', 'H4']
+    start : str, Required
+            Start of each job. i.e. '2018-01-01 22:00:00'
+    end : str, Required
+          End of each job. i.e. '2019-01-01 22:00:00'
+
+    Returns
+    -------
+    list of Job
+    '''
+    return [Job(pair=p, timeframe=tf, start=start, end=end)
+            for p in pairs for tf in timeframes]
+
+def apply_overrides(settings, overrides):
+    '''
+    Function to get a copy of 'settings' with 'overrides' applied
+
+    Parameters
+    ----------
+    settings : dict, Required
+               Dict of dicts as returned by config_to_dict
+    overrides : dict, Optional
+                Dict with (section, option) tuples as keys.
+                i.e. {('trade_bot', 'th'): '0.5'}
+
+    Returns
+    -------
+    dict of dicts
+    '''
+    new = {s: dict(opts) for s, opts in settings.items()}
+    for (section, option), value in (overrides or {}).items():
+        # option names are lower case in CONFIG
+        new.setdefault(section, {})[option.lower()] = str(value)
+    return new
+
+def run_job(job, settings, SR_memo=None):
+    '''
+    Function to run TradeBot for a Job. CONFIG is reset to 'settings'
+    plus the Job overrides before running, so jobs executed by the
+    same worker do not see the settings of previous jobs
+
+    Parameters
+    ----------
+    job : Job, Required
+    settings : dict, Required
+               Dict of dicts as returned by config_to_dict
+    SR_memo : dict, Optional
+              Passed to TradeBot to share the HAreaLists between jobs
+
+    Returns
+    -------
+    JobResult object
+    '''
+    reset_config(apply_overrides(settings, job.overrides))
+    t0 = time.perf_counter()
+    try:
+        tb = TradeBot(pair=job.pair,
+                      timeframe=job.timeframe,
+                      start=job.start,
+                      end=job.end,
+                      SR_memo=SR_memo)
+        # compact records are sent back to the parent process
+        # instead of the Trades with their S/R areas and candles
+        sink = tb.run(sink=TradeSink(keep_SR=False), resume=True, shard=job.shard)
+    except Exception:
+        return JobResult(job, elapsed=time.perf_counter()-t0, error=traceback.format_exc())
+    finally:
+        # the stream is not left open in the worker if the job failed
+        instr.close()
+    return JobResult(job, tlist=sink.records, elapsed=time.perf_counter()-t0)
+
+def is_done(job, settings):
+    '''
+    Function to check if a Job has already finished. This is only
+    known if [trade_bot]checkpoint_dir is defined (see checkpoint.py)
+
+    Parameters
+    ----------
+    job : Job, Required
+    settings : dict, Required
+               Dict of dicts as returned by config_to_dict
+
+    Returns
+    -------
+    bool
+    '''
+    settings = apply_overrides(settings, job.overrides)
+    ckpt_dir = settings.get('trade_bot', {}).get('checkpoint_dir')
+    if ckpt_dir is None or job.shard is not None:
+        return False
+    # 'run_job' runs TradeBot with the default 'bulk' and a TradeSink
+    key = run_key(job.pair, job.timeframe, job.start, job.end, settings=settings,
+                  bulk=default_bulk(job.timeframe), with_sink=True)
+    return Checkpoint(ckpt_dir, key).is_done()
+
+def prefetch(jobs):
+    '''
+    Function to fill the candle cache for each of the pairs and
+    timeframes in 'jobs' before dispatching them, so the workers
+    share the same memory-mapped candles. If [general]base_granularity
+    is defined, then only the candles of that granularity are fetched.
+    This does nothing if [general]cache_dir is not defined
+
+    Parameters
+    ----------
+    jobs : list of Job, Required
+    '''
+    if not CONFIG.has_option('general', 'cache_dir'):
+        return
+
+    ser_dir = None
+    if CONFIG.has_option('general', 'ser_data_dir'):
+        ser_dir = CONFIG.get('general', 'ser_data_dir')
+    ranges = {}
+    for job in jobs:
+        period_range = (job.overrides or {}).get(('trade_bot', 'period_range'),
+                                                 CONFIG.getint('trade_bot', 'period_range'))
+        delta_period = periodToDelta(int(period_range), job.timeframe)
+        start = datetime.strptime(job.start, '%Y-%m-%d %H:%M:%S') - delta_period
+        end = datetime.strptime(job.end, '%Y-%m-%d %H:%M:%S')
+        key = (job.pair, job.timeframe)
+        base = resample.base_granularity(job.timeframe)
+        if base is not None:
+            start, end = resample.base_range(start, end, job.timeframe, base)
+            key = (job.pair, base)
+        if key in ranges:
+            start = min(start, ranges[key][0])
+            end = max(end, ranges[key][1])
+        ranges[key] = (start, end)
+    for (pair, timeframe), (start, end) in ranges.items():
+        conn = Connect(instrument=pair, granularity=timeframe)
+        CandleCache(CONFIG.get('general', 'cache_dir'), pair, timeframe).get(conn, start, end,
+                                                                              ser_dir=ser_dir)
+
+def run_batch(jobs, workers=None, settings=None, prefetch_candles=True, skip_done=True):
+    '''
+    Function to run a list of Jobs in a pool of processes
+
+    Parameters
+    ----------
+    jobs : list of Job, Required
+    workers : int, Optional
+              Number of processes. Default: number of CPUs
+    settings : dict, Optional
+               Dict of dicts with the settings used by every job.
+               Default: the current CONFIG
+    prefetch_candles : Bool
+                       If True, then the candle cache is filled before
+                       running the jobs. Default: True
+    skip_done : Bool
+                If True, then the jobs that have already finished are
+                not run again and the unfinished ones are resumed from
+                their last checkpoint. Default: True
+
+    Returns
+    -------
+    list of JobResult objects in the same order as 'jobs'
+    '''
+    settings = settings or config_to_dict()
+    results = [None] * len(jobs)
+    pending = []
+    for ix, job in enumerate(jobs):
+        if skip_done is True and is_done(job, settings):
+            br_logger.info("Job {0} already finished. Skipping...".format(job))
+            results[ix] = JobResult(job, skipped=True)
+        else:
+            pending.append(ix)
+    if prefetch_candles is True:
+        prefetch([jobs[ix] for ix in pending])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, jobs[ix], settings): ix for ix in pending}
+        for future in as_completed(futures):
+            ix = futures[future]
+            try:
+                res = future.result()
+            except Exception:
+                # the worker itself failed, i.e. the result could not be pickled
+                res = JobResult(jobs[ix], error=traceback.format_exc())
+            if res.error is not None:
+                br_logger.error("Job {0} failed:\n{1}".format(jobs[ix], res.error))
+            else:
+                br_logger.info("Job {0} done in {1:.1f}s".format(jobs[ix], res.elapsed))
+            results[ix] = res
+    return results
+
+def shard_ranges(start, end, timeframe, nshards, period=None):
+    '''
+    Function to split the range of a TradeBot run in 'nshards'
+    consecutive parts. Each part starts in a candle in which the
+    whole run refreshes the S/R areas (every [trade_bot]period
+    candles from 'start')
+
+    Parameters
+    ----------
+    start : str, Required
+            i.e. '2018-01-01 22:00:00'
+    end : str, Required
+    timeframe : str, Required
+    nshards : int, Required
+    period : int, Optional
+             Default: [trade_bot]period
+
+    Returns
+    -------
+    list of (start, end) tuples with str
+    '''
+    fmt = '%Y-%m-%d %H:%M:%S'
+    delta = periodToDelta(1, timeframe)
+    startO = datetime.strptime(start, fmt)
+    endO = datetime.strptime(end, fmt)
+    if period is None:
+        period = CONFIG.getint('trade_bot', 'period')
+    period = max(period, 1)
+    nsteps = int((endO - startO) // delta) + 1
+    ncycles = -(-nsteps // period)
+    nshards = min(max(nshards, 1), ncycles)
+    # first step of each shard. The cycles are spread evenly
+    bounds = [min(ncycles*i // nshards * period, nsteps) for i in range(nshards + 1)]
+    shards = []
+    for k, k_end in zip(bounds[:-1], bounds[1:]):
+        shard_end = endO if k_end == nsteps else startO + (k_end-1)*delta
+        shards.append(((startO + k*delta).strftime(fmt), shard_end.strftime(fmt)))
+    return shards
+
+def run_sharded(job, nshards=None, workers=None, settings=None):
+    '''
+    Function to run a single long Job as several shards (see
+    'shard_ranges') in a pool of processes. The Trades of the shards
+    are joined in order, so the result is the same as 'run_job'.
+    The Trades do not block the candles that follow them (the active
+    trade 'tend' is only carried when resuming a checkpoint), so the
+    shards do not depend on each other
+
+    Parameters
+    ----------
+    job : Job, Required
+    nshards : int, Optional
+              Default: 'workers' or the number of CPUs
+    workers : int, Optional
+              Number of processes. Default: number of CPUs
+    settings : dict, Optional
+               See 'run_batch'
+
+    Returns
+    -------
+    JobResult object
+    '''
+    settings = settings or config_to_dict()
+    nshards = nshards or workers or os.cpu_count()
+    t0 = time.perf_counter()
+    period = int(apply_overrides(settings, job.overrides)['trade_bot']['period'])
+    shards = shard_ranges(job.start, job.end, job.timeframe, nshards, period=period)
+    jobs = [job._replace(shard=shard) for shard in shards]
+    results = run_batch(jobs, workers=workers, settings=settings, skip_done=False)
+    errors = [r.error for r in results if r.error is not None]
+    if errors:
+        return JobResult(job, elapsed=time.perf_counter()-t0, error="\n".join(errors))
+    tlist = [rec for r in results for rec in r.tlist]
+    return JobResult(job, tlist=tlist, elapsed=time.perf_counter()-t0)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run TradeBot over a grid of pairs and timeframes')
+    parser.add_argument('--pairs', type=str,
+                        help='Comma-separated list of pairs. Default: all pairs in [pairs_start]')
+    parser.add_argument('--timeframes', type=str, default='D,H12,H8,H4',
+                        help='Comma-separated list of timeframes. Default: D,H12,H8,H4')
+    parser.add_argument('--start', type=str, required=True, help="i.e. '2018-01-01 22:00:00'")
+    parser.add_argument('--end', type=str, required=True, help="i.e. '2019-01-01 22:00:00'")
+    parser.add_argument('--workers', type=int, default=None, help='Number of processes')
+    parser.add_argument('--outfile', type=str, default=None,
+                        help='JSON file with the summary of each job')
+    parser.add_argument('--shards', type=int, default=None,
+                        help='If defined, then each job is split in this number '
+                             'of shards run in parallel')
+    args = parser.parse_args()
+
+    if args.pairs is None:
+        pairs = [p.upper() for p in CONFIG.options('pairs_start')]
+    else:
+        pairs = args.pairs.split(',')
+    jobs = make_grid(pairs, args.timeframes.split(','), args.start, args.end)
+    if args.shards is None:
+        results = run_batch(jobs, workers=args.workers)
+    else:
+        results = [run_sharded(job, nshards=args.shards, workers=args.workers) for job in jobs]
+    summary = [r.summary() for r in results]
+    if args.outfile is not None:
+        with open(args.outfile, 'w') as f:
+            json.dump(summary, f, indent=1)
+    nfailed = len([r for r in results if r.error is not None])
+    br_logger.info("{0} jobs run, {1} failed".format(len(results), nfailed))
+
+if __name__ == '__main__':
+    main()
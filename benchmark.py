@@ -0,0 +1,332 @@
+'''
+Benchmark TradeBot, TradeDiscover and calc_SR offline, replaying
+candles recorded with 'record' instead of querying the Oanda API
+
+Usage: python benchmark.py --fixtures ../data/fixtures --pair AUD_USD
+                           --timeframes D,H12,H8,H4 --period_ranges 500,1500
+                           --start '2018-01-01 22:00:00'
+                           --end '2019-01-01 22:00:00'
+                           --outfile bench.json [--baseline old_bench.json]
+'''
+import logging
+import argparse
+import json
+import os
+import sys
+import time
+import platform
+import tracemalloc
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import datetime
+
+import oanda.connect
+from config import CONFIG
+from data_client import ReplayConnect, fixture_file
+from utils import periodToDelta
+import trade_bot
+from trade_bot import TradeBot, TradeDiscover
+
+# create logger
+b_logger = logging.getLogger(__name__)
+b_logger.setLevel(logging.INFO)
+
+STAGES = ('io', 'sr', 'trade')
+
+def record(instrument, granularity, start, end, fixtures_dir):
+    '''
+    Function to record the candles between 'start' and 'end' with
+    Connect.query, so they can be replayed by ReplayConnect
+
+    Parameters
+    ----------
+    instrument : str, Required
+    granularity : str, Required
+    start : datetime, Required
+    end : datetime, Required
+    fixtures_dir : str, Required
+                   Folder where the recorded candles are written
+    '''
+    conn = oanda.connect.Connect(instrument=instrument,
+                                 granularity=granularity)
+    res = conn.query(start=start.isoformat(),
+                     end=end.isoformat())
+    os.makedirs(fixtures_dir, exist_ok=True)
+    with open(fixture_file(fixtures_dir, instrument, granularity), 'w') as f:
+        json.dump(res, f)
+
+@contextmanager
+def replay(fixtures_dir):
+    '''
+    Context manager replacing Connect by ReplayConnect
+    in all the modules that have imported it
+    '''
+    original = oanda.connect.Connect
+
+    def factory(instrument, granularity, **kwargs):
+        return ReplayConnect(instrument, granularity, fixtures_dir=fixtures_dir)
+
+    patched = [m for m in list(sys.modules.values())
+               if getattr(m, 'Connect', None) is original]
+    for m in patched:
+        m.Connect = factory
+    try:
+        yield
+    finally:
+        for m in patched:
+            m.Connect = original
+
+class StageTimer(object):
+    '''
+    This class accumulates the time spent in each of the
+    stages (see STAGES). Only the outermost stage is timed when
+    a stage is called from another one
+
+    Class variables
+    ---------------
+    times: dict
+           Seconds spent in each stage
+    calls: dict
+           Number of calls to each stage
+    '''
+    def __init__(self):
+        self.times = {s: 0.0 for s in STAGES}
+        self.calls = {s: 0 for s in STAGES}
+        self.active = None
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            if self.active is not None:
+                return func(*args, **kwargs)
+            self.active = stage
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.times[stage] += time.perf_counter() - t0
+                self.calls[stage] += 1
+                self.active = None
+        return timed
+
+@contextmanager
+def timed_stages(timer):
+    '''
+    Context manager wrapping the functions of trade_bot that
+    load candles (io), calculate the S/R areas (sr) and
+    evaluate the candles (trade) with 'timer'
+    '''
+    originals = {'get_candlestore': trade_bot.get_candlestore,
+                 'calc_SR_plot': trade_bot.calc_SR_plot,
+                 'evaluate_candle': trade_bot.evaluate_candle}
+    calc_SRlst = TradeBot.calc_SRlst
+    trade_bot.get_candlestore = timer.wrap('io', originals['get_candlestore'])
+    trade_bot.calc_SR_plot = timer.wrap('sr', originals['calc_SR_plot'])
+    trade_bot.evaluate_candle = timer.wrap('trade', originals['evaluate_candle'])
+    TradeBot.calc_SRlst = timer.wrap('sr', calc_SRlst)
+    try:
+        yield
+    finally:
+        for name, func in originals.items():
+            setattr(trade_bot, name, func)
+        TradeBot.calc_SRlst = calc_SRlst
+
+def measure(func, ncandles, memory=True):
+    '''
+    Function to time 'func'. If 'memory' is True, then 'func'
+    is run a second time with tracemalloc to get the peak memory,
+    so the tracing does not affect the timing
+
+    Parameters
+    ----------
+    func : function, Required
+           Function without arguments
+    ncandles : int, Required
+               Number of candles processed by 'func'
+    memory : Bool
+             Default: True
+
+    Returns
+    -------
+    dict
+    '''
+    timer = StageTimer()
+    with timed_stages(timer):
+        t0 = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - t0
+    res = {'ncandles': ncandles,
+           'elapsed': elapsed,
+           'candles_per_sec': ncandles / elapsed if elapsed > 0 else None,
+           'stages': dict(timer.times),
+           'stage_calls': dict(timer.calls),
+           'peak_mem_mb': None}
+    res['stages']['other'] = max(elapsed - sum(timer.times.values()), 0.0)
+    if memory is True:
+        tracemalloc.start()
+        try:
+            func()
+            res['peak_mem_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return res
+
+def count_candles(fixtures_dir, pair, timeframe, start, end):
+    conn = ReplayConnect(pair, timeframe, fixtures_dir=fixtures_dir)
+    return bisect_right(conn.times, end) - bisect_left(conn.times, start)
+
+def bench_tradebot(fixtures_dir, pair, timeframe, start, end, period_range, memory=True):
+    CONFIG.set('trade_bot', 'period_range', str(period_range))
+    tb = TradeBot(pair=pair, timeframe=timeframe, start=start, end=end)
+    startO = datetime.strptime(start, '%Y-%m-%d %H:%M:%S')
+    endO = datetime.strptime(end, '%Y-%m-%d %H:%M:%S')
+    res = measure(tb.run, count_candles(fixtures_dir, pair, timeframe, startO, endO), memory=memory)
+    res.update({'case': 'TradeBot.run', 'pair': pair, 'timeframe': timeframe,
+                'period_range': period_range})
+    return res
+
+def bench_tradediscover(fixtures_dir, pair, timeframe, start, period_range, memory=True):
+    CONFIG.set('trade_bot', 'period_range', str(period_range))
+    startO = datetime.strptime(start, '%Y-%m-%d %H:%M:%S')
+    td = TradeDiscover(start=startO, pair=pair, timeframe=timeframe)
+    res = measure(td.run, 1, memory=memory)
+    res.update({'case': 'TradeDiscover.run', 'pair': pair, 'timeframe': timeframe,
+                'period_range': period_range})
+    return res
+
+def bench_calc_SR(fixtures_dir, pair, timeframe, start, period_range, memory=True):
+    startO = datetime.strptime(start, '%Y-%m-%d %H:%M:%S')
+    initc_date = startO - periodToDelta(period_range, timeframe)
+    conn = ReplayConnect(pair, timeframe, fixtures_dir=fixtures_dir)
+    clO = trade_bot.get_candlestore(conn, instrument=pair, granularity=timeframe,
+                                    start=initc_date, end=startO).slice()
+    res = measure(lambda: trade_bot.calc_SR(clO, outfile=None), len(clO.clist), memory=memory)
+    res.update({'case': 'calc_SR', 'pair': pair, 'timeframe': timeframe,
+                'period_range': period_range})
+    return res
+
+def run_benchmarks(fixtures_dir, pair, timeframes, period_ranges, start, end, memory=True):
+    '''
+    Function to run all the benchmarks for 'pair' with the recorded
+    candles in 'fixtures_dir'. The plots and reports are not
+    written ([images]artifacts = none)
+
+    Parameters
+    ----------
+    fixtures_dir : str, Required
+    pair : str, Required
+    timeframes : list, Required
+                 i.e. ['D', 'H12', 'H8', 'H4']. The minute timeframes (i.e.
+                 M15) are run with TradeBot.run's default, the bulk 'scan'
+    period_ranges : list of int, Required
+    start : str, Required
+            i.e. '2018-01-01 22:00:00'
+    end : str, Required
+    memory : Bool
+             If True, then the peak memory is measured. Default: True
+
+    Returns
+    -------
+    dict that can be serialized to JSON
+    '''
+    saved_range = CONFIG.get('trade_bot', 'period_range')
+    saved_artifacts = CONFIG.get('images', 'artifacts', fallback=None)
+    results = []
+    try:
+        CONFIG.set('images', 'artifacts', 'none')
+        with replay(fixtures_dir):
+            for timeframe in timeframes:
+                for period_range in period_ranges:
+                    b_logger.info("Benchmarking {0} {1} period_range={2}".format(pair, timeframe,
+                                                                               period_range))
+                    results.append(bench_tradebot(fixtures_dir, pair, timeframe, start, end,
+                                                  period_range, memory=memory))
+                    results.append(bench_tradediscover(fixtures_dir, pair, timeframe, end,
+                                                       period_range, memory=memory))
+                    results.append(bench_calc_SR(fixtures_dir, pair, timeframe, end,
+                                                 period_range, memory=memory))
+    finally:
+        CONFIG.set('trade_bot', 'period_range', saved_range)
+        if saved_artifacts is None:
+            CONFIG.remove_option('images', 'artifacts')
+        else:
+            CONFIG.set('images', 'artifacts', saved_artifacts)
+    return {'date': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results}
+
+def compare(baseline, current, threshold=0.1):
+    '''
+    Function to compare the throughput of two benchmark reports
+
+    Parameters
+    ----------
+    baseline : dict, Required
+               As returned by 'run_benchmarks'
+    current : dict, Required
+    threshold : float
+                Fraction of throughput loss considered a
+                regression. Default: 0.1
+
+    Returns
+    -------
+    list of dicts with the cases that are slower than the baseline
+    '''
+    def key(r):
+        return (r['case'], r['pair'], r['timeframe'], r['period_range'])
+
+    base = {key(r): r for r in baseline['results']}
+    regressions = []
+    for r in current['results']:
+        b = base.get(key(r))
+        if b is None or not b['candles_per_sec'] or not r['candles_per_sec']:
+            continue
+        ratio = r['candles_per_sec'] / b['candles_per_sec']
+        if ratio < 1 - threshold:
+            regressions.append({'case': key(r), 'ratio': ratio})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the bots with recorded candles')
+    parser.add_argument('--fixtures', type=str, required=True,
+                        help='Folder with the recorded candles')
+    parser.add_argument('--pair', type=str, required=True, help='i.e. AUD_USD')
+    parser.add_argument('--timeframes', type=str, default='D,H12,H8,H4',
+                        help='Comma-separated list of timeframes. Default: D,H12,H8,H4')
+    parser.add_argument('--period_ranges', type=str, default=CONFIG.get('trade_bot', 'period_range'),
+                        help='Comma-separated list of [trade_bot]period_range values')
+    parser.add_argument('--start', type=str, required=True, help="i.e. '2018-01-01 22:00:00'")
+    parser.add_argument('--end', type=str, required=True, help="i.e. '2019-01-01 22:00:00'")
+    parser.add_argument('--record', action='store_true',
+                        help='Record the candles needed from the Oanda API before running')
+    parser.add_argument('--no_memory', action='store_true', help='Do not measure the peak memory')
+    parser.add_argument('--outfile', type=str, required=True, help='Output JSON file')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='JSON file of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Throughput loss considered a regression. Default: 0.1')
+    args = parser.parse_args()
+
+    timeframes = args.timeframes.split(',')
+    period_ranges = [int(p) for p in args.period_ranges.split(',')]
+    if args.record is True:
+        start = datetime.strptime(args.start, '%Y-%m-%d %H:%M:%S')
+        end = datetime.strptime(args.end, '%Y-%m-%d %H:%M:%S')
+        for timeframe in timeframes:
+            record(args.pair, timeframe, start - periodToDelta(max(period_ranges), timeframe),
+                   end, args.fixtures)
+    report = run_benchmarks(args.fixtures, args.pair, timeframes, period_ranges,
+                            args.start, args.end, memory=not args.no_memory)
+    with open(args.outfile, 'w') as f:
+        json.dump(report, f, indent=1)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), report, threshold=args.threshold)
+        for r in regressions:
+            b_logger.error("Regression in {0}: {1:.2f}x the baseline throughput".format(r['case'],
+                                                                                      r['ratio']))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
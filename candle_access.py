@@ -0,0 +1,166 @@
+import logging
+from collections.abc import Sequence
+from datetime import datetime
+
+import numpy as np
+
+# create logger
+ca_logger = logging.getLogger(__name__)
+ca_logger.setLevel(logging.INFO)
+
+def to_datetime(time):
+    '''
+    Function to convert a candle time as returned by the
+    Oanda's API (i.e. '2018-01-22T22:00:00.000000Z') into a
+    datetime object. If 'time' is already a datetime object
+    then it is returned as it is
+
+    Parameters
+    ----------
+    time : str or datetime
+
+    Returns
+    -------
+    datetime object
+    '''
+    if isinstance(time, datetime):
+        return time
+    return datetime.strptime(time, '%Y-%m-%dT%H:%M:%S.%fZ')
+
+class ListView(Sequence):
+    '''
+    This class represents a read-only view over a contiguous
+    range of a list. No element is copied when the view is created
+
+    Class variables
+    ---------------
+    data: list, Required
+          List that is viewed
+    start: int, Required
+           Index in 'data' of the first element of the view
+    stop: int, Required
+          Index in 'data' after the last element of the view
+    '''
+    def __init__(self, data, start, stop):
+        self.data = data
+        self.start = start
+        self.stop = max(start, stop)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, ix):
+        if isinstance(ix, slice):
+            start, stop, step = ix.indices(len(self))
+            if step == 1:
+                return ListView(self.data, self.start + start, self.start + stop)
+            return [self.data[self.start + i] for i in range(start, stop, step)]
+        if ix < 0:
+            ix += len(self)
+        if ix < 0 or ix >= len(self):
+            raise IndexError("ListView index out of range")
+        return self.data[self.start + ix]
+
+    def __iter__(self):
+        for i in range(self.start, self.stop):
+            yield self.data[i]
+
+class TimeIndex(object):
+    '''
+    This class represents an index over a sorted sequence of
+    datetimes, used to get the position of the floor, ceil or nearest
+    datetime for one or many datetimes by bisection
+
+    Class variables
+    ---------------
+    times: numpy datetime64[us] array, Required
+           Datetimes sorted in ascending order. A list of datetime
+           objects is also accepted. An Exception is raised if
+           they are not sorted
+    '''
+    hows = ('floor', 'ceil', 'nearest')
+
+    def __init__(self, times):
+        self.times = np.asarray(times, dtype='datetime64[us]')
+        if np.any(self.times[1:] < self.times[:-1]):
+            raise Exception("TimeIndex needs the datetimes sorted in ascending order")
+
+    def __len__(self):
+        return len(self.times)
+
+    def lookup(self, dts, how='nearest', tolerance=None):
+        '''
+        Function to get the index of the datetime in 'times' that is
+        the floor (last lower or equal), the ceil (first greater or
+        equal) or the nearest to each of 'dts'. If two datetimes are
+        equally near, then the earlier is selected
+
+        Parameters
+        ----------
+        dts : list of datetime or numpy datetime64 array, Required
+        how : str
+              floor, ceil or nearest. Default: nearest
+        tolerance : timedelta, Optional
+                    If defined, then the datetimes further than
+                    'tolerance' from the requested one are discarded
+
+        Returns
+        -------
+        numpy int array with the indexes. -1 is used when
+        there is no datetime for the requested one
+        '''
+        if how not in self.hows:
+            raise Exception("{0} is not valid. Valid values are: {1}".format(how, ",".join(self.hows)))
+        dts = np.asarray(dts, dtype='datetime64[us]')
+        n = len(self.times)
+        if n == 0:
+            return np.full(dts.shape, -1, dtype=np.int64)
+        if how == 'floor':
+            ixs = np.searchsorted(self.times, dts, side='right') - 1
+        else:
+            right = np.searchsorted(self.times, dts, side='left')
+            if how == 'ceil':
+                ixs = np.where(right < n, right, -1)
+            else:
+                before = np.maximum(right - 1, 0)
+                after = np.minimum(right, n - 1)
+                use_before = (right == n) | ((right > 0) &
+                                             (dts - self.times[before] <= self.times[after] - dts))
+                ixs = np.where(use_before, before, after)
+                # first of the repeated datetimes
+                ixs = np.searchsorted(self.times, self.times[ixs], side='left')
+        if tolerance is not None:
+            diff = np.abs(self.times[np.maximum(ixs, 0)] - dts)
+            ixs = np.where(diff <= np.timedelta64(tolerance), ixs, -1)
+        return ixs.astype(np.int64)
+
+    def _lookup_one(self, dt, how, tolerance):
+        ix = int(self.lookup([dt], how=how, tolerance=tolerance)[0])
+        return None if ix < 0 else ix
+
+    def floor(self, dt, tolerance=None):
+        '''
+        Returns
+        -------
+        int with the index of the last datetime lower or equal
+        than 'dt' or None. See 'lookup'
+        '''
+        return self._lookup_one(dt, 'floor', tolerance)
+
+    def ceil(self, dt, tolerance=None):
+        '''
+        Returns
+        -------
+        int with the index of the first datetime greater or equal
+        than 'dt' or None. See 'lookup'
+        '''
+        return self._lookup_one(dt, 'ceil', tolerance)
+
+    def nearest(self, dt, tolerance=None):
+        '''
+        Returns
+        -------
+        int with the index of the datetime nearest
+        to 'dt' or None. See 'lookup'
+        '''
+        return self._lookup_one(dt, 'nearest', tolerance)
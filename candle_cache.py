@@ -0,0 +1,264 @@
+import logging
+import os
+import json
+import fcntl
+from datetime import datetime
+
+import numpy as np
+
+from config import CONFIG
+from candle_store import CandleStore
+import resample
+
+# create logger
+cc_logger = logging.getLogger(__name__)
+cc_logger.setLevel(logging.INFO)
+
+def merge_ranges(ranges):
+    '''
+    Function to merge overlapping or contiguous datetime ranges
+
+    Parameters
+    ----------
+    ranges : list, Required
+             List of (start, end) tuples
+
+    Returns
+    -------
+    list of (start, end) tuples sorted by start
+    '''
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def missing_ranges(ranges, start, end):
+    '''
+    Function to get the parts of [start, end] that are not
+    covered by 'ranges'
+
+    Parameters
+    ----------
+    ranges : list, Required
+             List of merged (start, end) tuples sorted by start
+    start : datetime, Required
+    end : datetime, Required
+
+    Returns
+    -------
+    list of (start, end) tuples
+    '''
+    gaps = []
+    current = start
+    for rstart, rend in ranges:
+        if rend < current:
+            continue
+        if rstart > end:
+            break
+        if rstart > current:
+            gaps.append((current, rstart))
+        current = max(current, rend)
+    if current < end:
+        gaps.append((current, end))
+    return gaps
+
+class CandleCache(object):
+    '''
+    This class represents a persistent cache of candles for an
+    instrument and granularity placed in front of Connect.query.
+    The candles are stored in a NumPy file that is memory-mapped when
+    read and a manifest (JSON) records the datetime ranges that have
+    already been fetched, so only the missing ranges are requested.
+
+    Writers hold an exclusive lock and write new files before
+    atomically replacing the manifest, so several processes can
+    read the cache at the same time
+
+    Class variables
+    ---------------
+    cache_dir: str, Required
+               Folder used to store the cache files
+    instrument: str, Required
+                Currency pair. i.e. AUD_USD
+    granularity: str, Required
+                 Timeframe. i.e. D,H12,H8,H4
+    '''
+    def __init__(self, cache_dir, instrument, granularity):
+        self.cache_dir = cache_dir
+        self.instrument = instrument
+        self.granularity = granularity
+        self.prefix = os.path.join(cache_dir, "{0}.{1}".format(instrument, granularity))
+        self.manifest_f = "{0}.json".format(self.prefix)
+        self.lock_f = "{0}.lock".format(self.prefix)
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_f):
+            return None, []
+        with open(self.manifest_f) as f:
+            manifest = json.load(f)
+        ranges = [(datetime.strptime(s, '%Y-%m-%dT%H:%M:%S'),
+                   datetime.strptime(e, '%Y-%m-%dT%H:%M:%S')) for s, e in manifest['ranges']]
+        return manifest['data'], ranges
+
+    def _load(self):
+        '''
+        Load the cached candles and the fetched ranges
+
+        Returns
+        -------
+        tuple (records, ranges). 'records' is a memory-mapped NumPy
+        structured array or None if the cache is empty
+        '''
+        for attempt in range(3):
+            data_f, ranges = self._read_manifest()
+            if data_f is None:
+                return None, []
+            try:
+                return np.load(os.path.join(self.cache_dir, data_f), mmap_mode='r'), ranges
+            except FileNotFoundError:
+                # a writer replaced the data file after the manifest was read
+                continue
+        raise Exception("Cache for {0} could not be read".format(self.prefix))
+
+    def _save(self, records, ranges, old_data_f):
+        gen = 0
+        if old_data_f is not None:
+            gen = int(old_data_f.split('.')[-2]) + 1
+        data_f = "{0}.{1}.{2}.npy".format(self.instrument, self.granularity, gen)
+        np.save(os.path.join(self.cache_dir, data_f), records)
+        manifest = {'data': data_f,
+                    'ranges': [(s.strftime('%Y-%m-%dT%H:%M:%S'),
+                                e.strftime('%Y-%m-%dT%H:%M:%S')) for s, e in ranges]}
+        tmp_f = "{0}.{1}.tmp".format(self.manifest_f, os.getpid())
+        with open(tmp_f, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_f, self.manifest_f)
+        if old_data_f is not None:
+            # processes that have the old file mapped can still use it
+            os.remove(os.path.join(self.cache_dir, old_data_f))
+
+    def _fetch(self, conn, start, end, ser_dir=None):
+        '''
+        Fetch the candles in [start, end] from 'conn'
+
+        Returns
+        -------
+        tuple (records, covered_end). 'covered_end' is the datetime
+        up to which the range can be considered as fetched
+        '''
+        res = conn.query(start=start.isoformat(),
+                         end=end.isoformat(),
+                         indir=ser_dir)
+        records = CandleStore(res).to_records()
+        covered_end = end
+        if len(records) > 0 and not records['complete'].all():
+            # incomplete candles are not cached and their range
+            # will be fetched again
+            records = records[records['complete']]
+            covered_end = start if len(records) == 0 else records['time'][-1].item()
+        if end > datetime.utcnow():
+            covered_end = min(covered_end, datetime.utcnow())
+        return records, covered_end
+
+    def get(self, conn, start, end, ser_dir=None):
+        '''
+        Function to get the candles between 'start' and 'end'.
+        Only the ranges that are not in the cache are fetched
+        with 'conn'
+
+        Parameters
+        ----------
+        conn : Connect object, Required
+        start : datetime, Required
+        end : datetime, Required
+        ser_dir : str, Optional
+                  Folder with serialized data passed to Connect.query
+
+        Returns
+        -------
+        CandleStore object
+        '''
+        records, ranges = self._load()
+        gaps = missing_ranges(ranges, start, end)
+        if gaps:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.lock_f, 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                # other process could have filled the gaps while waiting
+                records, ranges = self._load()
+                gaps = missing_ranges(ranges, start, end)
+                new = [] if records is None else [np.asarray(records)]
+                for gstart, gend in gaps:
+                    cc_logger.info("Fetching {0} {1} candles from {2} to {3}".format(self.instrument,
+                                                                                   self.granularity,
+                                                                                   gstart, gend))
+                    frecords, covered_end = self._fetch(conn, gstart, gend, ser_dir=ser_dir)
+                    new.append(frecords)
+                    if covered_end > gstart:
+                        ranges.append((gstart, covered_end))
+                if gaps:
+                    allrecords = np.concatenate(new)
+                    allrecords = allrecords[np.argsort(allrecords['time'], kind='stable')]
+                    _, uix = np.unique(allrecords['time'], return_index=True)
+                    data_f = self._read_manifest()[0]
+                    self._save(allrecords[uix], merge_ranges(ranges), data_f)
+                    records, ranges = self._load()
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        if records is None:
+            records = np.empty(0, dtype=CandleStore.dtype)
+        start_ix = int(np.searchsorted(records['time'], np.datetime64(start, 'us'), side='left'))
+        end_ix = int(np.searchsorted(records['time'], np.datetime64(end, 'us'), side='right'))
+        return CandleStore.from_records(records[start_ix:end_ix],
+                                        instrument=self.instrument,
+                                        granularity=self.granularity)
+
+def get_candlestore(conn, instrument, granularity, start, end, ser_dir=None):
+    '''
+    Function to get a CandleStore with the candles between 'start'
+    and 'end'. If [general]cache_dir is defined, then the candles
+    are served by a CandleCache. Otherwise 'conn' is queried.
+    If [general]base_granularity is defined, then the candles are
+    derived from the candles of that granularity (see resample.py)
+
+    Parameters
+    ----------
+    conn : Connect object, Required
+    instrument : str, Required
+    granularity : str, Required
+    start : datetime, Required
+    end : datetime, Required
+    ser_dir : str, Optional
+              Folder with serialized data passed to Connect.query
+
+    Returns
+    -------
+    CandleStore object
+    '''
+    base = resample.base_granularity(granularity)
+    bconn = None if base is None else resample.for_granularity(conn, base)
+    if bconn is not None:
+        bstart, bend = resample.base_range(start, end, granularity, base)
+        bstore = get_candlestore(bconn,
+                                 instrument=instrument,
+                                 granularity=base,
+                                 start=bstart,
+                                 end=bend,
+                                 ser_dir=ser_dir)
+        store = resample.resample(bstore, granularity)
+        start_ix, end_ix = store.bounds(start, end)
+        return CandleStore.from_records(store.to_records()[start_ix:end_ix],
+                                        instrument=instrument,
+                                        granularity=granularity)
+    if CONFIG.has_option('general', 'cache_dir'):
+        cache = CandleCache(CONFIG.get('general', 'cache_dir'),
+                            instrument=instrument,
+                            granularity=granularity)
+        return cache.get(conn, start, end, ser_dir=ser_dir)
+    res = conn.query(start=start.isoformat(),
+                     end=end.isoformat(),
+                     indir=ser_dir)
+    return CandleStore(res)
@@ -0,0 +1,460 @@
+import logging
+from collections.abc import Sequence
+from datetime import datetime
+
+import numpy as np
+
+from candle.candle import Candle
+from candle_access import ListView, TimeIndex
+
+# create logger
+cs_logger = logging.getLogger(__name__)
+cs_logger.setLevel(logging.INFO)
+
+class LazyCandles(Sequence):
+    '''
+    This class represents the list of Candle objects of a
+    CandleStore. Each Candle object is only created the first time
+    it is accessed
+
+    Class variables
+    ---------------
+    store: CandleStore object, Required
+    cache: list
+           List with the Candle objects created so far or None
+    '''
+    def __init__(self, store):
+        self.store = store
+        self.cache = [None] * len(store)
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __getitem__(self, ix):
+        if isinstance(ix, slice):
+            start, stop, step = ix.indices(len(self))
+            if step == 1:
+                return ListView(self, start, stop)
+            return [self[i] for i in range(start, stop, step)]
+        if ix < 0:
+            ix += len(self)
+        c = self.cache[ix]
+        if c is None:
+            c = self.store.candle(ix)
+            self.cache[ix] = c
+        return c
+
+class CandleDicts(Sequence):
+    '''
+    This class represents the candles of a CandleStore as the
+    dictionaries returned by Connect.query. Each dictionary is
+    created when it is accessed
+
+    Class variables
+    ---------------
+    store: CandleStore object, Required
+    '''
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, ix):
+        if isinstance(ix, slice):
+            return [self[i] for i in range(*ix.indices(len(self)))]
+        if ix < 0:
+            ix += len(self)
+        if ix < 0 or ix >= len(self):
+            raise IndexError("CandleDicts index out of range")
+        return self.store.candle_dict(ix)
+
+class CandleStore(object):
+    '''
+    This class represents a columnar store of candles. Times are kept
+    in a datetime64 array and the open/high/low/close prices for the
+    bid and ask sides in float64 arrays, so the TradeBot can work on
+    whole ranges of candles with NumPy operations. Candle objects are
+    only created on demand
+
+    Class variables
+    ---------------
+    instrument: str
+                Currency pair. i.e. AUD_USD
+    granularity: str
+                 Timeframe. i.e. D,H12,H8,H4
+    time: numpy array
+          datetime64[us] with the time of each candle
+    openBid,openAsk,...,closeAsk: numpy array
+          float64 arrays with the prices of each candle
+    volume: numpy array
+            int64 with the volume of each candle
+    complete: numpy array
+              bool with the 'complete' flag of each candle
+    clist: LazyCandles
+           Sequence of Candle objects created on demand
+    '''
+    fields = ('openBid', 'openAsk', 'highBid', 'highAsk',
+              'lowBid', 'lowAsk', 'closeBid', 'closeAsk')
+    dtype = np.dtype([('time', 'datetime64[us]')] +
+                     [(f, np.float64) for f in fields] +
+                     [('volume', np.int64), ('complete', bool)])
+
+    def __init__(self, data):
+        '''
+        Constructor
+
+        Parameters
+        ----------
+        data : dict, Required
+               Dictionary as returned by Connect.query
+        '''
+        self.instrument = data.get('instrument')
+        self.granularity = data.get('granularity')
+        candles = data['candles']
+        self.time = np.array([self._parse_time(c['time']) for c in candles],
+                             dtype='datetime64[us]')
+        for f in self.fields:
+            setattr(self, f, np.array([c[f] for c in candles], dtype=np.float64))
+        self.volume = np.array([c.get('volume', 0) for c in candles], dtype=np.int64)
+        self.complete = np.array([c.get('complete', True) for c in candles], dtype=bool)
+        self._init_views()
+
+    @classmethod
+    def from_records(cls, records, instrument, granularity):
+        '''
+        Function to create a CandleStore from a NumPy structured
+        array with 'dtype' fields. The columns are views on 'records',
+        so no data is copied if it is a memory-mapped array
+
+        Parameters
+        ----------
+        records : numpy structured array, Required
+        instrument : str, Required
+        granularity : str, Required
+
+        Returns
+        -------
+        CandleStore object
+        '''
+        store = cls.__new__(cls)
+        store.instrument = instrument
+        store.granularity = granularity
+        store.time = records['time']
+        for f in cls.fields:
+            setattr(store, f, records[f])
+        store.volume = records['volume']
+        store.complete = records['complete']
+        store._init_views()
+        return store
+
+    def to_records(self):
+        '''
+        Function to get the candles of this store as a NumPy
+        structured array with 'dtype' fields
+
+        Returns
+        -------
+        numpy structured array
+        '''
+        records = np.empty(len(self.time), dtype=self.dtype)
+        records['time'] = self.time
+        for f in self.fields:
+            records[f] = getattr(self, f)
+        records['volume'] = self.volume
+        records['complete'] = self.complete
+        return records
+
+    def extend(self, data):
+        '''
+        Function to append new candles to this store. Candles
+        that are not after the last candle of the store are ignored
+
+        Parameters
+        ----------
+        data : dict, Required
+               Dictionary as returned by Connect.query
+
+        Returns
+        -------
+        int with the number of candles appended
+        '''
+        new = CandleStore(data)
+        if len(self.time) > 0:
+            new_ix = new.time > self.time[-1]
+        else:
+            new_ix = np.ones(len(new.time), dtype=bool)
+        n = int(new_ix.sum())
+        if n == 0:
+            return 0
+        for name in ('time', 'volume', 'complete') + self.fields:
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(new, name)[new_ix]]))
+        self.clist.cache.extend([None] * n)
+        return n
+
+    def truncate(self, maxlen):
+        '''
+        Function to remove the oldest candles so this
+        store has no more than 'maxlen' candles
+
+        Parameters
+        ----------
+        maxlen : int, Required
+
+        Returns
+        -------
+        int with the number of candles removed
+        '''
+        n = len(self.time) - maxlen
+        if n <= 0:
+            return 0
+        for name in ('time', 'volume', 'complete') + self.fields:
+            setattr(self, name, getattr(self, name)[n:].copy())
+        del self.clist.cache[:n]
+        return n
+
+    def _init_views(self):
+        self.clist = LazyCandles(self)
+        self._areas = (None, None, None)
+        self._index = (None, None)
+
+    @staticmethod
+    def _parse_time(time):
+        if isinstance(time, datetime):
+            return np.datetime64(time, 'us')
+        return np.datetime64(time.rstrip('Z'), 'us')
+
+    def __len__(self):
+        return len(self.time)
+
+    def column(self, name):
+        '''
+        Function to get the array for a certain candle attribute
+
+        Parameters
+        ----------
+        name : str, Required
+               i.e. closeAsk
+
+        Returns
+        -------
+        numpy array
+        '''
+        return getattr(self, name)
+
+    def get_datetime(self, ix):
+        '''
+        Function to get the time of the candle at index 'ix'
+
+        Returns
+        -------
+        datetime object
+        '''
+        return self.time[ix].item()
+
+    def get_ix(self, dt):
+        '''
+        Function to get the index of the first candle with time
+        greater or equal than 'dt'. This mimics Oanda's
+        query(start=dt, count=1)
+
+        Parameters
+        ----------
+        dt : datetime, Required
+
+        Returns
+        -------
+        int or None if there is no candle at or after 'dt'
+        '''
+        return self.time_index().ceil(dt)
+
+    def time_index(self):
+        '''
+        Returns
+        -------
+        TimeIndex object over the candle times. It is built once
+        and rebuilt only when the candles change
+        '''
+        if self._index[0] is not self.time:
+            self._index = (self.time, TimeIndex(self.time))
+        return self._index[1]
+
+    def bounds(self, start=None, end=None):
+        '''
+        Function to get the indexes of the candles between
+        'start' and 'end' (both included)
+
+        Parameters
+        ----------
+        start : datetime, Optional
+        end : datetime, Optional
+
+        Returns
+        -------
+        tuple (start_ix, end_ix) where 'end_ix' is not included
+        '''
+        start_ix = 0
+        end_ix = len(self.time)
+        if start is not None:
+            start_ix = int(np.searchsorted(self.time, np.datetime64(start, 'us'), side='left'))
+        if end is not None:
+            end_ix = int(np.searchsorted(self.time, np.datetime64(end, 'us'), side='right'))
+        return start_ix, end_ix
+
+    def candle_dict(self, ix):
+        '''
+        Function to get the candle at index 'ix' as
+        returned by Connect.query
+
+        Returns
+        -------
+        dict
+        '''
+        dict_data = {'time': self.get_datetime(ix).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                     'volume': int(self.volume[ix]),
+                     'complete': bool(self.complete[ix])}
+        for f in self.fields:
+            dict_data[f] = float(getattr(self, f)[ix])
+        return dict_data
+
+    def candle(self, ix):
+        '''
+        Function to create the Candle object for index 'ix'
+
+        Returns
+        -------
+        Candle object
+        '''
+        c = Candle(dict_data=self.candle_dict(ix))
+        c.time = self.get_datetime(ix)
+        return c
+
+    def slice(self, start=None, end=None):
+        '''
+        Function to get a CandleList with the candles between
+        'start' and 'end' (both included). Its 'clist' is a view
+        over the candles of this store, created on demand
+
+        Parameters
+        ----------
+        start : datetime, Optional
+        end : datetime, Optional
+
+        Returns
+        -------
+        CandleList object. Its 'data' has the same candles as
+        'clist', as dictionaries created on demand
+        '''
+        # imported here as the module loads the plotting libraries
+        from candle.candlelist import CandleList
+
+        start_ix, end_ix = self.bounds(start, end)
+        # a new CandleList is created for each view, so the
+        # attributes set by its constructor are not shared. It
+        # is created empty, so no Candle object is created
+        data = {'instrument': self.instrument,
+                'granularity': self.granularity,
+                'candles': []}
+        view = CandleList(data)
+        data['candles'] = ListView(CandleDicts(self), start_ix, end_ix)
+        view.data = data
+        view.clist = ListView(self.clist, start_ix, end_ix)
+        return view
+
+    def _area_bounds(self, SRlst):
+        '''
+        Get the lower and upper prices of the HAreas in 'SRlst'.
+        These are cached for the last HAreaList used
+        '''
+        if self._areas[0] is not SRlst:
+            lower = np.array([h.lower for h in SRlst.halist], dtype=np.float64)
+            upper = np.array([h.upper for h in SRlst.halist], dtype=np.float64)
+            self._areas = (SRlst, lower, upper)
+        return self._areas[1], self._areas[2]
+
+    def on_area_mask(self, SRlst, start_ix=0, end_ix=None, ixs=None):
+        '''
+        Function to get which candles overlap with any of
+        the HAreas in 'SRlst'. The candle range considered is
+        the lowest and highest price for bid and ask, so this
+        is a superset of the candles for which HAreaList.onArea
+        will return an HArea
+
+        Parameters
+        ----------
+        SRlst : HAreaList object, Required
+        start_ix : int, Optional
+        end_ix : int, Optional
+        ixs : numpy int array, Optional
+              If defined, then the candles checked are the ones
+              with these indexes instead of [start_ix, end_ix)
+
+        Returns
+        -------
+        numpy bool array with one value per candle checked
+        '''
+        if ixs is None:
+            if end_ix is None:
+                end_ix = len(self.time)
+            ixs = slice(start_ix, end_ix)
+        lo = np.minimum(self.lowBid[ixs], self.lowAsk[ixs])
+        hi = np.maximum(self.highBid[ixs], self.highAsk[ixs])
+        lower, upper = self._area_bounds(SRlst)
+        if len(lower) == 0:
+            return np.zeros(len(lo), dtype=bool)
+        return ((lo[:, None] <= upper[None, :]) &
+                (hi[:, None] >= lower[None, :])).any(axis=1)
+
+    def features(self, ixs, ic_perc):
+        '''
+        Function to get the colour and if the candles are indecision
+        candles, using the ask prices as Candle.set_candle_features
+        and Candle.indecision_c do
+
+        Parameters
+        ----------
+        ixs : numpy int array, Required
+              Indexes of the candles
+        ic_perc : int, Required
+                  Candle's body percentage below which the candle
+                  is considered an indecision candle
+
+        Returns
+        -------
+        tuple (colour, ic). 'colour' is an int array with 1 for green,
+        -1 for red and 0 for undefined. 'ic' is a bool array
+        '''
+        colour = np.sign(self.closeAsk[ixs] - self.openAsk[ixs]).astype(np.int8)
+        height = self.highAsk[ixs] - self.lowAsk[ixs]
+        body = np.abs(self.openAsk[ixs] - self.closeAsk[ixs])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            perc = np.where(height > 0, body*100/height, 0)
+        return colour, perc <= ic_perc
+
+    def weekday(self, ixs):
+        '''
+        Function to get the day of the week of the candles,
+        with Monday as 0 and Sunday as 6 (as datetime.weekday)
+
+        Parameters
+        ----------
+        ixs : numpy int array, Required
+
+        Returns
+        -------
+        numpy int array
+        '''
+        days = self.time[ixs].astype('datetime64[D]').astype(np.int64)
+        # 1970-01-01 was a Thursday
+        return (days + 3) % 7
+
+    def on_area(self, SRlst, ix):
+        '''
+        Function to check if candle at index 'ix' overlaps with any
+        of the HAreas in 'SRlst'. See 'on_area_mask'
+
+        Returns
+        -------
+        bool
+        '''
+        return bool(self.on_area_mask(SRlst, ix, ix + 1)[0])
@@ -0,0 +1,198 @@
+import logging
+import hashlib
+import json
+import os
+import pickle
+import time
+
+from config import CONFIG, config_to_dict
+
+# create logger
+ck_logger = logging.getLogger(__name__)
+ck_logger.setLevel(logging.INFO)
+
+def run_key(pair, timeframe, start, end, settings=None, bulk=None, with_sink=False):
+    '''
+    Function to get the name identifying a run of TradeBot. It includes
+    a hash of the current settings and of the way the run is done, so
+    a checkpoint is not resumed with different settings, with a
+    different loop or with a different destination for the Trades
+
+    Parameters
+    ----------
+    pair : str, Required
+    timeframe : str, Required
+    start : str, Required
+    end : str, Required
+    settings : dict, Optional
+               Dict of dicts as returned by config_to_dict.
+               Default: the current CONFIG
+    bulk : Bool, Optional
+           'bulk' used by TradeBot.run
+    with_sink : Bool, Optional
+                True if the Trades are added to a TradeSink. Default: False
+
+    Returns
+    -------
+    str
+    '''
+    payload = json.dumps({'settings': settings or config_to_dict(),
+                          'bulk': bulk,
+                          'sink': with_sink}, sort_keys=True)
+    digest = hashlib.sha1(payload.encode()).hexdigest()[:10]
+    fmt = lambda d: d.replace(' ', 'T').replace(':', '')
+    return "{0}.{1}.{2}_{3}.{4}".format(pair, timeframe, fmt(start), fmt(end), digest)
+
+class Checkpoint(object):
+    '''
+    This class represents the saved state of a TradeBot run, so it can
+    be resumed if it is interrupted. The state is pickled to
+    '{key}.ckpt' and, when the run finishes, it is replaced by a
+    '{key}.done' file with a summary of the run. The items found by
+    the run (i.e. Trades) are appended to '{key}.items' and the S/R
+    snapshots of a TradeSink to '{key}.snapshots' at each save, so
+    only the ones added since the last save are pickled
+
+    Class variables
+    ---------------
+    ckpt_dir: str, Required
+              Folder with the checkpoints
+    key: str, Required
+         See 'run_key'
+    every: int, Optional
+           Number of candles between checkpoints.
+           Default: [trade_bot]checkpoint_every or 100
+    nitems: int
+            Number of items saved
+    nsnapshots: int
+                Number of snapshots saved
+    '''
+    def __init__(self, ckpt_dir, key, every=None):
+        self.ckpt_dir = ckpt_dir
+        self.key = key
+        if every is None:
+            every = 100
+            if CONFIG.has_option('trade_bot', 'checkpoint_every'):
+                every = CONFIG.getint('trade_bot', 'checkpoint_every')
+        self.every = every
+        self.ckpt_f = os.path.join(ckpt_dir, "{0}.ckpt".format(key))
+        self.done_f = os.path.join(ckpt_dir, "{0}.done".format(key))
+        self.items_f = os.path.join(ckpt_dir, "{0}.items".format(key))
+        self.snapshots_f = os.path.join(ckpt_dir, "{0}.snapshots".format(key))
+        self.nsteps = 0
+        self.nitems = 0
+        self.nsnapshots = 0
+
+    def step(self, n=1):
+        '''
+        Function to count 'n' candles processed
+
+        Returns
+        -------
+        bool. True if a checkpoint is due
+        '''
+        self.nsteps += n
+        if self.nsteps >= self.every:
+            self.nsteps = 0
+            return True
+        return False
+
+    @staticmethod
+    def _append(fname, values, nsaved):
+        '''
+        Function to append to 'fname' the values after the first
+        'nsaved'. The file is started again if 'nsaved' is 0
+
+        Returns
+        -------
+        int with the number of values saved
+        '''
+        new = list(values or [])[nsaved:]
+        with open(fname, 'ab' if nsaved > 0 else 'wb') as f:
+            if new:
+                pickle.dump(new, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return nsaved + len(new)
+
+    @staticmethod
+    def _read(fname, nsaved):
+        '''
+        Function to read the first 'nsaved' values appended to 'fname'.
+        The values appended after them are discarded
+
+        Returns
+        -------
+        list
+        '''
+        values = []
+        if os.path.exists(fname):
+            with open(fname, 'r+b') as f:
+                while len(values) < nsaved:
+                    values.extend(pickle.load(f))
+                f.truncate(f.tell())
+        return values
+
+    def save(self, state, items=None, snapshots=None):
+        '''
+        Function to save 'state'. The file is replaced atomically, so
+        the previous checkpoint is kept if the process is killed
+        while saving
+
+        Parameters
+        ----------
+        state : dict, Required
+        items : list, Optional
+                All the items found so far. Only the ones after
+                the first 'nitems' are written
+        snapshots : list, Optional
+                    All the S/R snapshots of the sink so far. Only the
+                    ones after the first 'nsnapshots' are written
+        '''
+        os.makedirs(self.ckpt_dir, exist_ok=True)
+        # the files are started again by the first save of a run
+        self.nitems = self._append(self.items_f, items, self.nitems)
+        self.nsnapshots = self._append(self.snapshots_f, snapshots, self.nsnapshots)
+        state = dict(state, nitems=self.nitems, nsnapshots=self.nsnapshots)
+        tmp_f = "{0}.{1}.tmp".format(self.ckpt_f, os.getpid())
+        with open(tmp_f, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_f, self.ckpt_f)
+        ck_logger.debug("Checkpoint saved at {0}".format(state.get('startO')))
+
+    def load(self):
+        '''
+        Returns
+        -------
+        dict with the last state saved or None. The items and the
+        snapshots saved until then are in 'items' and 'snapshots'
+        '''
+        if not os.path.exists(self.ckpt_f):
+            return None
+        with open(self.ckpt_f, 'rb') as f:
+            state = pickle.load(f)
+        state['items'] = self._read(self.items_f, state['nitems'])
+        state['snapshots'] = self._read(self.snapshots_f, state['nsnapshots'])
+        self.nitems = len(state['items'])
+        self.nsnapshots = len(state['snapshots'])
+        ck_logger.info("Resuming {0} from {1}".format(self.key, state['startO']))
+        return state
+
+    def is_done(self):
+        return os.path.exists(self.done_f)
+
+    def done(self, summary=None):
+        '''
+        Function to record that the run has finished and
+        remove the checkpoint
+
+        Parameters
+        ----------
+        summary : dict, Optional
+        '''
+        os.makedirs(self.ckpt_dir, exist_ok=True)
+        summary = dict(summary or {})
+        summary['finished'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        with open(self.done_f, 'w') as f:
+            json.dump(summary, f)
+        for fname in (self.ckpt_f, self.items_f, self.snapshots_f):
+            if os.path.exists(fname):
+                os.remove(fname)
@@ -5,28 +5,101 @@
 '''
 from configparser import ConfigParser
 import os
-import pdb
 import logging
 
-logging.basicConfig(level=logging.INFO)
-
 # create logger
 c_logger = logging.getLogger(__name__)
 c_logger.setLevel(logging.INFO)
 
-c_logger.info("Reading config file")
-
 DEFAULT_CONFIG_FILE = '../data/settings.ini'
 def get_config_file():
     return os.environ.get('CONFIG_FILE', DEFAULT_CONFIG_FILE)
 
 CONFIG_FILE = get_config_file()
 
-c_logger.info("Reading config file with name: {0}".format(CONFIG_FILE))
-
 def create_config(config_file=None):
     parser = ConfigParser()
     parser.read(config_file or CONFIG_FILE)
     return parser
 
-CONFIG = create_config()
+class LazyConfig(object):
+    """
+    This class represents the settings of the application. It behaves
+    as a ConfigParser object, but the config file is only read (and
+    logging configured) the first time any setting is accessed, so
+    importing a module using CONFIG has no side effects
+
+    Class variables
+    ---------------
+    parser : ConfigParser object
+             None until the first access
+    """
+    def __init__(self):
+        self.parser = None
+
+    def load(self):
+        """
+        Function to read the config file if it
+        has not been read yet
+
+        Returns
+        -------
+        ConfigParser object
+        """
+        if self.parser is None:
+            logging.basicConfig(level=logging.INFO)
+            config_file = get_config_file()
+            c_logger.info("Reading config file with name: {0}".format(config_file))
+            self.parser = create_config(config_file)
+        return self.parser
+
+    def is_loaded(self):
+        return self.parser is not None
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __getitem__(self, key):
+        return self.load()[key]
+
+    def __contains__(self, key):
+        return key in self.load()
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __len__(self):
+        return len(self.load())
+
+CONFIG = LazyConfig()
+
+def config_to_dict(parser=None):
+    """
+    Function to get the settings of a ConfigParser as
+    a dict of dicts, that can be pickled and sent to
+    other processes
+
+    Parameters
+    ----------
+    parser : ConfigParser object, Optional
+             If None, then CONFIG is used
+
+    Returns
+    -------
+    dict with section names as keys
+    """
+    parser = parser or CONFIG
+    return {s: dict(parser.items(s, raw=True)) for s in parser.sections()}
+
+def reset_config(settings):
+    """
+    Function to replace in place the settings of CONFIG, so
+    every module that has imported CONFIG sees the new settings
+
+    Parameters
+    ----------
+    settings : dict, Required
+               Dict of dicts as returned by config_to_dict
+    """
+    CONFIG.clear()
+    CONFIG.read_dict(settings)
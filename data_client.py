@@ -0,0 +1,282 @@
+import logging
+import asyncio
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import CONFIG
+from candle_access import to_datetime
+
+# create logger
+dc_logger = logging.getLogger(__name__)
+dc_logger.setLevel(logging.INFO)
+
+def fixture_file(fixtures_dir, instrument, granularity):
+    return os.path.join(fixtures_dir, "{0}.{1}.json".format(instrument, granularity))
+
+class ReplayConnect(object):
+    '''
+    This class is a stand-in for oanda.connect.Connect that serves
+    candles recorded in a file (see benchmark.record) or already
+    fetched, so the bots can run without network
+
+    Class variables
+    ---------------
+    instrument: str, Required
+    granularity: str, Required
+    fixtures_dir: str, Optional
+                  Folder with the recorded candles
+    data: dict, Optional
+          Dictionary as returned by Connect.query. Used if
+          'fixtures_dir' is not defined
+    '''
+    def __init__(self, instrument, granularity, fixtures_dir=None, data=None):
+        self.instrument = instrument
+        self.granularity = granularity
+        self.fixtures_dir = fixtures_dir
+        if fixtures_dir is not None:
+            with open(fixture_file(fixtures_dir, instrument, granularity)) as f:
+                data = json.load(f)
+        self.data = data or {'candles': []}
+        self.times = [to_datetime(c['time']) for c in self.data['candles']]
+
+    def query(self, start, end=None, count=None, indir=None):
+        '''
+        Function to get the candles as Connect.query does
+
+        Parameters
+        ----------
+        start : str, Required
+                isoformat datetime
+        end : str, Optional
+              isoformat datetime
+        count : int, Optional
+        indir : str, Optional
+                Ignored
+
+        Returns
+        -------
+        dict with the candles
+        '''
+        start_ix = bisect_left(self.times, datetime.fromisoformat(start.rstrip('Z')))
+        if count is not None:
+            end_ix = start_ix + count
+        elif end is not None:
+            end_ix = bisect_right(self.times, datetime.fromisoformat(end.rstrip('Z')))
+        else:
+            end_ix = len(self.times)
+        return {'instrument': self.instrument,
+                'granularity': self.granularity,
+                'candles': self.data['candles'][start_ix:end_ix]}
+
+    def for_granularity(self, granularity):
+        '''
+        Returns
+        -------
+        ReplayConnect object for 'granularity' or None if
+        the candles were not recorded in a file
+        '''
+        if self.fixtures_dir is None:
+            return None
+        return ReplayConnect(self.instrument, granularity, fixtures_dir=self.fixtures_dir)
+
+class RateLimiter(object):
+    '''
+    This class represents a limit of requests per second shared by
+    the threads of a DataClient
+
+    Class variables
+    ---------------
+    max_rps: float, Required
+             Maximum number of requests per second
+    '''
+    def __init__(self, max_rps):
+        self.interval = 1.0 / max_rps
+        self.next_t = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_t - now
+            self.next_t = max(now, self.next_t) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        '''
+        Function to delay the next requests 'seconds',
+        i.e. after the server has rejected a request
+        '''
+        with self.lock:
+            self.next_t = max(self.next_t, time.monotonic() + seconds)
+
+def is_rate_limited(e):
+    '''
+    Function to check if Exception 'e' is due to the server
+    rate limit (HTTP 429)
+    '''
+    status = getattr(e, 'status_code', None)
+    response = getattr(e, 'response', None)
+    if status is None and response is not None:
+        status = getattr(response, 'status_code', None)
+    return status == 429 or '429' in str(e)
+
+class PooledConnection(object):
+    '''
+    This class represents a connection to an instrument and
+    granularity whose queries are done by a DataClient. It can be
+    used wherever a Connect object is used
+
+    Class variables
+    ---------------
+    client: DataClient object, Required
+    instrument: str, Required
+    granularity: str, Required
+    '''
+    def __init__(self, client, instrument, granularity):
+        self.client = client
+        self.instrument = instrument
+        self.granularity = granularity
+
+    def query(self, **kwargs):
+        return self.client.query(self.instrument, self.granularity, **kwargs)
+
+    def for_granularity(self, granularity):
+        return self.client.connection(self.instrument, granularity)
+
+class DataClient(object):
+    '''
+    This class represents a client of the Oanda's API shared by
+    several instruments. One Connect object is kept for each instrument
+    and granularity, the requests are done concurrently by a bounded
+    pool of threads and failed requests are retried with exponential
+    backoff. If the server rejects a request because of its rate limit,
+    then all the requests are delayed
+
+    Class variables
+    ---------------
+    max_workers: int, Optional
+                 Maximum number of concurrent requests.
+                 Default: [oanda_api]max_workers or 4
+    max_retries: int, Optional
+                 Default: [oanda_api]max_retries or 3
+    backoff: float, Optional
+             Seconds before the first retry. It is doubled in each retry.
+             Default: [oanda_api]backoff or 1
+    max_rps: float, Optional
+             Maximum requests per second. Default: [oanda_api]max_rps or
+             no limit
+    connect_factory: function, Optional
+                     Function with 'instrument' and 'granularity' arguments
+                     returning the object used for the queries, i.e. a
+                     ReplayConnect. Default: oanda.connect.Connect
+    '''
+    def __init__(self, max_workers=None, max_retries=None, backoff=None, max_rps=None,
+                 connect_factory=None):
+        self.max_workers = max_workers or self._setting('max_workers', int, 4)
+        self.max_retries = self._setting('max_retries', int, 3) if max_retries is None else max_retries
+        self.backoff = self._setting('backoff', float, 1.0) if backoff is None else backoff
+        max_rps = max_rps or self._setting('max_rps', float, None)
+        self.limiter = RateLimiter(max_rps) if max_rps else None
+        if connect_factory is None:
+            from oanda.connect import Connect
+            connect_factory = Connect
+        self.connect_factory = connect_factory
+        self.conns = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    @staticmethod
+    def _setting(option, cast, default):
+        if CONFIG.has_option('oanda_api', option):
+            return cast(CONFIG.get('oanda_api', option))
+        return default
+
+    def _connect(self, instrument, granularity):
+        key = (instrument, granularity)
+        with self.lock:
+            if key not in self.conns:
+                self.conns[key] = self.connect_factory(instrument=instrument,
+                                                       granularity=granularity)
+            return self.conns[key]
+
+    def connection(self, instrument, granularity):
+        '''
+        Returns
+        -------
+        PooledConnection object for 'instrument' and 'granularity'
+        '''
+        return PooledConnection(self, instrument, granularity)
+
+    def query(self, instrument, granularity, **kwargs):
+        '''
+        Function to do a query (see Connect.query) retrying
+        it if it fails
+
+        Parameters
+        ----------
+        instrument : str, Required
+        granularity : str, Required
+        **kwargs : passed to Connect.query
+
+        Returns
+        -------
+        dict as returned by Connect.query
+        '''
+        conn = self._connect(instrument, granularity)
+        wait = self.backoff
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                return conn.query(**kwargs)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                if is_rate_limited(e) and self.limiter is not None:
+                    self.limiter.penalize(wait)
+                dc_logger.warning("Query for {0} {1} failed ({2}). Retrying in {3}s".format(instrument,
+                                                                                         granularity,
+                                                                                         e, wait))
+                time.sleep(wait)
+                wait *= 2
+
+    def query_many(self, requests):
+        '''
+        Function to do several queries concurrently
+
+        Parameters
+        ----------
+        requests : list, Required
+                   List of (instrument, granularity, kwargs) tuples
+
+        Returns
+        -------
+        list with the result of each query in the same order as 'requests'
+        '''
+        futures = [self.executor.submit(self.query, instrument, granularity, **kwargs)
+                   for instrument, granularity, kwargs in requests]
+        return [f.result() for f in futures]
+
+    async def aquery(self, instrument, granularity, **kwargs):
+        '''
+        Coroutine version of 'query'
+        '''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,
+                                          lambda: self.query(instrument, granularity, **kwargs))
+
+    async def aquery_many(self, requests):
+        '''
+        Coroutine version of 'query_many'
+        '''
+        return await asyncio.gather(*[self.aquery(instrument, granularity, **kwargs)
+                                      for instrument, granularity, kwargs in requests])
+
+    def close(self):
+        self.executor.shutdown(wait=True)
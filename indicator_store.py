@@ -0,0 +1,299 @@
+import logging
+import hashlib
+import os
+
+import numpy as np
+
+from config import CONFIG
+from candle_access import TimeIndex
+from utils import periodToDelta
+
+# create logger
+is_logger = logging.getLogger(__name__)
+is_logger.setLevel(logging.INFO)
+
+def ewm(values, alpha, block=256):
+    '''
+    Function to calculate the exponential moving average of 'values'
+    as pandas' Series.ewm(alpha=alpha, adjust=False).mean(). The series
+    is processed in blocks of 'block' values, each of them with a
+    single matrix product, so the result is exact without a Python
+    loop over each value
+
+    Parameters
+    ----------
+    values : numpy array, Required
+    alpha : float, Required
+            Smoothing factor
+    block : int, Optional
+
+    Returns
+    -------
+    numpy float64 array
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty(len(values), dtype=np.float64)
+    if len(values) == 0:
+        return out
+    j = np.arange(block)
+    decay = (1 - alpha) ** (j + 1)
+    diff = j[:, None] - j[None, :]
+    weights = np.where(diff >= 0, alpha * (1 - alpha) ** np.maximum(diff, 0), 0.0)
+    out[0] = prev = values[0]
+    for start in range(1, len(values), block):
+        x = values[start:start + block]
+        m = len(x)
+        y = weights[:m, :m] @ x + decay[:m] * prev
+        out[start:start + m] = y
+        prev = y[-1]
+    return out
+
+def rsi(close, period, first=None):
+    '''
+    Function to calculate the RSI as CandleList.calc_rsi does: the
+    first average gain/loss is the mean of the first 'period' changes
+    and the next ones are the exponential moving averages with
+    com=period-1
+
+    Parameters
+    ----------
+    close : numpy array, Required
+            Close prices
+    period : int, Required
+             i.e. [candlelist]rsi_period
+    first : numpy int array, Optional
+            Index of the first price of the lead-in of each price. If
+            defined, then the RSI of each price is the one calculated
+            by CandleList.calc_rsi with the prices from its first one,
+            so it does not depend on the prices before them. It is
+            NaN for the prices with a negative index or with a lead-in
+            of less than 'period' changes
+
+    Returns
+    -------
+    numpy float64 array with one value per price. The
+    first 'period' values are NaN
+    '''
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+    delta = np.diff(close)
+    up = np.where(delta > 0, delta, 0.0)
+    down = np.where(delta < 0, -delta, 0.0)
+    alpha = 1.0 / period
+    if first is None:
+        up[period-1] = up[:period].mean()
+        down[period-1] = down[:period].mean()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = ewm(up[period-1:], alpha) / ewm(down[period-1:], alpha)
+            out[period:] = 100 - 100 / (1 + rs)
+        return out
+    first = np.asarray(first)
+    ix = np.nonzero((first >= 0) & (np.arange(len(close)) - first >= period))[0]
+    # the changes of price i are the ones from 'first[i]+1' to i. The
+    # first average is the mean of the first 'period' changes, until
+    # j, and it decays with the rest of the changes as in the moving
+    # average of all the changes from 0: avg[i] = ewm[i] + (1-alpha)**(i-j) *
+    # (mean[j] - ewm[j])
+    j = first[ix] + period
+    decay = (1 - alpha) ** (ix - j)
+    avgs = []
+    for values in (up, down):
+        moving = ewm(np.r_[0.0, values], alpha)
+        csum = np.r_[0.0, np.cumsum(values)]
+        mean = (csum[j] - csum[j - period]) / period
+        avgs.append(moving[ix] + decay * (mean - moving[j]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[ix] = 100 - 100 / (1 + avgs[0] / avgs[1])
+    return out
+
+class IndicatorStore(object):
+    '''
+    This class represents the indicators of a pair and timeframe,
+    computed once over all the candles loaded by a bot, so the
+    values for each Trade are looked up by index instead of being
+    recalculated from thousands of candles. The RSI of each candle
+    is calculated with the candles of a fixed lead-in before it
+    ([candlelist]period candles), so it does not depend on the
+    range of candles loaded
+
+    Class variables
+    ---------------
+    time: numpy array, Required
+          datetime64[us] with the time of each candle
+    rsi: numpy array, Required
+         float64 with the RSI of each candle
+    rsi_period: int, Required
+    '''
+    # RSI values considered overbought/oversold
+    upper = 70
+    lower = 30
+
+    def __init__(self, time, rsi, rsi_period):
+        self.time = time
+        self.rsi = rsi
+        self.rsi_period = rsi_period
+        self.index = TimeIndex(time)
+
+    @staticmethod
+    def cache_file(cache_dir, instrument, granularity, part, rsi_period, lead_in):
+        return os.path.join(cache_dir, "{0}.{1}.{2}.rsi{3}.{4}.npz".format(instrument, granularity,
+                                                                            part, rsi_period,
+                                                                            lead_in))
+
+    @staticmethod
+    def digest(values):
+        '''
+        Returns
+        -------
+        str with a hash of the prices in 'values'
+        '''
+        return hashlib.sha1(np.ascontiguousarray(values, dtype=np.float64).tobytes()).hexdigest()
+
+    @staticmethod
+    def lead_in_delta(granularity, lead_in=None):
+        '''
+        Function to get the duration of the lead-in of each candle
+
+        Parameters
+        ----------
+        granularity : str, Required
+        lead_in : int, Optional
+                  Number of candles. Default: [candlelist]period
+
+        Returns
+        -------
+        timedelta
+        '''
+        if lead_in is None:
+            lead_in = CONFIG.getint('candlelist', 'period')
+        return periodToDelta(lead_in, granularity)
+
+    @classmethod
+    def from_store(cls, store, rsi_period=None, cache_dir=None, lead_in=None, before=None):
+        '''
+        Function to get the IndicatorStore for the candles in 'store'.
+        If [general]cache_dir is defined, then the series are saved
+        next to the candle cache and reused when they cover 'store'
+        and its lead-in with the same prices. A cached series is only
+        replaced by a series covering it. The cached series are cut to
+        the candles of 'store'
+
+        Parameters
+        ----------
+        store : CandleStore object, Required
+        rsi_period : int, Optional
+                     Default: [candlelist]rsi_period
+        cache_dir : str, Optional
+                    Default: [general]cache_dir
+        lead_in : int, Optional
+                  Number of candles (see 'lead_in_delta') before each
+                  candle used for its RSI. Default: [candlelist]period
+        before : CandleStore object, Optional
+                 Candles from 'lead_in_delta' before the first candle of
+                 'store', used for the lead-in of the first candles. The
+                 RSI of the candles whose lead-in is not loaded is NaN
+
+        Returns
+        -------
+        IndicatorStore object
+        '''
+        if rsi_period is None:
+            rsi_period = CONFIG.getint('candlelist', 'rsi_period')
+        if lead_in is None:
+            lead_in = CONFIG.getint('candlelist', 'period')
+        if cache_dir is None and CONFIG.has_option('general', 'cache_dir'):
+            cache_dir = CONFIG.get('general', 'cache_dir')
+        part = CONFIG.get('general', 'part')
+        time, close = np.asarray(store.time), store.column(part)
+        if len(store) == 0:
+            return cls(time, np.empty(0, dtype=np.float64), rsi_period)
+        nbefore = 0
+        if before is not None:
+            nbefore = int(np.searchsorted(before.time, time[0], side='left'))
+            time = np.concatenate([before.time[:nbefore], time])
+            close = np.concatenate([before.column(part)[:nbefore], close])
+        cache_f = None
+        if cache_dir is not None:
+            cache_f = cls.cache_file(cache_dir, store.instrument, store.granularity, part,
+                                     rsi_period, lead_in)
+            if os.path.exists(cache_f):
+                with np.load(cache_f) as data:
+                    ctime, values, cclose = data['time'], data['rsi'], data['close']
+                start_ix, end_ix = np.searchsorted(ctime, time[[0, -1]])
+                if end_ix < len(ctime) and ctime[start_ix] == time[0] and \
+                        ctime[end_ix] == time[-1] and end_ix - start_ix + 1 == len(time) and \
+                        cls.digest(cclose[start_ix:end_ix+1]) == cls.digest(close):
+                    start_ix += nbefore
+                    return cls(ctime[start_ix:end_ix+1], values[start_ix:end_ix+1], rsi_period)
+                if ctime[0] < time[0] or ctime[-1] > time[-1]:
+                    # the cached series is not replaced by a narrower one
+                    cache_f = None
+        # the lead-in of each candle starts at the first
+        # candle at or after 'lead_in_delta' before it
+        delta = np.timedelta64(cls.lead_in_delta(store.granularity, lead_in))
+        first = np.searchsorted(time, time - delta, side='left')
+        # the lead-in is loaded from this time
+        loaded = time[nbefore] if before is None else time[nbefore] - delta
+        first[time - delta < loaded] = -1
+        values = rsi(close, rsi_period, first=first)
+        if cache_f is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_f = "{0}.{1}.tmp".format(cache_f, os.getpid())
+            with open(tmp_f, 'wb') as f:
+                np.savez(f, time=time, rsi=values, close=close)
+            os.replace(tmp_f, cache_f)
+        return cls(time[nbefore:], values[nbefore:], rsi_period)
+
+    def rsi_at(self, dt):
+        '''
+        Returns
+        -------
+        float with the RSI of the last candle at or before 'dt' or None
+        '''
+        ix = self.index.floor(dt)
+        if ix is None or np.isnan(self.rsi[ix]):
+            return None
+        return float(self.rsi[ix])
+
+    def rsi_window(self, dt, n):
+        '''
+        Function to get the RSI of the last 'n' candles
+        until 'dt', including the candle at 'dt'
+
+        Returns
+        -------
+        numpy float64 array
+        '''
+        ix = self.index.floor(dt)
+        if ix is None:
+            return np.empty(0, dtype=np.float64)
+        values = self.rsi[max(ix - n + 1, 0):ix + 1]
+        return values[~np.isnan(values)]
+
+    def set_trade_attrs(self, t, n=None):
+        '''
+        Function to set the RSI attributes of Trade 't' that have not
+        been set yet: 'entry_onrsi' (True if the RSI at t.start is
+        overbought or oversold) and 'max_min_rsi' (maximum RSI for
+        a short trade and minimum for a long one in the last 'n'
+        candles until t.start, including the candle at t.start)
+
+        Parameters
+        ----------
+        t : Trade object, Required
+        n : int, Optional
+            Default: [counter]rsi_period
+        '''
+        if n is None:
+            n = CONFIG.getint('counter', 'rsi_period')
+        value = self.rsi_at(t.start)
+        if value is None:
+            return
+        if getattr(t, 'entry_onrsi', None) is None:
+            t.entry_onrsi = value >= self.upper or value <= self.lower
+        if getattr(t, 'max_min_rsi', None) is None:
+            window = self.rsi_window(t.start, n)
+            extreme = window.max() if t.type == 'short' else window.min()
+            t.max_min_rsi = round(float(extreme), 2)
@@ -0,0 +1,259 @@
+import logging
+import json
+import os
+import threading
+import time
+
+from config import CONFIG
+
+# create logger
+i_logger = logging.getLogger(__name__)
+i_logger.setLevel(logging.INFO)
+
+class Histogram(object):
+    '''
+    This class represents the distribution of the values
+    recorded for a span (seconds)
+
+    Class variables
+    ---------------
+    bounds: tuple
+            Upper bounds of the buckets. The last bucket
+            has the values greater than the last bound
+    count: int
+    total: float
+    min: float
+    max: float
+    buckets: list
+             Number of values in each bucket
+    '''
+    bounds = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0)
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(self.bounds) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        ix = 0
+        while ix < len(self.bounds) and value > self.bounds[ix]:
+            ix += 1
+        self.buckets[ix] += 1
+
+    def to_dict(self):
+        return {'count': self.count,
+                'total': self.total,
+                'mean': self.total / self.count if self.count else None,
+                'min': self.min,
+                'max': self.max,
+                'buckets': dict(zip([str(b) for b in self.bounds] + ['inf'], self.buckets))}
+
+class Span(object):
+    '''
+    This class represents a timed section of code. It is
+    used as a context manager (see 'span')
+    '''
+    __slots__ = ('registry', 'name', 't0')
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.t0 = None
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.record(self.name, time.perf_counter() - self.t0)
+        return False
+
+class NullSpan(object):
+    '''
+    Span used when the instrumentation is disabled. It does nothing
+    '''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Registry(object):
+    '''
+    This class represents the spans and counters recorded by the
+    bots. Spans and counters from the artifacts thread are
+    also recorded, so access is serialized with a lock
+
+    Class variables
+    ---------------
+    enabled: Bool
+    spans: dict
+           Histogram for each span name
+    counters: dict
+              Value of each counter name
+    stream: file object
+            If defined, then each value recorded is written to this
+            file as a JSON line
+    '''
+    def __init__(self, enabled=False, stream=None):
+        self.enabled = enabled
+        self.spans = {}
+        self.counters = {}
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def record(self, name, value):
+        with self.lock:
+            hist = self.spans.get(name)
+            if hist is None:
+                hist = self.spans[name] = Histogram()
+            hist.add(value)
+            if self.stream is not None:
+                self.stream.write(json.dumps({'span': name, 'value': value, 'time': time.time()}) + "\n")
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+            if self.stream is not None:
+                self.stream.write(json.dumps({'counter': name, 'value': n, 'time': time.time()}) + "\n")
+
+    def report(self):
+        '''
+        Returns
+        -------
+        dict with the histogram of each span and the counters
+        '''
+        with self.lock:
+            return {'spans': {n: h.to_dict() for n, h in sorted(self.spans.items())},
+                    'counters': dict(sorted(self.counters.items()))}
+
+    def reset(self):
+        with self.lock:
+            self.spans = {}
+            self.counters = {}
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+REGISTRY = Registry()
+
+def configure():
+    '''
+    Function to enable or disable the instrumentation depending on
+    [instrumentation]enabled. It is called at the start of each run,
+    so the spans and counters of previous runs are discarded. If
+    [instrumentation]stream is defined, then the values recorded are
+    also appended to that file until 'close' is called
+    '''
+    enabled = False
+    if CONFIG.has_option('instrumentation', 'enabled'):
+        enabled = CONFIG.getboolean('instrumentation', 'enabled')
+    REGISTRY.reset()
+    REGISTRY.enabled = enabled
+    stream = None
+    if enabled is True and CONFIG.has_option('instrumentation', 'stream'):
+        stream = CONFIG.get('instrumentation', 'stream')
+    if REGISTRY.stream is not None and REGISTRY.stream.name != stream:
+        REGISTRY.close()
+    if stream is not None and REGISTRY.stream is None:
+        REGISTRY.stream = open(stream, 'a', buffering=1)
+
+def close():
+    '''
+    Function to close the file of [instrumentation]stream
+    '''
+    with REGISTRY.lock:
+        REGISTRY.close()
+
+def span(name):
+    '''
+    Function to time a section of code:
+
+        with span('calc_SR'):
+            ...
+
+    Parameters
+    ----------
+    name : str, Required
+
+    Returns
+    -------
+    Span object or NULL_SPAN if the instrumentation is disabled
+    '''
+    if REGISTRY.enabled is False:
+        return NULL_SPAN
+    return Span(REGISTRY, name)
+
+def count(name, n=1):
+    '''
+    Function to increase the counter 'name' by 'n'
+    '''
+    if REGISTRY.enabled is False:
+        return
+    REGISTRY.count(name, n)
+
+def report_file(name=None):
+    '''
+    Function to get the file where the report of a run is written.
+    The name of the run is added to [instrumentation]report, so
+    each run (i.e. each job of a batch) writes its own report
+
+    Parameters
+    ----------
+    name : str, Optional
+           Name of the run. i.e. AUD_USD.D.2018-01-01T220000
+
+    Returns
+    -------
+    str or None if [instrumentation]report is not defined
+    '''
+    if not CONFIG.has_option('instrumentation', 'report'):
+        return None
+    outfile = CONFIG.get('instrumentation', 'report')
+    if name is None:
+        return outfile
+    root, ext = os.path.splitext(outfile)
+    return "{0}.{1}{2}".format(root, name, ext)
+
+def export(outfile=None, name=None):
+    '''
+    Function to get the report with the spans and counters recorded
+    since the run started (see 'configure'). It is written to
+    'outfile' or to the 'report_file' of the run if any of
+    them is defined
+
+    Parameters
+    ----------
+    outfile : str, Optional
+    name : str, Optional
+           Name of the run. See 'report_file'
+
+    Returns
+    -------
+    dict as returned by Registry.report or None if the
+    instrumentation is disabled
+    '''
+    if REGISTRY.enabled is False:
+        return None
+    report = REGISTRY.report()
+    if outfile is None:
+        outfile = report_file(name)
+    if outfile is not None:
+        with open(outfile, 'w') as f:
+            json.dump(report, f, indent=1)
+        i_logger.info("Instrumentation report written to {0}".format(outfile))
+    return report
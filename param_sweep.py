@@ -0,0 +1,224 @@
+'''
+Run TradeBot for every combination of a grid of settings
+using a pool of processes
+
+Usage: python param_sweep.py --pair AUD_USD --timeframe D
+                             --start '2018-01-01 22:00:00'
+                             --end '2019-01-01 22:00:00'
+                             --grid 'trade_bot.th=0.6,0.7;trade_bot.n_SL=5,10'
+                             --outfile sweep.csv
+'''
+import logging
+import argparse
+import os
+import csv
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from config import config_to_dict
+from batch_runner import Job, prefetch, run_job
+from sr_cache import SR_SETTINGS
+from trade_records import get_colnames
+
+# create logger
+ps_logger = logging.getLogger(__name__)
+ps_logger.setLevel(logging.INFO)
+
+def expand_grid(grid):
+    '''
+    Function to get every combination of the values in 'grid'
+
+    Parameters
+    ----------
+    grid : dict, Required
+           Dict with (section, option) tuples as keys and lists of
+           values. i.e. {('trade_bot', 'th'): [0.6, 0.7]}
+
+    Returns
+    -------
+    list of dicts with (section, option) as keys and one value
+    '''
+    keys = sorted(grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*[grid[k] for k in keys])]
+
+def sr_key(overrides):
+    '''
+    Function to get the part of 'overrides' that changes
+    the S/R areas (see sr_cache.SR_SETTINGS)
+
+    Parameters
+    ----------
+    overrides : dict, Required
+
+    Returns
+    -------
+    tuple
+    '''
+    key = []
+    for (section, option), value in sorted(overrides.items()):
+        if (section, option) in SR_SETTINGS or (section, None) in SR_SETTINGS:
+            key.append((section, option, str(value)))
+    return tuple(key)
+
+def group_jobs(jobs, ngroups):
+    '''
+    Function to group the Jobs that share the same S/R settings, so
+    the HAreaLists are only calculated once per group. Big groups are
+    split so there are at least 'ngroups' groups if possible
+
+    Parameters
+    ----------
+    jobs : list of Job, Required
+    ngroups : int, Required
+
+    Returns
+    -------
+    list of lists of Job
+    '''
+    groups = {}
+    for job in jobs:
+        groups.setdefault(sr_key(job.overrides or {}), []).append(job)
+    groups = list(groups.values())
+    while len(groups) < ngroups:
+        groups.sort(key=len)
+        big = groups.pop()
+        if len(big) < 2:
+            groups.append(big)
+            break
+        groups.extend([big[:len(big)//2], big[len(big)//2:]])
+    return groups
+
+def run_group(jobs, settings):
+    '''
+    Function to run sequentially a group of Jobs in the same
+    process, sharing the HAreaLists between them
+
+    Parameters
+    ----------
+    jobs : list of Job, Required
+    settings : dict, Required
+               Dict of dicts as returned by config_to_dict
+
+    Returns
+    -------
+    list of JobResult objects
+    '''
+    SR_memo = {}
+    return [run_job(job, settings, SR_memo=SR_memo) for job in jobs]
+
+def run_sweep(pair, timeframe, start, end, grid, workers=None, settings=None):
+    '''
+    Function to run TradeBot for every combination of the
+    settings in 'grid'
+
+    Parameters
+    ----------
+    pair : str, Required
+    timeframe : str, Required
+    start : str, Required
+    end : str, Required
+    grid : dict, Required
+           Dict with (section, option) tuples as keys and lists of values
+    workers : int, Optional
+              Number of processes. Default: number of CPUs
+    settings : dict, Optional
+               Dict of dicts with the base settings. Default: the current CONFIG
+
+    Returns
+    -------
+    list of JobResult objects
+    '''
+    settings = settings or config_to_dict()
+    jobs = [Job(pair=pair, timeframe=timeframe, start=start, end=end, overrides=o)
+            for o in expand_grid(grid)]
+    # the candles are loaded once and shared by all the configurations
+    prefetch(jobs)
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_group, group, settings)
+                   for group in group_jobs(jobs, workers)]
+        results = []
+        for future in futures:
+            for res in future.result():
+                if res.error is not None:
+                    ps_logger.error("Configuration {0} failed:\n{1}".format(res.job.overrides, res.error))
+                results.append(res)
+    return results
+
+def trades_table(results, colnames=None):
+    '''
+    Function to get a table with one row per trade and configuration
+
+    Parameters
+    ----------
+    results : list of JobResult, Required
+    colnames : list, Optional
+               Trade attributes used as columns. Default: [trade_journal]colnames
+
+    Returns
+    -------
+    list of dicts
+    '''
+    colnames = colnames or get_colnames()
+    rows = []
+    for res in results:
+        params = {"{0}.{1}".format(s, o): v for (s, o), v in (res.job.overrides or {}).items()}
+        for t in res.tlist or []:
+            row = dict(params)
+            row['pair'] = res.job.pair
+            for c in colnames:
+                row[c] = getattr(t, c, None)
+            rows.append(row)
+    return rows
+
+def write_table(rows, outfile):
+    '''
+    Function to write the rows returned by 'trades_table' to a CSV file
+
+    Parameters
+    ----------
+    rows : list of dicts, Required
+    outfile : str, Required
+    '''
+    fieldnames = []
+    for row in rows:
+        fieldnames.extend([k for k in row.keys() if k not in fieldnames])
+    with open(outfile, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def parse_grid(grid_str):
+    '''
+    Function to parse a grid from a str like
+    'trade_bot.th=0.6,0.7;pivots.th_bounces=0.01,0.02'
+
+    Returns
+    -------
+    dict with (section, option) tuples as keys and lists of values
+    '''
+    grid = {}
+    for item in grid_str.split(';'):
+        name, values = item.split('=')
+        section, option = name.strip().split('.')
+        grid[(section, option)] = [v.strip() for v in values.split(',')]
+    return grid
+
+def main():
+    parser = argparse.ArgumentParser(description='Run TradeBot over a grid of settings')
+    parser.add_argument('--pair', type=str, required=True, help='i.e. AUD_USD')
+    parser.add_argument('--timeframe', type=str, required=True, help='i.e. D')
+    parser.add_argument('--start', type=str, required=True, help="i.e. '2018-01-01 22:00:00'")
+    parser.add_argument('--end', type=str, required=True, help="i.e. '2019-01-01 22:00:00'")
+    parser.add_argument('--grid', type=str, required=True,
+                        help="i.e. 'trade_bot.th=0.6,0.7;pivots.th_bounces=0.01,0.02'")
+    parser.add_argument('--workers', type=int, default=None, help='Number of processes')
+    parser.add_argument('--outfile', type=str, required=True, help='Output CSV file')
+    args = parser.parse_args()
+
+    results = run_sweep(args.pair, args.timeframe, args.start, args.end,
+                        parse_grid(args.grid), workers=args.workers)
+    write_table(trades_table(results), args.outfile)
+
+if __name__ == '__main__':
+    main()
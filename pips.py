@@ -0,0 +1,171 @@
+'''
+Pip arithmetic for the traded instruments. The pip location of each
+instrument is looked up once and cached, so the functions below do
+not parse the pair name each time they are called. The *_array
+functions take NumPy arrays of prices and apply the pips to the
+whole vector at once
+'''
+from functools import lru_cache
+
+import numpy as np
+
+# pip location (power of 10) for quote currencies not
+# following the 4th decimal convention
+PIP_LOCATIONS = {
+    'JPY': -2,
+    'HUF': -2,
+    'THB': -2,
+    'INR': -2,
+    'CZK': -3
+}
+
+DEFAULT_PIP_LOCATION = -4
+
+@lru_cache(maxsize=None)
+def pip_location(pair):
+    '''
+    Function to get the power of 10 of a pip for 'pair'
+
+    Parameters
+    ----------
+    pair : str, Required
+           Currency pair. i.e. AUD_USD
+
+    Returns
+    -------
+    int. i.e. -4 for AUD_USD, -2 for USD_JPY, -3 for EUR_CZK
+    '''
+    (first, second) = pair.split("_")
+    if first == 'JPY' or second == 'JPY':
+        # JPY as base currency has been traded with the JPY pip size
+        return PIP_LOCATIONS['JPY']
+    return PIP_LOCATIONS.get(second, DEFAULT_PIP_LOCATION)
+
+@lru_cache(maxsize=None)
+def precision(pair):
+    '''
+    Returns
+    -------
+    tuple (ndigits, divisor). 'ndigits' is the number of decimals of
+    a pip and 'divisor' is the number of pips in 1 unit of price
+    '''
+    ndigits = -pip_location(pair)
+    return ndigits, 10**ndigits
+
+def pip_size(pair):
+    '''
+    Returns
+    -------
+    float with the price value of 1 pip. i.e. 0.0001 for AUD_USD
+    '''
+    return 1 / precision(pair)[1]
+
+def price2pips(pair, price):
+    '''
+    Function to calculate the number of pips
+    for a given price
+
+    Parameters
+    ----------
+    pair : str, Required
+           Currency pair. i.e. AUD_USD
+    price : float, Required
+
+    Returns
+    -------
+    float with the number of pips rounded to 1 decimal
+    '''
+    return round(price * precision(pair)[1], 1)
+
+def add_pips(pair, price, pips):
+    '''
+    Function that rounds 'price' to the pip precision
+    of 'pair' and adds 'pips' to it
+
+    Parameters
+    ----------
+    pair : str, Required
+           Currency pair. i.e. AUD_USD
+    price : float, Required
+    pips : int, Required
+           Number of pips to increase
+
+    Returns
+    -------
+    float
+    '''
+    ndigits, divisor = precision(pair)
+    return round(price, ndigits) + (pips / divisor)
+
+def substract_pips(pair, price, pips):
+    '''
+    Function that rounds 'price' to the pip precision
+    of 'pair' and substracts 'pips' from it
+
+    Parameters
+    ----------
+    pair : str, Required
+           Currency pair. i.e. AUD_USD
+    price : float, Required
+    pips : int, Required
+           Number of pips to decrease
+
+    Returns
+    -------
+    float
+    '''
+    ndigits, divisor = precision(pair)
+    return round(price, ndigits) - (pips / divisor)
+
+def price2pips_array(pair, prices):
+    '''
+    Vectorized version of 'price2pips'
+
+    Parameters
+    ----------
+    pair : str, Required
+    prices : numpy float array, Required
+
+    Returns
+    -------
+    numpy float array
+    '''
+    return np.round(np.asarray(prices, dtype=float) * precision(pair)[1], 1)
+
+def add_pips_array(pair, prices, pips):
+    '''
+    Vectorized version of 'add_pips'
+
+    Parameters
+    ----------
+    pair : str, Required
+    prices : numpy float array, Required
+    pips : int or numpy array, Required
+           Number of pips to increase for all the prices
+           or for each of them
+
+    Returns
+    -------
+    numpy float array
+    '''
+    ndigits, divisor = precision(pair)
+    return np.round(np.asarray(prices, dtype=float), ndigits) + (np.asarray(pips) / divisor)
+
+def substract_pips_array(pair, prices, pips):
+    '''
+    Vectorized version of 'substract_pips'
+
+    Parameters
+    ----------
+    pair : str, Required
+    prices : numpy float array, Required
+    pips : int or numpy array, Required
+           Number of pips to decrease for all the prices
+           or for each of them
+
+    Returns
+    -------
+    numpy float array
+    '''
+    ndigits, divisor = precision(pair)
+    return np.round(np.asarray(prices, dtype=float), ndigits) - (np.asarray(pips) / divisor)
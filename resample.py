@@ -0,0 +1,220 @@
+import logging
+from datetime import timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from oanda.connect import Connect
+from config import CONFIG
+from utils import periodToDelta
+from candle_store import CandleStore
+
+# create logger
+rs_logger = logging.getLogger(__name__)
+rs_logger.setLevel(logging.INFO)
+
+US = timedelta(microseconds=1)
+
+def granularity_delta(granularity):
+    '''
+    Function to get the duration of a candle
+
+    Parameters
+    ----------
+    granularity : str, Required
+                  i.e. M15,M30,H1,H4,D
+
+    Returns
+    -------
+    datetime timedelta object
+    '''
+    return periodToDelta(1, granularity)
+
+def alignment():
+    '''
+    Function to get the alignment of the candles used by Oanda,
+    defined in [oanda_api]dailyAlignment and [oanda_api]alignmentTimezone.
+    The candles of each granularity start at the 'dailyAlignment' hour
+    in the 'alignmentTimezone' timezone
+
+    Returns
+    -------
+    tuple (hour, timezone). Default: (17, 'America/New_York'),
+    as Oanda's API
+    '''
+    values = []
+    for option in ('dailyAlignment', 'alignmentTimezone'):
+        if CONFIG.has_option('oanda_api', option):
+            values.append(CONFIG.get('oanda_api', option))
+    hour = [v for v in values if v.isdigit()]
+    tz = [v for v in values if not v.isdigit()]
+    # the values are recognised by their format as they are
+    # swapped in some settings files
+    return (int(hour[0]) if hour else 17,
+            tz[0] if tz else 'America/New_York')
+
+def utc_offsets(times, tz):
+    '''
+    Function to get the UTC offset of 'tz' at each time.
+    The offset is looked up once per distinct hour
+
+    Parameters
+    ----------
+    times : numpy array, Required
+            datetime64[us] with UTC times
+    tz : str, Required
+         i.e. Europe/London
+
+    Returns
+    -------
+    numpy int64 array with the offsets in microseconds
+    '''
+    tzinfo = ZoneInfo(tz)
+    hours, inv = np.unique(times.astype('datetime64[h]'), return_inverse=True)
+    offsets = np.array([h.item().replace(tzinfo=timezone.utc).astimezone(tzinfo).utcoffset() // US
+                        for h in hours], dtype=np.int64)
+    return offsets[inv.reshape(-1)]
+
+def candle_starts(times, granularity, hour=None, tz=None):
+    '''
+    Function to get the time of the candle of 'granularity' that
+    contains each time, aligned as Oanda does. The UTC offset at each
+    time is used, which only differs from the one at the start of
+    the candle if a DST change happens within the candle
+
+    Parameters
+    ----------
+    times : numpy array, Required
+            datetime64[us] with UTC times
+    granularity : str, Required
+    hour : int, Optional
+           Default: see 'alignment'
+    tz : str, Optional
+         Default: see 'alignment'
+
+    Returns
+    -------
+    numpy datetime64[us] array
+    '''
+    if hour is None or tz is None:
+        dhour, dtz = alignment()
+        hour = dhour if hour is None else hour
+        tz = dtz if tz is None else tz
+    step = granularity_delta(granularity) // US
+    shift = timedelta(hours=hour) // US
+    offsets = utc_offsets(times, tz)
+    local = times.astype(np.int64) + offsets
+    starts = (local - shift) // step * step + shift - offsets
+    return starts.astype('datetime64[us]')
+
+def can_resample(base, granularity):
+    '''
+    Function to check if the candles of 'granularity' can be
+    derived from the candles of 'base'
+
+    Returns
+    -------
+    bool
+    '''
+    bdelta = granularity_delta(base)
+    delta = granularity_delta(granularity)
+    return (delta >= bdelta and delta % bdelta == timedelta(0)
+            and timedelta(hours=24) % delta == timedelta(0))
+
+def base_granularity(granularity):
+    '''
+    Function to get the granularity from which the candles of
+    'granularity' are derived, defined in [general]base_granularity
+
+    Returns
+    -------
+    str or None if [general]base_granularity is not defined, is
+    'granularity' itself or 'granularity' can not be derived from it
+    '''
+    if not CONFIG.has_option('general', 'base_granularity'):
+        return None
+    base = CONFIG.get('general', 'base_granularity')
+    if base == granularity or not can_resample(base, granularity):
+        return None
+    return base
+
+def base_range(start, end, granularity, base):
+    '''
+    Function to get the range of 'base' candles needed for
+    deriving the candles of 'granularity' from 'start' to 'end'
+
+    Returns
+    -------
+    tuple (start, end) with datetimes
+    '''
+    starts = candle_starts(np.array([start, end], dtype='datetime64[us]'), granularity)
+    bend = starts[1].item() + granularity_delta(granularity) - granularity_delta(base)
+    return starts[0].item(), bend
+
+def for_granularity(conn, granularity):
+    '''
+    Function to get a connection like 'conn' for 'granularity'
+
+    Parameters
+    ----------
+    conn : Connect object, Required
+    granularity : str, Required
+
+    Returns
+    -------
+    Connect object or None if 'conn' can not be used for other
+    granularity. If 'conn' has no 'for_granularity', then it is
+    a new Connect object for the instrument of 'conn'
+    '''
+    if hasattr(conn, 'for_granularity'):
+        return conn.for_granularity(granularity)
+    return Connect(instrument=conn.instrument,
+                   granularity=granularity)
+
+def resample(store, granularity, hour=None, tz=None):
+    '''
+    Function to derive the candles of 'granularity' from the candles
+    in 'store'. The open prices are the ones of the first candle, the
+    close prices the ones of the last candle, the high/low prices are
+    the maximum/minimum and the volume is the sum. A candle is complete
+    if all its candles are complete and the last one is not cut short
+    by the end of 'store'
+
+    Parameters
+    ----------
+    store : CandleStore object, Required
+    granularity : str, Required
+    hour : int, Optional
+    tz : str, Optional
+         See 'candle_starts'
+
+    Returns
+    -------
+    CandleStore object
+    '''
+    records = np.empty(0, dtype=CandleStore.dtype)
+    if len(store) > 0:
+        starts = candle_starts(store.time, granularity, hour=hour, tz=tz)
+        first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+        last = np.r_[first[1:] - 1, len(starts) - 1]
+        records = np.empty(len(first), dtype=CandleStore.dtype)
+        records['time'] = starts[first]
+        for f in CandleStore.fields:
+            col = getattr(store, f)
+            if f.startswith('open'):
+                records[f] = col[first]
+            elif f.startswith('close'):
+                records[f] = col[last]
+            elif f.startswith('high'):
+                records[f] = np.maximum.reduceat(col, first)
+            else:
+                records[f] = np.minimum.reduceat(col, first)
+        records['volume'] = np.add.reduceat(store.volume, first)
+        records['complete'] = np.minimum.reduceat(store.complete.astype(np.uint8), first) == 1
+        bdelta = np.timedelta64(granularity_delta(store.granularity), 'us')
+        delta = np.timedelta64(granularity_delta(granularity), 'us')
+        if store.time[-1] + bdelta < records['time'][-1] + delta:
+            records['complete'][-1] = False
+    return CandleStore.from_records(records,
+                                    instrument=store.instrument,
+                                    granularity=granularity)
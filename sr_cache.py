@@ -0,0 +1,176 @@
+import logging
+import fcntl
+import hashlib
+import os
+import pickle
+
+from config import CONFIG
+
+# create logger
+sc_logger = logging.getLogger(__name__)
+sc_logger.setLevel(logging.INFO)
+
+# settings that change the S/R areas calculated for a given window
+SR_SETTINGS = [('general', 'part'),
+               ('general', 'bit'),
+               ('pivots', None),
+               ('harea', None),
+               ('trade_bot', 'th'),
+               ('trade_bot', 'add_pips'),
+               ('trade_bot', 'period_range')]
+
+def sr_settings():
+    '''
+    Function to get the current values of the settings in SR_SETTINGS.
+    A None option means all the options in the section
+
+    Returns
+    -------
+    tuple of (section, option, value) tuples
+    '''
+    values = []
+    for section, option in SR_SETTINGS:
+        if not CONFIG.has_section(section):
+            continue
+        if option is None:
+            values.extend([(section, k, v) for k, v in sorted(CONFIG.items(section, raw=True))])
+        elif CONFIG.has_option(section, option):
+            values.append((section, option, CONFIG.get(section, option, raw=True)))
+    return tuple(values)
+
+def halist_key(pair, timeframe, clO):
+    '''
+    Function to get the key of the HAreaList calculated with
+    'clO'. It is a hash of the pair, the timeframe, the first and
+    last candles of 'clO' and the settings in SR_SETTINGS
+
+    Parameters
+    ----------
+    pair : str, Required
+    timeframe : str, Required
+    clO : CandleList object, Required
+
+    Returns
+    -------
+    str or None if 'clO' has no candles
+    '''
+    if len(clO.clist) == 0:
+        return None
+    first, last = clO.clist[0], clO.clist[-1]
+    content = (pair, timeframe, len(clO.clist),
+               str(first.time), str(last.time),
+               getattr(last, 'closeAsk', None), getattr(last, 'closeBid', None),
+               sr_settings())
+    return hashlib.sha1(repr(content).encode()).hexdigest()
+
+class SRCache(object):
+    '''
+    This class represents a persistent cache of HAreaLists. Each
+    HAreaList is pickled to a file named after its key (see 'halist_key')
+    and the files are replaced atomically, so several processes can
+    use the cache at the same time. When the total size of the files
+    is over 'max_size', then the least recently used ones are removed
+
+    Class variables
+    ---------------
+    cache_dir: str, Required
+               Folder used to store the cache files
+    max_size: int, Optional
+              Maximum size in MB. Default: [trade_bot]sr_cache_size or 512
+    '''
+    def __init__(self, cache_dir, max_size=None):
+        self.cache_dir = cache_dir
+        if max_size is None:
+            max_size = 512
+            if CONFIG.has_option('trade_bot', 'sr_cache_size'):
+                max_size = CONFIG.getint('trade_bot', 'sr_cache_size')
+        self.max_size = max_size
+        self.lock_f = os.path.join(cache_dir, "sr_cache.lock")
+        self.hits = self.misses = 0
+
+    def _file(self, key):
+        return os.path.join(self.cache_dir, "{0}.pkl".format(key))
+
+    def get(self, key):
+        '''
+        Function to get the HAreaList for 'key'
+
+        Returns
+        -------
+        HAreaList object or None if it is not in the cache
+        '''
+        cache_f = self._file(key)
+        try:
+            with open(cache_f, 'rb') as f:
+                SRlst = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        try:
+            # the modification time is used as the last access time
+            os.utime(cache_f)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return SRlst
+
+    def put(self, key, SRlst):
+        '''
+        Function to store the HAreaList for 'key'
+
+        Parameters
+        ----------
+        key : str, Required
+        SRlst : HAreaList object, Required
+        '''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_f = "{0}.{1}.tmp".format(self._file(key), os.getpid())
+        with open(tmp_f, 'wb') as f:
+            pickle.dump(SRlst, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_f, self._file(key))
+        self.evict()
+
+    def evict(self):
+        '''
+        Function to remove the least recently used files
+        until the cache is not bigger than 'max_size'
+        '''
+        with open(self.lock_f, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith('.pkl'):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+            total = sum(e[1] for e in entries)
+            max_bytes = self.max_size * 1024 * 1024
+            for mtime, size, path in sorted(entries):
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+_SR_CACHE = None
+
+def get_sr_cache():
+    '''
+    Returns
+    -------
+    SRCache object for [trade_bot]sr_cache_dir or None
+    if it is not defined
+    '''
+    global _SR_CACHE
+    if not CONFIG.has_option('trade_bot', 'sr_cache_dir'):
+        return None
+    cache_dir = CONFIG.get('trade_bot', 'sr_cache_dir')
+    if _SR_CACHE is None or _SR_CACHE.cache_dir != cache_dir:
+        _SR_CACHE = SRCache(cache_dir)
+    return _SR_CACHE
@@ -2,7 +2,12 @@ import pytest
 import glob
 import os
 import pdb
+import json
+import random
+import datetime
 
+from config import config_to_dict, reset_config
+from data_client import fixture_file
 from trade_bot import TradeBot
 
 @pytest.fixture(autouse=True)
@@ -31,3 +36,63 @@ def tb_object():
             start='2020-06-29 22:00:00',
             end='2020-07-01 22:00:00')
     return tb
+
+def random_candles(start, ncandles, delta, seed=1):
+    """
+    List of candles as returned by Connect.query with
+    a random walk of prices. Saturdays are skipped
+    """
+    random.seed(seed)
+    price = 0.75
+    candles = []
+    t = start
+    while len(candles) < ncandles:
+        if t.weekday() != 5:
+            o = price
+            price = price + random.gauss(0, 0.006)
+            c = {'time': t.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                 'volume': 100,
+                 'complete': True}
+            high = max(o, price) + abs(random.gauss(0, 0.002))
+            low = min(o, price) - abs(random.gauss(0, 0.002))
+            for bit, spread in (('Ask', 0.0002), ('Bid', 0.0)):
+                c['open'+bit] = round(o + spread, 5)
+                c['close'+bit] = round(price + spread, 5)
+                c['high'+bit] = round(high + spread, 5)
+                c['low'+bit] = round(low + spread, 5)
+            candles.append(c)
+        t = t + delta
+    return candles
+
+@pytest.fixture
+def replay_dir(tmp_path):
+    """
+    Folder with 400 recorded daily AUD_USD candles from 2018-06-01,
+    replayed with data_client.ReplayConnect
+    """
+    fixtures_dir = tmp_path / "fixtures"
+    fixtures_dir.mkdir()
+    candles = random_candles(datetime.datetime(2018, 6, 1, 21, 0, 0), 400,
+                             datetime.timedelta(days=1))
+    with open(fixture_file(str(fixtures_dir), 'AUD_USD', 'D'), 'w') as f:
+        json.dump({'instrument': 'AUD_USD', 'granularity': 'D', 'candles': candles}, f)
+    return str(fixtures_dir)
+
+@pytest.fixture
+def bot_settings(tmp_path):
+    """
+    Settings for running TradeBot over the 'replay_dir' candles
+    with the outputs in 'tmp_path'. CONFIG is restored afterwards
+    """
+    saved = config_to_dict()
+    outdir = tmp_path / "imgs"
+    (outdir / "srareas").mkdir(parents=True)
+    settings = config_to_dict()
+    settings['images']['outdir'] = str(outdir)
+    settings['images']['artifacts'] = 'none'
+    settings['trade_bot']['period_range'] = '100'
+    settings['trade_bot']['period'] = '5'
+    settings['trade_bot']['n_sl'] = '7'
+    settings['trade_bot']['checkpoint_dir'] = str(tmp_path / "checkpoints")
+    yield settings
+    reset_config(saved)
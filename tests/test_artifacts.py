@@ -0,0 +1,77 @@
+import pytest
+import os
+import threading
+
+from types import SimpleNamespace
+from config import reset_config
+from artifacts import ArtifactWriter
+from benchmark import replay
+import trade_bot
+from trade_bot import TradeBot, calc_SR_plot
+
+def test_modes(tmp_path):
+    """
+    Check when the artifacts are written in each mode
+    """
+    for mode in ArtifactWriter.modes:
+        outfile = str(tmp_path / "{0}.txt".format(mode))
+        writer = ArtifactWriter(mode=mode)
+        writer.write_text(outfile, lambda: mode)
+        if mode == 'sync':
+            assert os.path.exists(outfile)
+        writer.close()
+        assert os.path.exists(outfile) is (mode != 'none')
+    with pytest.raises(Exception):
+        ArtifactWriter(mode='later')
+
+def test_async_thread(tmp_path):
+    """
+    Check that all the artifacts are written by the same thread
+    other than the caller's and that the errors are not raised
+    """
+    threads = []
+    writer = ArtifactWriter(mode='async')
+    for i in range(3):
+        writer.submit(lambda: threads.append(threading.get_ident()))
+    writer.submit(lambda: 1/0)
+    writer.close()
+    assert len(set(threads)) == 1
+    assert threads[0] != threading.get_ident()
+
+@pytest.mark.parametrize("mode", ['async', 'none'])
+def test_calc_SR_plot(mode, tmp_path, monkeypatch):
+    """
+    Check that calc_SR does not plot out of the sync mode and
+    that the plot is only submitted in the async mode
+    """
+    calls = []
+    SRlst = SimpleNamespace(plot=lambda clO, outfile: calls.append(('plot', outfile)))
+    monkeypatch.setattr(trade_bot, 'calc_SR',
+                        lambda clO, outfile: calls.append(('calc_SR', outfile)) or SRlst)
+    outfile = str(tmp_path / "halist.png")
+    writer = ArtifactWriter(mode=mode)
+    assert calc_SR_plot(SimpleNamespace(clist=[]), outfile=outfile, writer=writer) is SRlst
+    writer.close()
+    expected = [('calc_SR', None)]
+    if mode == 'async':
+        expected.append(('plot', outfile))
+    assert calls == expected
+
+@pytest.mark.parametrize("mode", ['sync', 'async', 'none'])
+def test_run_artifacts(mode, replay_dir, bot_settings):
+    """
+    Check the S/R reports and plots written by TradeBot.run
+    """
+    bot_settings['images']['artifacts'] = mode
+    del bot_settings['trade_bot']['checkpoint_dir']
+    reset_config(bot_settings)
+    with replay(replay_dir):
+        tb = TradeBot(pair='AUD_USD', timeframe='D', start='2019-01-07 21:00:00',
+                      end='2019-01-31 21:00:00')
+        tb.run()
+    outdir = os.path.join(bot_settings['images']['outdir'], 'srareas')
+    reports = [f for f in os.listdir(outdir) if f.endswith('.halist.txt')]
+    if mode == 'none':
+        assert os.listdir(outdir) == []
+    else:
+        assert len(reports) > 0
@@ -0,0 +1,40 @@
+import pytest
+
+from batch_runner import Job, apply_overrides, run_batch, run_job, shard_ranges
+from benchmark import replay
+
+def test_shard_ranges():
+    """
+    Check that the shards cover the whole run and start
+    in a candle in which the S/R areas are refreshed
+    """
+    shards = shard_ranges('2018-01-01 22:00:00', '2018-03-01 22:00:00', 'D', 4, period=10)
+    assert shards == [('2018-01-01 22:00:00', '2018-01-10 22:00:00'),
+                      ('2018-01-11 22:00:00', '2018-01-30 22:00:00'),
+                      ('2018-01-31 22:00:00', '2018-02-09 22:00:00'),
+                      ('2018-02-10 22:00:00', '2018-03-01 22:00:00')]
+    shards = shard_ranges('2018-01-01 22:00:00', '2018-01-02 22:00:00', 'H4', 10, period=5)
+    assert len(shards) == 2
+
+def test_run_batch(replay_dir, bot_settings):
+    """
+    Check that the jobs run in the pool give the same Trades as
+    running them one after the other and that they are not run
+    again once they have finished
+    """
+    jobs = [Job(pair='AUD_USD', timeframe='D', start='2018-12-03 21:00:00',
+                end='2019-01-31 21:00:00'),
+            Job(pair='AUD_USD', timeframe='D', start='2019-02-03 21:00:00',
+                end='2019-03-29 21:00:00', overrides={('trade_bot', 'n_SL'): '5'})]
+    # the sequential runs are not checkpointed
+    seq_settings = apply_overrides(bot_settings, {('trade_bot', 'checkpoint_every'): '0'})
+    del seq_settings['trade_bot']['checkpoint_dir']
+    with replay(replay_dir):
+        results = run_batch(jobs, workers=2, settings=bot_settings, prefetch_candles=False)
+        assert [r.job for r in results] == jobs
+        assert [r.error for r in results] == [None, None]
+        for job, res in zip(jobs, results):
+            seq = run_job(job, seq_settings)
+            assert [t.to_dict() for t in seq.tlist] == [t.to_dict() for t in res.tlist]
+        results = run_batch(jobs, workers=2, settings=bot_settings, prefetch_candles=False)
+    assert all(r.skipped is True for r in results)
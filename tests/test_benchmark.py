@@ -0,0 +1,38 @@
+import pytest
+import json
+import datetime
+
+from benchmark import ReplayConnect, StageTimer
+
+@pytest.fixture
+def fixtures_dir(tmp_path):
+    """
+    Folder with 5 recorded daily candles for AUD_USD
+    """
+    start = datetime.datetime(2020, 6, 1, 21, 0, 0)
+    candles = [{'time': (start+datetime.timedelta(days=i)).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                'complete': True} for i in range(5)]
+    with open(str(tmp_path / "AUD_USD.D.json"), 'w') as f:
+        json.dump({'instrument': 'AUD_USD', 'granularity': 'D', 'candles': candles}, f)
+    return str(tmp_path)
+
+def test_replay_query(fixtures_dir):
+    """
+    Check that the recorded candles are served as Connect.query does
+    """
+    conn = ReplayConnect('AUD_USD', 'D', fixtures_dir)
+    res = conn.query(start='2020-06-02T21:00:00', end='2020-06-04T21:00:00')
+    assert len(res['candles']) == 3
+    res = conn.query(start='2020-06-03T00:00:00', count=1)
+    assert res['candles'][0]['time'] == '2020-06-03T21:00:00.000000Z'
+
+def test_stage_timer():
+    """
+    Check that nested stages are only counted once
+    """
+    timer = StageTimer()
+    inner = timer.wrap('sr', lambda: 1)
+    outer = timer.wrap('io', lambda: inner())
+    assert outer() == 1
+    assert timer.calls['io'] == 1
+    assert timer.calls['sr'] == 0
@@ -0,0 +1,42 @@
+import pytest
+import datetime
+
+from candle_access import ListView, TimeIndex
+
+def test_listview():
+    """
+    Check that ListView gives the elements of the range
+    without copying them
+    """
+    data = [object() for i in range(10)]
+    view = ListView(data, 1, 5)
+    assert len(view) == 4
+    assert view[0] is data[1]
+    assert view[-1] is data[4]
+    assert len(view[1:]) == 3
+    assert list(view) == data[1:5]
+    with pytest.raises(IndexError):
+        view[4]
+
+def test_timeindex():
+    """
+    Check the floor, ceil and nearest lookups
+    """
+    times = [datetime.datetime(2020, 6, 1, 21, 0, 0) + datetime.timedelta(days=i) for i in range(5)]
+    tindex = TimeIndex(times)
+    d = datetime.datetime(2020, 6, 2, 9, 0, 0)
+    assert tindex.floor(d) == 0
+    assert tindex.ceil(d) == 1
+    assert tindex.nearest(d) == 0
+    assert tindex.nearest(datetime.datetime(2020, 6, 10)) == 4
+    assert tindex.ceil(datetime.datetime(2020, 6, 10)) is None
+    assert tindex.ceil(d, tolerance=datetime.timedelta(hours=1)) is None
+    assert list(tindex.lookup([d, times[3]], how='ceil')) == [1, 3]
+
+def test_timeindex_unsorted():
+    """
+    Check that the datetimes must be sorted
+    """
+    times = [datetime.datetime(2020, 6, 2), datetime.datetime(2020, 6, 1)]
+    with pytest.raises(Exception):
+        TimeIndex(times)
@@ -0,0 +1,57 @@
+import pytest
+import datetime
+
+from candle_cache import CandleCache, merge_ranges, missing_ranges
+from candle_store import CandleStore
+from data_client import ReplayConnect
+
+def daily_candles(start, ncandles):
+    """
+    Daily candles as returned by Connect.query
+    """
+    candles = []
+    for i in range(ncandles):
+        t = start + datetime.timedelta(days=i)
+        c = {'time': t.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+             'volume': 1,
+             'complete': True}
+        for f in CandleStore.fields:
+            c[f] = 1.0 + t.day/100
+        candles.append(c)
+    return candles
+
+class CountingConnect(ReplayConnect):
+    """
+    ReplayConnect counting the number of queries
+    """
+    nqueries = 0
+
+    def query(self, start, end=None, count=None, indir=None):
+        self.nqueries += 1
+        return super().query(start, end=end, count=count, indir=indir)
+
+def test_missing_ranges():
+    """
+    Check the gaps of merged ranges
+    """
+    ranges = merge_ranges([(1, 3), (2, 5), (7, 9)])
+    assert ranges == [(1, 5), (7, 9)]
+    assert missing_ranges(ranges, 0, 10) == [(0, 1), (5, 7), (9, 10)]
+
+def test_get(tmp_path):
+    """
+    Check that only the ranges not in the cache are fetched
+    """
+    data = {'instrument': 'AUD_USD', 'granularity': 'D',
+            'candles': daily_candles(datetime.datetime(2020, 1, 1, 22, 0, 0), 60)}
+    conn = CountingConnect('AUD_USD', 'D', data=data)
+    cache = CandleCache(str(tmp_path), 'AUD_USD', 'D')
+    cs = cache.get(conn, datetime.datetime(2020, 1, 5), datetime.datetime(2020, 1, 20))
+    assert len(cs) == 15
+    cs = cache.get(conn, datetime.datetime(2020, 1, 10), datetime.datetime(2020, 1, 15))
+    assert len(cs) == 5
+    assert conn.nqueries == 1
+    cs = cache.get(conn, datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 30))
+    assert len(cs) == 29
+    assert conn.nqueries == 3
+    assert cs.get_datetime(0) == datetime.datetime(2020, 1, 1, 22, 0, 0)
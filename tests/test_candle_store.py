@@ -0,0 +1,112 @@
+import pytest
+import datetime
+import numpy as np
+
+from types import SimpleNamespace
+from candle_store import CandleStore
+
+@pytest.fixture
+def cstore():
+    """
+    CandleStore with 10 daily candles as returned by Connect.query
+    """
+    start = datetime.datetime(2020, 6, 1, 21, 0, 0)
+    candles = []
+    for i in range(10):
+        c = {'time': (start+datetime.timedelta(days=i)).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+             'volume': 100,
+             'complete': True}
+        for f in CandleStore.fields:
+            c[f] = 1.0 + i*0.01
+        c['highBid'] = c['highAsk'] = c['closeAsk'] + 0.005
+        c['lowBid'] = c['lowAsk'] = c['closeAsk'] - 0.005
+        candles.append(c)
+    return CandleStore({'instrument': 'AUD_USD',
+                        'granularity': 'D',
+                        'candles': candles})
+
+def test_get_ix(cstore):
+    """
+    Check that 'get_ix' returns the first candle at
+    or after the requested datetime
+    """
+    assert cstore.get_ix(datetime.datetime(2020, 6, 3, 10, 0, 0)) == 2
+    assert cstore.get_datetime(2) == datetime.datetime(2020, 6, 3, 21, 0, 0)
+    assert cstore.get_ix(datetime.datetime(2020, 7, 1, 21, 0, 0)) is None
+
+def test_slice(cstore):
+    """
+    Check that 'slice' only creates the Candle objects that are accessed
+    """
+    cl = cstore.slice(start=datetime.datetime(2020, 6, 2, 21, 0, 0),
+                      end=datetime.datetime(2020, 6, 5, 21, 0, 0))
+    assert len(cl.clist) == 4
+    assert cl.clist[-1].time == datetime.datetime(2020, 6, 5, 21, 0, 0)
+    assert cl.clist[-1].closeAsk == pytest.approx(1.04)
+    assert sum([c is not None for c in cstore.clist.cache]) == 1
+
+def test_slice_data(cstore):
+    """
+    Check that the 'data' of a slice has the same
+    candles as its 'clist'
+    """
+    cl = cstore.slice(start=datetime.datetime(2020, 6, 2, 21, 0, 0),
+                      end=datetime.datetime(2020, 6, 5, 21, 0, 0))
+    candles = cl.data['candles']
+    assert len(candles) == len(cl.clist)
+    assert [c['time'] for c in candles] == \
+        [c.time.strftime('%Y-%m-%dT%H:%M:%S.%fZ') for c in cl.clist]
+    assert candles[-1]['closeAsk'] == cl.clist[-1].closeAsk
+    assert cl.data['instrument'] == cstore.instrument
+
+def test_slice_not_shared(cstore):
+    """
+    Check that the CandleLists returned by 'slice' do
+    not share their attributes
+    """
+    cl1 = cstore.slice(end=datetime.datetime(2020, 6, 3, 21, 0, 0))
+    cl2 = cstore.slice(start=datetime.datetime(2020, 6, 4, 21, 0, 0))
+    assert len(cl1.clist) == 3
+    assert len(cl2.clist) == 7
+    for name, value in vars(cl1).items():
+        if isinstance(value, (list, dict)):
+            assert getattr(cl2, name) is not value
+
+def test_truncate(cstore):
+    """
+    Check that 'truncate' keeps the newest candles
+    """
+    c = cstore.clist[-1]
+    assert cstore.truncate(20) == 0
+    assert cstore.truncate(4) == 6
+    assert len(cstore) == 4
+    assert len(cstore.clist) == 4
+    assert cstore.get_datetime(0) == datetime.datetime(2020, 6, 7, 21, 0, 0)
+    assert cstore.clist[-1] is c
+
+def test_on_area_mask(cstore):
+    """
+    Check the candles overlapping with an HArea
+    """
+    SRlst = SimpleNamespace(halist=[SimpleNamespace(lower=1.024, upper=1.032)])
+    assert list(cstore.on_area_mask(SRlst).nonzero()[0]) == [2, 3]
+
+def test_features(cstore):
+    """
+    Check the vectorized colour, indecision and weekday of the candles
+    """
+    ixs = np.array([0, 6])
+    colour, ic = cstore.features(ixs, ic_perc=10)
+    assert list(colour) == [0, 0]
+    assert list(ic) == [True, True]
+    assert list(cstore.weekday(ixs)) == [0, 6]
+
+def test_time_index(cstore):
+    """
+    Check that the TimeIndex is rebuilt when the candles change
+    """
+    tindex = cstore.time_index()
+    assert cstore.time_index() is tindex
+    cstore.truncate(5)
+    assert cstore.time_index() is not tindex
+    assert cstore.get_ix(datetime.datetime(2020, 6, 7, 21, 0, 0)) == 1
@@ -0,0 +1,142 @@
+import pytest
+import os
+import pickle
+
+from types import SimpleNamespace
+from benchmark import replay
+from checkpoint import Checkpoint, run_key
+from config import reset_config
+from trade_records import TradeSink
+import trade_bot
+from trade_bot import TradeBot
+
+def test_checkpoint(tmp_path):
+    """
+    Check that a checkpoint is saved, loaded and replaced by
+    the '.done' file when the run finishes
+    """
+    ckpt = Checkpoint(str(tmp_path), 'EUR_USD.D.test', every=2)
+    assert ckpt.load() is None
+    assert ckpt.step() is False
+    assert ckpt.step() is True
+    ckpt.save({'startO': 1, 'loop': 0}, items=['t'])
+    assert Checkpoint(str(tmp_path), 'EUR_USD.D.test').load()['items'] == ['t']
+    assert ckpt.is_done() is False
+    ckpt.done({'ntrades': 1})
+    assert ckpt.is_done() is True
+    assert ckpt.load() is None
+
+def test_sink_restore(tmp_path):
+    """
+    Check that the records written after the checkpoint
+    are discarded when the sink is restored
+    """
+    outfile = str(tmp_path / "trades.csv")
+    sink = TradeSink(outfile=outfile, colnames=['start'], batch_size=1)
+    sink.add(SimpleNamespace(start=0))
+    state = sink.state()
+    sink.add(SimpleNamespace(start=1))
+    sink.close()
+    sink = TradeSink(outfile=outfile, colnames=['start'], batch_size=1)
+    sink.restore(state)
+    sink.add(SimpleNamespace(start=2))
+    sink.close()
+    with open(outfile) as f:
+        lines = f.read().splitlines()
+    assert lines == ['start,SR_id', '0,', '2,']
+    assert len(sink) == 2
+
+def test_items(tmp_path, monkeypatch):
+    """
+    Check that only the new items are written at each save and
+    that the items written after the last state are discarded
+    """
+    ckpt = Checkpoint(str(tmp_path), 'EUR_USD.D.test')
+    ckpt.save({'startO': 1}, items=['t0', 't1'])
+    written = []
+    dump = pickle.dump
+    monkeypatch.setattr(pickle, 'dump', lambda obj, f, **kw: written.append(obj) or dump(obj, f, **kw))
+    ckpt.save({'startO': 2}, items=['t0', 't1', 't2'])
+    assert written[0] == ['t2']
+    # interrupted after writing the items
+    monkeypatch.setattr(os, 'replace', lambda src, dst: None)
+    ckpt.save({'startO': 3}, items=['t0', 't1', 't2', 't3'])
+    monkeypatch.undo()
+    ckpt = Checkpoint(str(tmp_path), 'EUR_USD.D.test')
+    state = ckpt.load()
+    assert (state['startO'], state['items']) == (2, ['t0', 't1', 't2'])
+    ckpt.save({'startO': 4}, items=['t0', 't1', 't2', 't4'])
+    assert Checkpoint(str(tmp_path), 'EUR_USD.D.test').load()['items'] == ['t0', 't1', 't2', 't4']
+
+def test_snapshots(tmp_path, monkeypatch):
+    """
+    Check that only the S/R snapshots added since the last
+    save are written and that they are restored in the sink
+    """
+    ckpt = Checkpoint(str(tmp_path), 'EUR_USD.D.test')
+    sink = TradeSink(colnames=['start'])
+    sink.add(SimpleNamespace(start=0, SRlst='SR0'))
+    ckpt.save({'startO': 1, 'sink': sink.state()}, items=sink.records,
+              snapshots=sink.snapshot_list())
+    written = []
+    dump = pickle.dump
+    monkeypatch.setattr(pickle, 'dump', lambda obj, f, **kw: written.append(obj) or dump(obj, f, **kw))
+    sink.add(SimpleNamespace(start=1, SRlst='SR1'))
+    ckpt.save({'startO': 2, 'sink': sink.state()}, items=sink.records,
+              snapshots=sink.snapshot_list())
+    monkeypatch.undo()
+    assert written[:2] == [sink.records[1:], ['SR1']]
+    assert 'snapshots' not in written[2]['sink']
+    state = Checkpoint(str(tmp_path), 'EUR_USD.D.test').load()
+    sink = TradeSink(colnames=['start'])
+    sink.restore(state['sink'], records=state['items'], snapshots=state['snapshots'])
+    assert sink.snapshots == {0: 'SR0', 1: 'SR1'}
+    assert [r.SR_id for r in sink.records] == [0, 1]
+
+def test_sink_restore_none():
+    """
+    Check that a sink is left empty when there
+    is no sink state in the checkpoint
+    """
+    sink = TradeSink(colnames=['start'])
+    sink.restore(None)
+    assert len(sink) == 0
+
+def test_run_key():
+    """
+    Check that the runs with a different loop
+    or destination of the Trades have different keys
+    """
+    settings = {'trade_bot': {'period': '5'}}
+    args = ('AUD_USD', 'D', '2019-01-01 21:00:00', '2019-02-01 21:00:00')
+    keys = set(run_key(*args, settings=settings, bulk=bulk, with_sink=with_sink)
+               for bulk in (True, False) for with_sink in (True, False))
+    assert len(keys) == 4
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_run_interrupted(replay_dir, bot_settings, monkeypatch, bulk):
+    """
+    Check that the state is saved and the artifacts
+    writer is closed when a run is interrupted
+    """
+    reset_config(bot_settings)
+    calls = []
+    closed = []
+
+    def calc_SRlst(self, clO, dt, writer=None):
+        calls.append(dt)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return calc(self, clO, dt, writer=writer)
+    calc = TradeBot.calc_SRlst
+    monkeypatch.setattr(TradeBot, 'calc_SRlst', calc_SRlst)
+    close = trade_bot.ArtifactWriter.close
+    monkeypatch.setattr(trade_bot.ArtifactWriter, 'close',
+                        lambda self: closed.append(1) or close(self))
+    with replay(replay_dir):
+        tb = TradeBot(pair='AUD_USD', timeframe='D', start='2019-01-07 21:00:00',
+                      end='2019-01-31 21:00:00')
+        with pytest.raises(KeyboardInterrupt):
+            tb.run(bulk=bulk)
+    assert closed == [1]
+    assert tb.get_checkpoint(bulk).load()['startO'] == calls[-1]
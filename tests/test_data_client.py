@@ -0,0 +1,48 @@
+import pytest
+import asyncio
+
+from data_client import DataClient, ReplayConnect
+
+class FlakyConnect(object):
+    """
+    Stand-in for Connect failing the first query
+    """
+    nconns = 0
+
+    def __init__(self, instrument, granularity):
+        FlakyConnect.nconns += 1
+        self.instrument = instrument
+        self.nqueries = 0
+
+    def query(self, start, end=None, count=None, indir=None):
+        self.nqueries += 1
+        if self.nqueries == 1:
+            raise Exception("HTTP 429 Too Many Requests")
+        return {'instrument': self.instrument, 'start': start}
+
+def test_retry_and_reuse():
+    """
+    Check that failed queries are retried and the Connect
+    objects are reused
+    """
+    FlakyConnect.nconns = 0
+    client = DataClient(max_workers=2, backoff=0, max_rps=1000, connect_factory=FlakyConnect)
+    res = client.query_many([('AUD_USD', 'D', {'start': 'a'}),
+                             ('EUR_GBP', 'D', {'start': 'b'})])
+    assert [r['instrument'] for r in res] == ['AUD_USD', 'EUR_GBP']
+    client.connection('AUD_USD', 'D').query(start='c')
+    assert FlakyConnect.nconns == 2
+    client.close()
+
+def test_aquery_many():
+    """
+    Check the async queries with the replay adapter
+    """
+    data = {'candles': [{'time': '2020-06-01T21:00:00.000000Z'},
+                        {'time': '2020-06-02T21:00:00.000000Z'}]}
+    client = DataClient(max_workers=2, connect_factory=lambda instrument, granularity:
+                        ReplayConnect(instrument, granularity, data=data))
+    res = asyncio.run(client.aquery_many([('AUD_USD', 'D', {'start': '2020-06-02T00:00:00'}),
+                                          ('EUR_GBP', 'D', {'start': '2020-06-01T00:00:00'})]))
+    assert [len(r['candles']) for r in res] == [1, 2]
+    client.close()
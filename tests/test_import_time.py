@@ -0,0 +1,44 @@
+import pytest
+import os
+import subprocess
+import sys
+
+# the import of the bot modules, once numpy is imported, can take at
+# most this number of times the import of numpy in the same interpreter
+IMPORT_BUDGET = 1.0
+
+# modules only needed for plotting or for the trade journal
+HEAVY_MODULES = ('matplotlib', 'pandas', 'trade_utils')
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def run_python(code):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT, env.get('PYTHONPATH', '')])
+    out = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                         stdout=subprocess.PIPE, universal_newlines=True)
+    return out.stdout.strip().split("\n")[-1]
+
+def test_config_is_lazy():
+    """
+    Check that importing config does not read the config file
+    """
+    assert run_python("import config; print(config.CONFIG.is_loaded())") == 'False'
+
+@pytest.mark.parametrize("module", ['trade_bot', 'trade_stream'])
+def test_import_budget(module):
+    """
+    Check the time taken for importing 'module' against the time
+    taken for importing numpy, that the settings are not loaded
+    and that the plotting libraries are not imported
+    """
+    code = ("import sys, time; t0 = time.perf_counter(); import numpy; "
+            "t1 = time.perf_counter(); import {0}; t2 = time.perf_counter(); "
+            "import config; "
+            "heavy = [m for m in {1} if m in sys.modules]; "
+            "print(t1 - t0, t2 - t1, config.CONFIG.is_loaded(), ','.join(heavy) or None)".format(
+                module, HEAVY_MODULES))
+    baseline, elapsed, loaded, heavy = run_python(code).split()
+    assert float(elapsed) < IMPORT_BUDGET * float(baseline)
+    assert loaded == 'False'
+    assert heavy == 'None'
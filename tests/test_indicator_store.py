@@ -0,0 +1,108 @@
+import pytest
+import datetime
+
+import numpy as np
+
+from types import SimpleNamespace
+from candle_store import CandleStore
+import indicator_store
+from indicator_store import IndicatorStore, ewm, rsi
+
+def rsi_loop(close, period):
+    """
+    RSI calculated one value at a time
+    """
+    delta = np.diff(close)
+    up = [max(d, 0) for d in delta]
+    down = [max(-d, 0) for d in delta]
+    avg_up = np.mean(up[:period])
+    avg_down = np.mean(down[:period])
+    values = [100 - 100/(1 + avg_up/avg_down)]
+    for u, d in zip(up[period:], down[period:]):
+        avg_up = avg_up*(period-1)/period + u/period
+        avg_down = avg_down*(period-1)/period + d/period
+        values.append(100 - 100/(1 + avg_up/avg_down))
+    return values
+
+def test_rsi():
+    """
+    Check the vectorized RSI against the one calculated in a loop
+    """
+    close = 1 + np.cumsum(np.random.RandomState(0).normal(0, 0.01, 1000))
+    values = rsi(close, 14)
+    assert np.isnan(values[:14]).all()
+    np.testing.assert_allclose(values[14:], rsi_loop(close, 14))
+    np.testing.assert_allclose(ewm([1.0, 2.0, 3.0], 0.5), [1.0, 1.5, 2.25])
+
+def test_rsi_lead_in():
+    """
+    Check that the RSI of each price with a lead-in is
+    the one calculated with the prices of its lead-in
+    """
+    close = 1 + np.cumsum(np.random.RandomState(0).normal(0, 0.01, 300))
+    first = np.arange(300) - 50
+    values = rsi(close, 14, first=first)
+    assert np.isnan(values[:50]).all()
+    np.testing.assert_allclose(values[50:], [rsi(close[i-50:i+1], 14)[-1] for i in range(50, 300)])
+
+def test_trade_attrs(tmp_path):
+    """
+    Check the RSI attributes set for a Trade and that
+    the series are reused from the cache
+    """
+    start = datetime.datetime(2020, 1, 1)
+    time = np.array([start + datetime.timedelta(days=i) for i in range(100)],
+                    dtype='datetime64[us]')
+    records = np.zeros(100, dtype=CandleStore.dtype)
+    records['time'] = time
+    records['closeAsk'] = np.r_[np.linspace(1, 2, 50), np.linspace(2, 1.5, 50)]
+    store = CandleStore.from_records(records, instrument='AUD_USD', granularity='D')
+    ind = IndicatorStore.from_store(store, rsi_period=14, cache_dir=str(tmp_path), lead_in=30)
+    t = SimpleNamespace(start=start + datetime.timedelta(days=49), type='short')
+    ind.set_trade_attrs(t, n=20)
+    assert t.entry_onrsi is True
+    assert t.max_min_rsi == 100
+    t = SimpleNamespace(start=start + datetime.timedelta(days=99), type='long',
+                        entry_onrsi=False)
+    ind.set_trade_attrs(t, n=20)
+    assert t.entry_onrsi is False
+    assert t.max_min_rsi == round(ind.rsi[80:].min(), 2)
+
+def test_cache(tmp_path, monkeypatch):
+    """
+    Check that the cached series are cut to the candles of the store,
+    that they are the ones calculated with the lead-in of the store,
+    that they are not reused when the prices are different and that
+    they are not replaced by a narrower series
+    """
+    start = datetime.datetime(2020, 1, 1)
+    records = np.zeros(100, dtype=CandleStore.dtype)
+    records['time'] = np.array([start + datetime.timedelta(days=i) for i in range(100)],
+                               dtype='datetime64[us]')
+    records['closeAsk'] = 1 + np.cumsum(np.random.RandomState(0).normal(0, 0.01, 100))
+    store = CandleStore.from_records(records, instrument='AUD_USD', granularity='D')
+    ind = IndicatorStore.from_store(store, rsi_period=14, cache_dir=str(tmp_path), lead_in=20)
+    assert np.isnan(ind.rsi[:20]).all() and not np.isnan(ind.rsi[20:]).any()
+    calls = []
+    monkeypatch.setattr(indicator_store, 'rsi', lambda close, period, first=None:
+                        calls.append(period) or rsi(close, period, first=first))
+    sub = CandleStore.from_records(records[20:60], instrument='AUD_USD', granularity='D')
+    cached = IndicatorStore.from_store(sub, rsi_period=14, cache_dir=str(tmp_path), lead_in=20)
+    assert calls == []
+    assert len(cached.time) == len(sub)
+    np.testing.assert_array_equal(cached.rsi, ind.rsi[20:60])
+    assert cached.rsi_at(sub.get_datetime(0)) == ind.rsi_at(sub.get_datetime(0))
+    # the same values without the cache
+    before = CandleStore.from_records(records[0:21], instrument='AUD_USD', granularity='D')
+    fresh = IndicatorStore.from_store(sub, rsi_period=14, cache_dir=str(tmp_path / "other"),
+                                      lead_in=20, before=before)
+    np.testing.assert_allclose(fresh.rsi, ind.rsi[20:60])
+    # other prices for the same candles
+    calls.clear()
+    records['closeAsk'][30] += 0.01
+    sub = CandleStore.from_records(records[20:60], instrument='AUD_USD', granularity='D')
+    IndicatorStore.from_store(sub, rsi_period=14, cache_dir=str(tmp_path), lead_in=20)
+    assert calls == [14]
+    cache_f = IndicatorStore.cache_file(str(tmp_path), 'AUD_USD', 'D', 'closeAsk', 14, 20)
+    with np.load(cache_f) as data:
+        assert len(data['time']) == 100
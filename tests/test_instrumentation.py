@@ -0,0 +1,79 @@
+import pytest
+import glob
+import json
+
+from config import reset_config
+from benchmark import replay
+from trade_bot import TradeBot
+import instrumentation as instr
+
+@pytest.fixture
+def registry():
+    instr.REGISTRY.reset()
+    instr.REGISTRY.enabled = True
+    yield instr.REGISTRY
+    instr.REGISTRY.enabled = False
+    instr.REGISTRY.reset()
+
+def test_disabled():
+    """
+    Check that nothing is recorded when disabled
+    """
+    assert instr.span('calc_SR') is instr.NULL_SPAN
+    instr.count('trades')
+    assert instr.export() is None
+
+def test_report(registry):
+    """
+    Check the spans and counters in the report
+    """
+    for i in range(3):
+        with instr.span('calc_SR'):
+            pass
+    instr.count('trades', 2)
+    report = instr.export()
+    assert report['spans']['calc_SR']['count'] == 3
+    assert sum(report['spans']['calc_SR']['buckets'].values()) == 3
+    assert report['counters'] == {'trades': 2}
+
+def test_configure(registry, tmp_path, bot_settings):
+    """
+    Check that each run starts with an empty registry and
+    that the stream is closed
+    """
+    stream = str(tmp_path / "instr.jsonl")
+    bot_settings['instrumentation'] = {'enabled': 'True', 'stream': stream,
+                                       'report': str(tmp_path / "instr.json")}
+    reset_config(bot_settings)
+    instr.configure()
+    instr.count('trades')
+    instr.configure()
+    assert instr.export()['counters'] == {}
+    instr.count('trades')
+    instr.close()
+    assert instr.REGISTRY.stream is None
+    with open(stream) as f:
+        assert len(f.readlines()) == 2
+    assert instr.report_file('AUD_USD.D') == str(tmp_path / "instr.AUD_USD.D.json")
+
+def test_run_reports(registry, tmp_path, replay_dir, bot_settings):
+    """
+    Check that each TradeBot run writes its own report
+    """
+    bot_settings['instrumentation'] = {'enabled': 'True',
+                                       'stream': str(tmp_path / "instr.jsonl"),
+                                       'report': str(tmp_path / "instr.json")}
+    del bot_settings['trade_bot']['checkpoint_dir']
+    reset_config(bot_settings)
+    ends = ['2019-01-31 21:00:00', '2019-02-28 21:00:00']
+    with replay(replay_dir):
+        for end in ends:
+            TradeBot(pair='AUD_USD', timeframe='D', start='2019-01-07 21:00:00', end=end).run()
+            assert instr.REGISTRY.stream is None
+    reports = sorted(glob.glob(str(tmp_path / "instr.*.json")))
+    assert len(reports) == 2
+    ncandles = []
+    for report in reports:
+        with open(report) as f:
+            ncandles.append(json.load(f)['counters']['candles'])
+    assert ncandles[0] != ncandles[1]
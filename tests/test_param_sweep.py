@@ -0,0 +1,38 @@
+import pytest
+
+from batch_runner import Job, run_job
+from benchmark import replay
+from param_sweep import expand_grid, group_jobs, run_sweep, trades_table
+
+GRID = {('trade_bot', 'th'): ['0.6', '0.7'],
+        ('trade_bot', 'n_SL'): ['5', '10']}
+
+def test_group_jobs():
+    """
+    Check that the configurations with the same
+    S/R settings are run in the same group
+    """
+    jobs = [Job(pair='AUD_USD', timeframe='D', start='2019-01-01 21:00:00',
+                end='2019-02-01 21:00:00', overrides=o) for o in expand_grid(GRID)]
+    groups = group_jobs(jobs, 2)
+    assert len(groups) == 2
+    for group in groups:
+        assert len(set(j.overrides[('trade_bot', 'th')] for j in group)) == 1
+
+def test_run_sweep(replay_dir, bot_settings):
+    """
+    Check that there is one result per configuration and that
+    each of them has the Trades of a single run with its settings
+    """
+    del bot_settings['trade_bot']['checkpoint_dir']
+    start, end = '2018-12-03 21:00:00', '2019-02-28 21:00:00'
+    with replay(replay_dir):
+        results = run_sweep('AUD_USD', 'D', start, end, GRID, workers=2, settings=bot_settings)
+        assert [r.error for r in results] == [None] * 4
+        assert sorted(sorted(r.job.overrides.items()) for r in results) == \
+            sorted(sorted(o.items()) for o in expand_grid(GRID))
+        for res in results:
+            single = run_job(res.job, bot_settings)
+            assert [t.to_dict() for t in single.tlist] == [t.to_dict() for t in res.tlist]
+    rows = trades_table(results, colnames=['start', 'type'])
+    assert len(rows) == sum(len(r.tlist) for r in results)
@@ -0,0 +1,31 @@
+import pytest
+import numpy as np
+
+from pips import pip_size, price2pips, add_pips, substract_pips, add_pips_array
+
+@pytest.mark.parametrize("pair,size", [('AUD_USD', 0.0001),
+                                       ('USD_JPY', 0.01),
+                                       ('EUR_CZK', 0.001),
+                                       ('USD_NOK', 0.0001),
+                                       ('USD_SEK', 0.0001)])
+def test_pip_size(pair, size):
+    assert pip_size(pair) == pytest.approx(size)
+
+def test_price2pips():
+    """
+    Check that the number of pips is returned as a number
+    """
+    assert price2pips('AUD_USD', 0.00234) == 23.4
+    assert price2pips('EUR_CZK', 0.0234) == 23.4
+
+def test_add_substract_pips():
+    assert add_pips('USD_JPY', 110.123, 10) == pytest.approx(110.22)
+    assert substract_pips('AUD_USD', 0.71234, 10) == pytest.approx(0.7113)
+
+def test_add_pips_array():
+    """
+    Check that the array variant is the same as the scalar one
+    """
+    prices = np.array([0.71234, 0.70001, 0.69999])
+    expected = [add_pips('AUD_USD', p, 30) for p in prices]
+    assert add_pips_array('AUD_USD', prices, 30) == pytest.approx(expected)
@@ -0,0 +1,66 @@
+import pytest
+import datetime
+
+import numpy as np
+
+from candle_store import CandleStore
+from oanda.connect import Connect
+from resample import resample, candle_starts, can_resample, for_granularity
+
+def hourly_store(start, n):
+    """
+    Hourly candles with increasing prices
+    """
+    candles = []
+    for i in range(n):
+        t = start + datetime.timedelta(hours=i)
+        c = {'time': t.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+             'volume': 1,
+             'complete': True}
+        for f in CandleStore.fields:
+            c[f] = 1.0 + i/100
+        candles.append(c)
+    return CandleStore({'instrument': 'AUD_USD', 'granularity': 'H1', 'candles': candles})
+
+@pytest.mark.parametrize("month,utc_hour", [(7, 21), (1, 22)])
+def test_daily_alignment(month, utc_hour):
+    """
+    Check that the daily candles start at 22:00 in London
+    with and without DST
+    """
+    cs = hourly_store(datetime.datetime(2018, month, 10, 0), 72)
+    D = resample(cs, 'D', hour=22, tz='Europe/London')
+    assert D.get_datetime(1) == datetime.datetime(2018, month, 10, utc_hour)
+    assert len(D) == 4
+    ix = utc_hour
+    assert D.openAsk[1] == cs.openAsk[ix]
+    assert D.closeAsk[1] == cs.closeAsk[ix + 23]
+    assert D.highBid[1] == cs.highBid[ix:ix + 24].max()
+    assert D.lowBid[1] == cs.lowBid[ix:ix + 24].min()
+    assert D.volume[1] == 24
+    # the last candle is not covered by the hourly candles
+    assert D.complete.tolist() == [True, True, True, False]
+
+def test_H4():
+    """
+    Check the H4 candles are aligned with the daily ones
+    """
+    times = np.array([datetime.datetime(2018, 7, 10, h) for h in range(24)],
+                     dtype='datetime64[us]')
+    starts = candle_starts(times, 'H4', hour=22, tz='Europe/London')
+    hours = sorted(set(s.item().hour for s in starts))
+    assert hours == [1, 5, 9, 13, 17, 21]
+    assert can_resample('H1', 'H4') is True
+    assert can_resample('H4', 'H1') is False
+    assert can_resample('M30', 'H10') is False
+
+def test_for_granularity():
+    """
+    Check that a new Connect object is created for a
+    connection without 'for_granularity'
+    """
+    conn = Connect(instrument='AUD_USD', granularity='D')
+    h1 = for_granularity(conn, 'H1')
+    assert h1 is not conn
+    assert (h1.instrument, h1.granularity) == ('AUD_USD', 'H1')
+    assert conn.granularity == 'D'
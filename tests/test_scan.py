@@ -0,0 +1,32 @@
+import pytest
+
+from config import reset_config
+from benchmark import replay
+from trade_bot import TradeBot
+
+def test_sr_window(replay_dir, bot_settings, monkeypatch):
+    """
+    Check that the S/R areas are calculated with at most
+    [trade_bot]period_range candles and that the candle loop
+    and 'scan' refresh them at the same candles
+    """
+    windows = []
+    calc_SRlst = TradeBot.calc_SRlst
+
+    def record(self, clO, dt, writer=None):
+        windows.append((dt, len(clO.clist)))
+        return calc_SRlst(self, clO, dt, writer=writer)
+    monkeypatch.setattr(TradeBot, 'calc_SRlst', record)
+    bot_settings['trade_bot'].pop('checkpoint_dir')
+    reset_config(bot_settings)
+    runs = {}
+    with replay(replay_dir):
+        for bulk in (False, True):
+            tb = TradeBot(pair='AUD_USD', timeframe='D', start='2019-01-07 21:00:00',
+                          end='2019-04-30 21:00:00')
+            tb.run(bulk=bulk)
+            runs[bulk] = list(windows)
+            del windows[:]
+    assert len(runs[False]) > 10
+    assert max(n for dt, n in runs[False]) <= 101
+    assert runs[True] == runs[False]
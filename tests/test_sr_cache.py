@@ -0,0 +1,39 @@
+import pytest
+import datetime
+import os
+
+from types import SimpleNamespace
+from sr_cache import SRCache, halist_key
+
+def make_clO(ndays):
+    start = datetime.datetime(2020, 1, 1, 22)
+    return SimpleNamespace(clist=[SimpleNamespace(time=start + datetime.timedelta(days=i),
+                                                  closeAsk=1.0, closeBid=1.0)
+                                  for i in range(ndays)])
+
+def test_key():
+    """
+    Check that the key changes with the candles
+    """
+    key = halist_key('AUD_USD', 'D', make_clO(10))
+    assert key == halist_key('AUD_USD', 'D', make_clO(10))
+    assert key != halist_key('AUD_USD', 'D', make_clO(11))
+    assert key != halist_key('AUD_USD', 'H4', make_clO(10))
+    assert halist_key('AUD_USD', 'D', make_clO(0)) is None
+
+def test_get_put(tmp_path):
+    """
+    Check that the least recently used HAreaLists
+    are removed when the cache is full
+    """
+    cache = SRCache(str(tmp_path), max_size=1)
+    assert cache.get('a') is None
+    SRlst = {'halist': list(range(100000))}
+    cache.put('a', SRlst)
+    assert cache.get('a') == SRlst
+    os.utime(cache._file('a'), (0, 0))
+    cache.put('b', SRlst)
+    cache.put('c', SRlst)
+    assert cache.get('a') is None
+    assert cache.get('c') == SRlst
+    assert cache.hits == 2
@@ -0,0 +1,110 @@
+import pytest
+import datetime
+
+from conftest import random_candles
+from candle.candlelist import CandleList
+from candle_store import CandleStore
+from trade_utils import adjust_SL, get_trade_type
+import trade_memo
+from trade_memo import LRUMemo, TradeMemo, last_pivots
+
+def test_lru_memo():
+    """
+    Check that the values are reused and the least
+    recently used one is evicted
+    """
+    calls = []
+
+    def func(x):
+        calls.append(x)
+        return x * 2
+
+    memo = LRUMemo(maxsize=2)
+    assert memo.get_or_compute('a', func, 1) == 2
+    assert memo.get_or_compute('b', func, 2) == 4
+    assert memo.get_or_compute('a', func, 1) == 2
+    memo.get_or_compute('c', func, 3)
+    assert len(memo) == 2
+    assert memo.get_or_compute('b', func, 2) == 4
+    assert calls == [1, 2, 3, 2]
+    assert memo.hits == 1
+
+def test_SL_extremes():
+    """
+    Check that the SL looked up for the candles of a CandleStore
+    are the ones calculated by adjust_SL on each window
+    """
+    candles = random_candles(datetime.datetime(2019, 1, 1, 21, 0, 0), 60,
+                             datetime.timedelta(days=1))
+    store = CandleStore({'instrument': 'AUD_USD', 'granularity': 'D', 'candles': candles})
+    memo = TradeMemo(maxsize=0)
+    memo.new_run()
+    start = store.get_datetime(10)
+    for ix in range(10, len(store)):
+        end = store.get_datetime(ix)
+        newCl = store.slice(start, end)
+        for type in ('long', 'short'):
+            SL = memo.SL(adjust_SL, type, 'AUD_USD', 'D', start=start, end=end,
+                         clO=newCl, n_SL=7, store=store)
+            assert SL == pytest.approx(adjust_SL(type, newCl, 7))
+    assert memo.extremes.store is store
+
+def test_last_pivots():
+    """
+    Check the type of the last pivot of the ZigZag of the prices
+    until each price, before and after the first pivot is known
+    """
+    values = [1.0, 1.05, 1.12, 1.08, 1.0, 1.02]
+    assert list(last_pivots(values, 0.1)) == [-1, 1, 1, -1, -1, 1]
+
+def trend_store():
+    candles = random_candles(datetime.datetime(2019, 1, 1, 21, 0, 0), 60,
+                             datetime.timedelta(days=1))
+    return CandleStore({'instrument': 'AUD_USD', 'granularity': 'D', 'candles': candles})
+
+def test_trade_type_run():
+    """
+    Check that the trade types of the windows of a run are
+    calculated once and then looked up for each candle
+    """
+    store = trend_store()
+    memo = TradeMemo()
+    memo.new_run()
+    calls = []
+    start = store.get_datetime(10)
+    closes = store.column('closeAsk')
+    for ix in range(10, len(store)):
+        type = memo.trade_type(lambda dt, clO: calls.append(dt) or 'long', 'AUD_USD', 'D',
+                               start=start, end=store.get_datetime(ix), clO=None, store=store)
+        assert type == ('short' if last_pivots(closes[10:ix+1], 0.02)[-1] == 1 else 'long')
+    assert calls == []
+    assert (memo.memo.misses, memo.memo.hits) == (1, len(store) - 11)
+
+@pytest.mark.skipif(not hasattr(CandleList, 'get_pivotlist'),
+                    reason="needs CandleList.get_pivotlist from the candle package")
+def test_trade_type_parity():
+    """
+    Check that the trade types looked up are the
+    ones guessed by get_trade_type on each window
+    """
+    store = trend_store()
+    memo = TradeMemo(maxsize=0)
+    memo.new_run()
+    start = store.get_datetime(10)
+    for ix in range(11, len(store)):
+        end = store.get_datetime(ix)
+        newCl = store.slice(start, end)
+        assert memo.trade_type(get_trade_type, 'AUD_USD', 'D', start=start, end=end,
+                               clO=newCl, store=store) == get_trade_type(end, newCl)
+
+def test_settings_once(monkeypatch):
+    """
+    Check that the settings are read once per run
+    """
+    calls = []
+    monkeypatch.setattr(trade_memo, 'settings_key', lambda: calls.append(1) or ())
+    memo = TradeMemo()
+    memo.new_run()
+    for end in range(5):
+        memo.trade_type(lambda dt, clO: 'long', 'AUD_USD', 'D', start=0, end=end, clO=None)
+    assert len(calls) == 1
@@ -0,0 +1,199 @@
+import pytest
+import json
+import logging
+import datetime
+
+from types import SimpleNamespace
+from benchmark import replay
+from candle_store import CandleStore
+from config import reset_config
+from conftest import random_candles
+from data_client import DataClient, ReplayConnect, fixture_file
+from trade import Trade
+from trade_bot import TradeBot
+from trade_records import TradeSink
+from trade_outcome import group_trades, evaluate_trade, evaluate_trades
+
+START = datetime.datetime(2020, 6, 1, 21, 0, 0)
+M30 = datetime.timedelta(minutes=30)
+
+def make_trade(start, pair='AUD_USD', **kwargs):
+    return SimpleNamespace(start=start, pair=pair, timeframe='D', **kwargs)
+
+def to_daily(candles):
+    """
+    Daily candles (starting at 21:00) with the
+    prices of the M30 'candles' within them
+    """
+    days = {}
+    for c in candles:
+        t = datetime.datetime.strptime(c['time'], '%Y-%m-%dT%H:%M:%S.%fZ')
+        day = datetime.datetime.combine((t - datetime.timedelta(hours=21)).date(),
+                                        datetime.time(21, 0))
+        days.setdefault(day, []).append(c)
+    daily = []
+    for day, cs in sorted(days.items()):
+        d = {'time': day.strftime('%Y-%m-%dT%H:%M:%S.%fZ'), 'volume': len(cs), 'complete': True}
+        for bit in ('Ask', 'Bid'):
+            d['open'+bit] = cs[0]['open'+bit]
+            d['close'+bit] = cs[-1]['close'+bit]
+            d['high'+bit] = max(c['high'+bit] for c in cs)
+            d['low'+bit] = min(c['low'+bit] for c in cs)
+        daily.append(d)
+    return daily
+
+def make_stores(paths):
+    """
+    Daily and M30 CandleStores from START. 'paths' has the M30
+    prices of each day, the last one repeated until the end of the day
+    """
+    candles = []
+    for i, path in enumerate(paths):
+        path = path + [path[-1]] * (48 - len(path))
+        for j, p in enumerate(path):
+            c = {'time': (START + datetime.timedelta(days=i) + j*M30).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                 'volume': 1, 'complete': True}
+            for f in CandleStore.fields:
+                c[f] = p
+            candles.append(c)
+    return (CandleStore({'instrument': 'AUD_USD', 'granularity': 'D', 'candles': to_daily(candles)}),
+            CandleStore({'instrument': 'AUD_USD', 'granularity': 'M30', 'candles': candles}))
+
+def test_group_trades():
+    """
+    Check that trades of the same pair with overlapping ranges are grouped
+    """
+    d = datetime.datetime(2020, 6, 1, 21, 0, 0)
+    trades = [make_trade(d), make_trade(d + datetime.timedelta(days=2)),
+              make_trade(d + datetime.timedelta(days=20)), make_trade(d, pair='EUR_GBP')]
+    groups = group_trades(trades, numperiods=5)
+    assert [(g[0], len(g[4])) for g in groups] == [('AUD_USD', 2), ('AUD_USD', 1), ('EUR_GBP', 1)]
+
+def test_evaluate_trade():
+    """
+    Check the entry and the outcome of a long trade. The trade starts
+    in the candle where the entry is crossed and it is closed in the
+    same candle
+    """
+    clO, intraday = make_stores([[1.0100], [1.0100, 1.0050, 1.0100, 1.0150]])
+    t = make_trade(START.strftime('%Y-%m-%d %H:%M:%S'), type='long',
+                   entry=1.0050, SL=0.9900, TP=1.0150)
+    evaluate_trade(t, clO, intraday, numperiods=5, hr_pips=1)
+    day1 = START + datetime.timedelta(days=1)
+    assert t.entered is True
+    assert t.start == day1.strftime('%Y-%m-%d %H:%M:%S')
+    assert t.entry_time == (day1 + M30).isoformat()
+    assert t.outcome == 'success'
+    assert t.end == day1 + 3*M30
+    assert t.pips == 100.0
+
+def test_evaluate_trade_SL_first():
+    """
+    Check that a candle crossing the SL and the TP is a failure,
+    even if the TP is crossed before, as the SL is checked first
+    """
+    clO, intraday = make_stores([[1.0100], [1.0150, 1.0050, 0.9900]])
+    t = make_trade(START, type='long', entry=1.0050, SL=0.9900, TP=1.0150)
+    evaluate_trade(t, clO, intraday, numperiods=5, hr_pips=1)
+    assert t.outcome == 'failure'
+    assert t.end == START + datetime.timedelta(days=1) + 2*M30
+    assert t.pips == -150.0
+
+def test_evaluate_trade_gap():
+    """
+    Check that a price jumping over the SL is a failure
+    ending at the start of the candle and that a trade
+    not entered has no outcome
+    """
+    clO, intraday = make_stores([[1.0100], [1.0050], [1.0300]])
+    t = make_trade(START, type='short', entry=1.0050, SL=1.0150, TP=0.9900)
+    evaluate_trade(t, clO, intraday, numperiods=5, hr_pips=1)
+    assert t.outcome == 'failure'
+    assert t.end == START + datetime.timedelta(days=2)
+    assert t.pips == -100.0
+    t = make_trade(START, type='short', entry=1.0500, SL=1.0600, TP=0.9900)
+    evaluate_trade(t, clO, intraday, numperiods=5, hr_pips=1)
+    assert t.entered is False
+    assert t.outcome == 'n.a.'
+
+@pytest.fixture
+def intraday_dir(tmp_path):
+    """
+    Folder with 30 days of recorded M30 AUD_USD candles from
+    2018-06-01 and the daily candles with the same prices
+    """
+    fixtures_dir = tmp_path / "fixtures"
+    fixtures_dir.mkdir()
+    candles = random_candles(datetime.datetime(2018, 6, 1, 21, 0, 0), 48*30, M30)
+    for granularity, cs in (('M30', candles), ('D', to_daily(candles))):
+        with open(fixture_file(str(fixtures_dir), 'AUD_USD', granularity), 'w') as f:
+            json.dump({'instrument': 'AUD_USD', 'granularity': granularity, 'candles': cs}, f)
+    return str(fixtures_dir)
+
+def recorded_trades(fixtures_dir, make):
+    """
+    Long and short trades entering at the close of the
+    recorded daily candles, created with 'make'
+    """
+    daily = ReplayConnect('AUD_USD', 'D', fixtures_dir=fixtures_dir).data['candles']
+    trades = []
+    for i, c in enumerate(daily[:20:3]):
+        start = datetime.datetime.strptime(c['time'], '%Y-%m-%dT%H:%M:%S.%fZ')
+        entry = c['closeAsk']
+        sign = 1 if i % 2 == 0 else -1
+        trades.append(make(id='AUD_USD.{0}'.format(i),
+                           start=start.strftime('%Y-%m-%d %H:%M:%S'),
+                           pair='AUD_USD', timeframe='D',
+                           type='long' if sign == 1 else 'short',
+                           entry=entry,
+                           SL=round(entry - sign*0.008, 5),
+                           TP=round(entry + sign*0.012, 5)))
+    return trades
+
+def test_evaluate_trades(intraday_dir, monkeypatch):
+    """
+    Check that the candles are requested once per group of
+    overlapping trades with the connections passed and that
+    each trade is assessed
+    """
+    queries = []
+    query = ReplayConnect.query
+    monkeypatch.setattr(ReplayConnect, 'query',
+                        lambda self, **kw: queries.append(self.granularity) or query(self, **kw))
+    trades = recorded_trades(intraday_dir, SimpleNamespace)
+    client = DataClient(connect_factory=lambda instrument, granularity:
+                        ReplayConnect(instrument, granularity, fixtures_dir=intraday_dir))
+    evaluate_trades(trades, workers=2, connect=client.connection)
+    client.close()
+    assert sorted(queries) == ['D', 'M30']
+    assert set(t.outcome for t in trades) <= {'success', 'failure', 'n.a.'}
+    assert any(t.outcome != 'n.a.' for t in trades)
+
+@pytest.mark.skipif(not hasattr(Trade, 'run'), reason="needs Trade.run from the trade package")
+def test_trade_run(intraday_dir):
+    """
+    Check that the outcome of the trades on the recorded
+    candles is the same as with Trade.run
+    """
+    trades = recorded_trades(intraday_dir, Trade)
+    expected = recorded_trades(intraday_dir, Trade)
+    with replay(intraday_dir):
+        evaluate_trades(trades)
+        for t in expected:
+            t.run()
+    for t, e in zip(trades, expected):
+        assert (t.entered, t.outcome, t.pips) == (e.entered, e.outcome, getattr(e, 'pips', None))
+
+def test_evaluate_sink(replay_dir, bot_settings, caplog):
+    """
+    Check that a warning is logged when the Trades
+    added to a sink can not be evaluated
+    """
+    bot_settings['trade_bot'].pop('checkpoint_dir')
+    reset_config(bot_settings)
+    with replay(replay_dir):
+        tb = TradeBot(pair='AUD_USD', timeframe='D', start='2019-01-07 21:00:00',
+                      end='2019-01-31 21:00:00')
+        with caplog.at_level(logging.WARNING, logger='trade_bot'):
+            tb.run(sink=TradeSink(colnames=['start']), evaluate=True)
+    assert 'not assessed' in caplog.text
@@ -0,0 +1,46 @@
+import pytest
+import pickle
+import datetime
+
+from types import SimpleNamespace
+from trade_records import TradeSink
+
+def test_sink(tmp_path):
+    """
+    Check that the S/R snapshot is stored once and
+    the records are written in batches
+    """
+    outfile = str(tmp_path / "trades.csv")
+    SRlst = SimpleNamespace(halist=[])
+    sink = TradeSink(outfile=outfile, colnames=['start', 'type'], batch_size=2)
+    for i in range(3):
+        rec = sink.add(SimpleNamespace(start=i, type='long', SRlst=SRlst))
+    assert rec.start == 2
+    assert rec.SR_id == 0
+    assert len(sink.snapshots) == 1
+    assert len(sink.records) == 1
+    sink.close()
+    with open(outfile) as f:
+        lines = f.read().splitlines()
+    assert lines == ['start,type,SR_id', '0,long,0', '1,long,0', '2,long,0']
+    rec = pickle.loads(pickle.dumps(rec))
+    assert rec.type == 'long'
+
+def test_parquet(tmp_path):
+    """
+    Check that the columns written to a parquet
+    file keep the types of the values
+    """
+    pq = pytest.importorskip('pyarrow.parquet')
+    outfile = str(tmp_path / "trades.parquet")
+    sink = TradeSink(outfile=outfile, colnames=['start', 'type', 'entry', 'tot_SR', 'entered'],
+                     batch_size=2)
+    start = datetime.datetime(2020, 1, 1, 21, 0, 0)
+    for i in range(3):
+        sink.add(SimpleNamespace(start=start + datetime.timedelta(days=i), type='long',
+                                 entry=1.1 + i, tot_SR=i, entered=i % 2 == 0))
+    sink.close()
+    table = pq.read_table(outfile)
+    assert [str(t) for t in table.schema.types] == ['timestamp[us]', 'string', 'double',
+                                                    'int64', 'bool', 'int64']
+    assert table.column('entry').to_pylist() == [1.1, 2.1, 3.1]
@@ -0,0 +1,115 @@
+import pytest
+import asyncio
+import logging
+import datetime
+import threading
+
+import trade_stream
+from config import CONFIG, reset_config
+from data_client import ReplayConnect
+from trade_bot import TradeDiscover
+from trade_stream import InstrumentWatcher
+
+def trade_key(t):
+    return tuple(getattr(t, a, None) for a in ('start', 'type', 'entry', 'SL', 'TP'))
+
+@pytest.fixture
+def watcher(replay_dir, bot_settings):
+    """
+    InstrumentWatcher for AUD_USD D with the candles of
+    'replay_dir' until 2019-01-07 21:00:00
+    """
+    reset_config(bot_settings)
+    w = InstrumentWatcher('AUD_USD', 'D',
+                          conn=ReplayConnect('AUD_USD', 'D', fixtures_dir=replay_dir))
+    w.load(now=datetime.datetime(2019, 1, 7, 21, 0, 0))
+    return w
+
+def new_candles(watcher):
+    return watcher.conn.query(start=(watcher.last_time() + watcher.delta).isoformat(),
+                              end='2019-02-28T21:00:00')
+
+def test_on_candles(watcher):
+    """
+    Check that each new candle gives the same Trade as running
+    TradeDiscover on it when the S/R areas are calculated for each
+    candle and that only the candles of the last
+    [trade_bot]period_range are kept
+    """
+    watcher.period = 1
+    period_range = CONFIG.getint('trade_bot', 'period_range')
+    assert len(watcher.clO) <= period_range + 1
+    res = new_candles(watcher)
+    found = watcher.on_candles(res)
+    assert watcher.last_time() == datetime.datetime(2019, 2, 28, 21, 0, 0)
+    assert len(watcher.clO) == period_range + 1
+    expected = []
+    for c in res['candles']:
+        td = TradeDiscover(start=datetime.datetime.strptime(c['time'], '%Y-%m-%dT%H:%M:%S.%fZ'),
+                           pair='AUD_USD', timeframe='D', conn=watcher.conn)
+        t = td.run()
+        if t is not None:
+            expected.append(trade_key(t))
+    assert [trade_key(t) for t in found] == expected
+
+def test_sr_period(watcher, monkeypatch):
+    """
+    Check that the S/R areas are kept between the candles and
+    calculated again every [trade_bot]period candles
+    """
+    calls = []
+    calc_SR_plot = trade_stream.calc_SR_plot
+    monkeypatch.setattr(trade_stream, 'calc_SR_plot',
+                        lambda clO, **kw: calls.append(clO.clist[-1].time) or calc_SR_plot(clO, **kw))
+    res = new_candles(watcher)
+    watcher.on_candles(dict(res, candles=res['candles'][:7]))
+    watcher.on_candles(dict(res, candles=res['candles'][7:]))
+    times = [datetime.datetime.strptime(c['time'], '%Y-%m-%dT%H:%M:%S.%fZ') for c in res['candles']]
+    assert calls == times[::watcher.period]
+
+def test_poll_error(watcher, caplog):
+    """
+    Check that the failed queries are logged as warnings
+    """
+    def query(**kwargs):
+        raise RuntimeError("connection reset")
+    watcher.conn.query = query
+    with caplog.at_level(logging.WARNING, logger='trade_stream'):
+        assert watcher.poll() is None
+    assert 'connection reset' in caplog.text
+
+def test_poll_empty(watcher):
+    """
+    Check that the candles of the last [trade_bot]period_range
+    are requested when there are no candles loaded
+    """
+    queries = []
+    watcher.conn.query = lambda **kw: queries.append(kw) or {'candles': []}
+    watcher.clO.truncate(0)
+    assert watcher.poll() == {'candles': []}
+    start = datetime.datetime.fromisoformat(queries[0]['start'])
+    end = datetime.datetime.fromisoformat(queries[0]['end'])
+    assert end - start == watcher.delta_period
+
+def test_watch_executor(watcher, monkeypatch):
+    """
+    Check that the new candles are not evaluated
+    in the thread running the event loop
+    """
+    threads = []
+    res = new_candles(watcher)
+    monkeypatch.setattr(watcher, 'poll', lambda: res)
+    monkeypatch.setattr(trade_stream, 'datetime', type('now', (datetime.datetime,), {
+        'utcnow': staticmethod(lambda: datetime.datetime(2019, 3, 1))}))
+
+    def on_candles(res):
+        threads.append(threading.get_ident())
+        raise asyncio.CancelledError()
+    monkeypatch.setattr(watcher, 'on_candles', on_candles)
+
+    async def run():
+        with pytest.raises(asyncio.CancelledError):
+            await watcher.watch()
+        return threading.get_ident()
+    loop_thread = asyncio.run(run())
+    assert threads and threads[0] != loop_thread
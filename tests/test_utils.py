@@ -0,0 +1,58 @@
+import pytest
+import datetime
+
+from configparser import ConfigParser
+from utils import periodToDelta, candle_tolerance, correct_timeframe, get_ixfromdatetimes_list
+
+@pytest.mark.parametrize("timeframe,delta", [('D', datetime.timedelta(days=10)),
+                                             ('H4', datetime.timedelta(hours=40)),
+                                             ('M15', datetime.timedelta(minutes=150)),
+                                             ('M30', datetime.timedelta(minutes=300))])
+def test_periodToDelta(timeframe, delta):
+    assert periodToDelta(10, timeframe) == delta
+
+def test_periodToDelta_invalid():
+    with pytest.raises(Exception):
+        periodToDelta(10, 'W')
+
+def test_periodToDelta_minutes():
+    assert periodToDelta(1, 'M15') == datetime.timedelta(minutes=15)
+    assert periodToDelta(4, 'M15') == periodToDelta(1, 'H1')
+
+def test_candle_tolerance():
+    assert candle_tolerance(periodToDelta(1, 'H4')) == datetime.timedelta(hours=1)
+    assert candle_tolerance(periodToDelta(1, 'M15')) == datetime.timedelta(0)
+
+@pytest.mark.parametrize("timeframe,pips", [('H12', '25'), ('H4', '8'), ('M30', '1')])
+def test_correct_timeframe(timeframe, pips):
+    settings = ConfigParser()
+    settings.read_dict({'trade_bot': {'add_pips': '50'},
+                        'trade': {'hr_pips': '3'}})
+    settings = correct_timeframe(settings, timeframe)
+    assert settings.get('trade_bot', 'add_pips') == pips
+    assert settings.get('trade', 'hr_pips') == '3'
+
+@pytest.mark.parametrize("timeframe", ['M15', 'M30'])
+def test_correct_timeframe_minutes(timeframe):
+    """
+    Check that the pips settings of the minute
+    timeframes are not rounded to 0
+    """
+    settings = ConfigParser()
+    settings.read_dict({'pivots': {'hr_pips': '25'},
+                        'candlelist': {'i_pips': '30'},
+                        'trade_bot': {'add_pips': '200', 'other_pips': '0'}})
+    settings = correct_timeframe(settings, timeframe)
+    assert settings.get('pivots', 'hr_pips') == '1'
+    assert settings.get('candlelist', 'i_pips') == '1'
+    assert settings.get('trade_bot', 'add_pips') == str(int(round(200*periodToDelta(1, timeframe) /
+                                                                  datetime.timedelta(days=1))))
+    assert settings.get('trade_bot', 'other_pips') == '0'
+
+def test_get_ixfromdatetimes_list():
+    """
+    Check that the list does not need to be sorted
+    """
+    dts = [datetime.datetime(2020, 6, d) for d in (5, 1, 3)]
+    assert get_ixfromdatetimes_list(dts, datetime.datetime(2020, 6, 2, 18)) == 2
+    assert get_ixfromdatetimes_list(dts, datetime.datetime(2020, 6, 1)) == 1
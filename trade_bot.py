@@ -1,23 +1,220 @@
 import logging
-import pdb
-import datetime
 from datetime import datetime
-import pandas as pd
-import os
+
+import numpy as np
 
 from oanda.connect import Connect
 from config import CONFIG
-from utils import *
-from candle.candle import *
-from candle.candlelist import CandleList
-from candle.candlelist_utils import *
-from trade_utils import *
-from trade import Trade
+from utils import periodToDelta, candle_tolerance
+from candle.candle import Candle
+from candle_cache import get_candlestore
+import resample
+from artifacts import ArtifactWriter
+import instrumentation as instr
+from trade_memo import TRADE_MEMO
+from data_client import DataClient, ReplayConnect
+from checkpoint import Checkpoint, run_key
+from sr_cache import get_sr_cache, halist_key, sr_settings
+from indicator_store import IndicatorStore
+from trade_outcome import evaluate_trades
 
 # create logger
 tb_logger = logging.getLogger(__name__)
 tb_logger.setLevel(logging.DEBUG)
 
+def calc_SR(clO, outfile=None):
+    '''
+    Function to run candle.candlelist_utils.calc_SR. The module
+    is imported on the first call, as it loads the plotting
+    libraries
+
+    Parameters
+    ----------
+    clO : CandleList object, Required
+    outfile : str, Optional
+              Path of the *.png file. If None, then it is not generated
+
+    Returns
+    -------
+    HAreaList object
+    '''
+    from candle.candlelist_utils import calc_SR as calc_SR_
+    return calc_SR_(clO, outfile=outfile)
+
+def calc_SR_plot(clO, outfile, writer=None, pair=None, timeframe=None):
+    '''
+    Function to run 'calc_SR' and plot the HAreaList
+    with 'writer'. If [trade_bot]sr_cache_dir is defined, then the
+    HAreaList is looked up first in the persistent sr_cache.SRCache
+    and, if it is found, then neither 'calc_SR' is run nor the
+    *.png file is generated
+
+    Parameters
+    ----------
+    clO : CandleList object, Required
+    outfile : str, Required
+              Path of the *.png file
+    writer : ArtifactWriter object, Optional
+             If None or in 'sync' mode, then 'calc_SR' generates the
+             *.png file itself. In 'async' mode, the plot is submitted to
+             the writer and in 'none' mode it is not generated
+    pair : str, Optional
+    timeframe : str, Optional
+                Both are needed for using the SRCache
+
+    Returns
+    -------
+    HAreaList object
+    '''
+    cache = key = None
+    if pair is not None and timeframe is not None:
+        cache = get_sr_cache()
+    if cache is not None:
+        key = halist_key(pair, timeframe, clO)
+    if key is not None:
+        with instr.span('sr_cache'):
+            SRlst = cache.get(key)
+        if SRlst is not None:
+            instr.count('sr_cache_hits')
+            return SRlst
+    if writer is None or writer.mode == 'sync':
+        # the *.png file is written by calc_SR
+        with instr.span('calc_SR+png'):
+            SRlst = calc_SR(clO, outfile=outfile)
+    else:
+        with instr.span('calc_SR'):
+            SRlst = calc_SR(clO, outfile=None)
+        writer.submit(SRlst.plot, clO=clO, outfile=outfile)
+    if key is not None:
+        cache.put(key, SRlst)
+    return SRlst
+
+def default_bulk(timeframe):
+    '''
+    Returns
+    -------
+    bool with the default 'bulk' of TradeBot.run for 'timeframe'. The
+    candles of the intraday timeframes (i.e. M15,M30) are too many
+    for analysing them one at a time
+    '''
+    return timeframe.startswith('M')
+
+def get_indicators(conn, clO, pair, timeframe, start, ser_dir=None):
+    '''
+    Function to get the IndicatorStore of the candles in 'clO'. The
+    candles of the RSI lead-in before 'start' are fetched with 'conn'
+
+    Parameters
+    ----------
+    conn : Connect object, Required
+    clO : CandleStore object, Required
+          Candles from 'start'
+    pair : str, Required
+    timeframe : str, Required
+    start : datetime, Required
+    ser_dir : str, Optional
+
+    Returns
+    -------
+    IndicatorStore object
+    '''
+    before = get_candlestore(conn,
+                             instrument=pair,
+                             granularity=timeframe,
+                             start=start - IndicatorStore.lead_in_delta(timeframe),
+                             end=start,
+                             ser_dir=ser_dir)
+    return IndicatorStore.from_store(clO, before=before)
+
+def evaluate_candle(tb_obj, c_candle, SRlst, clO, initc_date, delta, discard_sat=True,
+                    ic=None, colour=None):
+    '''
+    Function to check if a Trade is taken on a candle
+
+    Parameters
+    ----------
+    tb_obj : TradeBot or TradeDiscover object, Required
+    c_candle : Candle object, Required
+               Candle being checked
+    SRlst : HAreaList object, Required
+            S/R areas at the time of 'c_candle'
+    clO : CandleStore object, Required
+          Candles used for guessing the trade type and the SL
+    initc_date : datetime, Required
+                 Start of the candles used from 'clO'
+    delta : timedelta, Required
+            Duration of a candle
+    discard_sat : Bool
+                  If this is set to True, then the Trade wil not
+                  be taken if IC falls on a Saturday. Default: True
+    ic : Bool, Optional
+         If 'c_candle' is an indecision candle, as calculated by
+         CandleStore.features. If None, then Candle.indecision_c is used
+    colour : int, Optional
+             Colour of 'c_candle' as calculated by CandleStore.features.
+             If None, then the colour set by Candle.set_candle_features is used
+
+    Returns
+    -------
+    Trade object or None if no trade is taken
+    '''
+    #check if there is any HArea overlapping with c_candle
+    HAreaSel, sel_ix = SRlst.onArea(candle=c_candle)
+
+    if HAreaSel is None:
+        return None
+    instr.count('on_area')
+    # trade_utils is only imported when a candle is on an HArea
+    from trade_utils import get_trade_type, adjust_SL, prepare_trade
+
+    c_candle.set_candle_features()
+    # guess the if trade is 'long' or 'short'
+    newCl = clO.slice(start=initc_date, end=c_candle.time)
+    with instr.span('get_trade_type'):
+        type = TRADE_MEMO.trade_type(get_trade_type, tb_obj.pair, tb_obj.timeframe,
+                                     start=initc_date, end=c_candle.time, clO=newCl,
+                                     store=clO)
+    if ic is None:
+        ic = c_candle.indecision_c(ic_perc=CONFIG.getint('general', 'ic_perc'))
+    if colour is None:
+        colour = {'green': 1, 'red': -1}.get(c_candle.colour, 0)
+    prepare = False
+    if ic is True:
+        prepare = True
+    elif type == 'short' and colour == -1:
+        prepare = True
+    elif type == 'long' and colour == 1:
+        prepare = True
+
+    # discard if IC falls on a Saturday
+    if c_candle.time.weekday() == 5 and discard_sat is True:
+        tb_logger.info("Possible trade at {0} falls on Sat. Skipping...".format(c_candle.time))
+        prepare = False
+
+    if prepare is False:
+        return None
+
+    with instr.span('adjust_SL'):
+        SL = TRADE_MEMO.SL(adjust_SL, type, tb_obj.pair, tb_obj.timeframe,
+                           start=initc_date, end=c_candle.time, clO=newCl,
+                           n_SL=CONFIG.getint('trade_bot', 'n_SL'), store=clO)
+    with instr.span('prepare_trade'):
+        t = prepare_trade(
+            tb_obj=tb_obj,
+            type=type,
+            SL=SL,
+            ic=c_candle,
+            harea_sel=HAreaSel,
+            delta=delta,
+            add_pips=CONFIG.getint('trade', 'add_pips'))
+    instr.count('trades')
+    t.tot_SR = len(SRlst.halist)
+    t.rank_selSR = sel_ix
+    t.SRlst = SRlst
+    if getattr(tb_obj, 'indicators', None) is not None:
+        tb_obj.indicators.set_trade_attrs(t)
+    return t
+
 class TradeBot(object):
     '''
     This class represents an automatic Trading bot
@@ -31,15 +228,221 @@ class TradeBot(object):
     pair: str, Required
           Currency pair used in the trade. i.e. AUD_USD
     timeframe: str, Required
-               Timeframe used for the trade. Possible values are: D,H12,H10,H8,H4,H1
+               Timeframe used for the trade. Possible values are: D,H12,H10,H8,H4,H1,M30,M15
+    SR_memo: dict, Optional
+             If defined, the HAreaLists calculated by this Bot are stored in
+             this dict and reused by other Bots sharing it, as long as the
+             settings in sr_cache.SR_SETTINGS are the same
+    conn: Connect object, Optional
+          Object used for fetching the candles, i.e. a
+          data_client.PooledConnection. Default: a new Connect object
+    indicators: IndicatorStore object
+                RSI of the candles loaded by 'run', used for the
+                RSI attributes of the Trades
     '''
-    def __init__(self, start, end, pair, timeframe):
+    def __init__(self, start, end, pair, timeframe, SR_memo=None, conn=None):
         self.start = start
         self.end = end
         self.pair = pair
         self.timeframe = timeframe
+        self.SR_memo = SR_memo
+        self.conn = conn
+        self.indicators = None
 
-    def run(self, discard_sat=True):
+    def calc_SRlst(self, clO, dt, writer=None):
+        '''
+        Function to calculate the HAreaList at 'dt'. The S/R
+        report is written to a *.halist.txt file in [images]outdir
+
+        Parameters
+        ----------
+        clO : CandleList object, Required
+              CandleList used for calculating the S/R areas
+        dt : datetime, Required
+             Datetime for which the S/R areas will be calculated
+        writer : ArtifactWriter object, Optional
+                 Used for writing the *.png and *.halist.txt files.
+                 If None, then these are written before returning
+
+        Returns
+        -------
+        HAreaList object
+        '''
+        dt_str = dt.strftime("%d_%m_%Y_%H_%M")
+        outfile_txt = "{0}/srareas/{1}.{2}.{3}.halist.txt".format(CONFIG.get("images", "outdir"),
+                                                                self.pair, self.timeframe, dt_str)
+        outfile_png = "{0}/srareas/{1}.{2}.{3}.halist.png".format(CONFIG.get("images", "outdir"),
+                                                                  self.pair, self.timeframe, dt_str)
+        SRlst = memo_key = None
+        if self.SR_memo is not None:
+            memo_key = (self.pair, self.timeframe, self.start, dt, sr_settings())
+            SRlst = self.SR_memo.get(memo_key)
+        if SRlst is None:
+            SRlst = calc_SR_plot(clO, outfile=outfile_png, writer=writer,
+                                 pair=self.pair, timeframe=self.timeframe)
+            if memo_key is not None:
+                self.SR_memo[memo_key] = SRlst
+        if writer is None or writer.mode == 'sync':
+            with instr.span('halist_txt'):
+                f = open(outfile_txt, 'w')
+                res = SRlst.print()
+                # print SR report to file
+                f.write(res)
+                f.close()
+            tb_logger.info("Identified HAreaList for time {0}:".format(dt.isoformat()))
+            tb_logger.info("{0}".format(res))
+        else:
+            # SR report is generated out of the loop
+            writer.write_text(outfile_txt, SRlst.print)
+            tb_logger.info("Identified HAreaList for time {0} with {1} areas".format(dt.isoformat(),
+                                                                                    len(SRlst.halist)))
+
+        return SRlst
+
+    def scan(self, clO, startO, endO, initc_date, delta_period, delta, writer=None,
+             discard_sat=True, sink=None, ckpt=None, tlist=None, tend=None):
+        '''
+        Function to run the Bot from 'startO' to 'endO' evaluating
+        at once all the candles between two S/R refreshes. The area
+        overlap, Saturday, colour and indecision checks are done with
+        NumPy arrays and only the candles passing them are evaluated
+        with 'evaluate_candle'. The S/R refreshes happen at the same
+        candles than in the candle by candle loop of 'run'
+
+        Parameters
+        ----------
+        clO : CandleStore object, Required
+        startO : datetime, Required
+        endO : datetime, Required
+        initc_date : datetime, Required
+                     Start of the candles used for the trade type and the SL
+        delta_period : timedelta, Required
+                       Duration of the [trade_bot]period_range candles
+                       before each candle used for the S/R areas
+        delta : timedelta, Required
+                Duration of a candle
+        writer : ArtifactWriter object, Optional
+        discard_sat : Bool
+                      If this is set to True, then the Trade wil not
+                      be taken if IC falls on a Saturday. Default: True
+        sink : TradeSink object, Optional
+               If defined, then the Trades are added to it instead
+               of being returned
+        ckpt : Checkpoint object, Optional
+               If defined, then the state is saved in the S/R refreshes
+        tlist : list, Optional
+                Trades taken before 'startO' when resuming
+        tend : datetime, Optional
+               End of the active trade when resuming
+
+        Returns
+        -------
+        list of Trade objects
+        '''
+        period = max(CONFIG.getint('trade_bot', 'period'), 1)
+        ic_perc = CONFIG.getint('general', 'ic_perc')
+        nsteps = int((endO - startO) // delta) + 1
+        delta64 = np.timedelta64(delta)
+        tlist = tlist if tlist is not None else []
+        k = 0
+        block = None
+        try:
+            while k < nsteps and len(clO) > 0:
+                if tend is not None:
+                    if startO + k*delta <= tend:
+                        # there is an active trade. The S/R areas will be
+                        # calculated in the first candle after 'tend'
+                        k = int((tend - startO) // delta) + 1
+                        continue
+                    tend = None
+                startk = startO + k*delta
+                block = (startk, len(tlist), len(sink or ()))
+                if ckpt is not None and k > 0 and ckpt.step(period):
+                    self.save_checkpoint(ckpt, startk, 0, tend, None, tlist, sink)
+                # the window has [trade_bot]period_range candles, so the
+                # cost of each refresh does not grow along the run
+                SRlst = self.calc_SRlst(clO.slice(startk - delta_period, startk), startk,
+                                        writer=writer)
+                # candles until the next S/R refresh
+                kend = min(nsteps, k + period)
+                steps = np.datetime64(startk, 'us') + np.arange(kend - k) * delta64
+                # candle time is not equal to the step time when
+                # it is a non-working day, for example
+                ixs = clO.time_index().lookup(steps, how='ceil', tolerance=candle_tolerance(delta))
+                cand = ixs >= 0
+                ixs = np.maximum(ixs, 0)
+                cand &= clO.on_area_mask(SRlst, ixs=ixs)
+                if discard_sat is True:
+                    cand &= clO.weekday(ixs) != 5
+                colour, ic = clO.features(ixs, ic_perc)
+                instr.count('candles', kend - k)
+                for j in np.nonzero(cand)[0]:
+                    if tend is not None and startk + int(j)*delta <= tend:
+                        continue
+                    c_candle = clO.clist[int(ixs[j])]
+                    t = evaluate_candle(self,
+                                        c_candle=c_candle,
+                                        SRlst=SRlst,
+                                        clO=clO,
+                                        initc_date=initc_date,
+                                        delta=delta,
+                                        discard_sat=discard_sat,
+                                        ic=bool(ic[j]),
+                                        colour=int(colour[j]))
+                    if t is None:
+                        continue
+                    if sink is None:
+                        tlist.append(t)
+                    else:
+                        sink.add(t)
+                k = kend
+        except BaseException:
+            # the state at the start of the S/R refresh is saved if no
+            # Trades were found after it, as they would be found again
+            if ckpt is not None and block is not None and \
+                    block[1:] == (len(tlist), len(sink or ())):
+                self.save_checkpoint(ckpt, block[0], 0, None, None, tlist, sink)
+            raise
+        return tlist
+
+    def get_checkpoint(self, bulk, with_sink=False):
+        '''
+        Parameters
+        ----------
+        bulk : Bool, Required
+               'bulk' used by 'run'
+        with_sink : Bool, Optional
+                    True if the Trades are added to a TradeSink
+
+        Returns
+        -------
+        Checkpoint object for this run or None if
+        [trade_bot]checkpoint_dir is not defined
+        '''
+        if not CONFIG.has_option('trade_bot', 'checkpoint_dir'):
+            return None
+        return Checkpoint(CONFIG.get('trade_bot', 'checkpoint_dir'),
+                          run_key(self.pair, self.timeframe, self.start, self.end,
+                                  bulk=bulk, with_sink=with_sink))
+
+    def save_checkpoint(self, ckpt, startO, loop, tend, SRlst, tlist, sink=None):
+        '''
+        Function to save the state of the loop in 'run' before
+        analysing the candle at 'startO'. Only the Trades (or the
+        sink records and S/R snapshots) found since the last
+        checkpoint are written
+        '''
+        sink_state = None if sink is None else sink.state()
+        ckpt.save({'startO': startO,
+                   'loop': loop,
+                   'tend': tend,
+                   'SRlst': SRlst,
+                   'sink': sink_state},
+                  items=tlist if sink is None else sink.records,
+                  snapshots=None if sink is None else sink.snapshot_list())
+
+    def run(self, discard_sat=True, use_cursor=True, bulk=None, sink=None, resume=False,
+            shard=None, evaluate=None):
         '''
         This function will run the Bot from start to end
         one candle at a time
@@ -49,34 +452,59 @@ class TradeBot(object):
         discard_sat : Bool
                       If this is set to True, then the Trade wil not
                       be taken if IC falls on a Saturday. Default: True
+        use_cursor : Bool
+                     If True, then the candle being analysed in each step
+                     will be taken from the preloaded CandleStore instead of
+                     querying the API for it. Default: True
+        bulk : Bool
+               If True, then the candles between two S/R refreshes are
+               evaluated at once with 'scan'. Default: True for the
+               minute timeframes (i.e. M15,M30) and False otherwise
+        sink : TradeSink object, Optional
+               If defined, then each Trade taken is added to this sink as
+               a compact TradeRecord and the Trade is not kept
+        resume : Bool
+                 If True and [trade_bot]checkpoint_dir is defined, then the
+                 run continues from the last checkpoint saved for the same
+                 pair, timeframe, start, end and settings. Default: False
+        shard : tuple, Optional
+                (start, end) of the part of the run analysed, in the same
+                format as 'start' and 'end'. The S/R areas are calculated
+                with the [trade_bot]period_range candles before each refresh,
+                so the Trades are the same as in the whole run as long as
+                'start' is a candle in which the S/R areas are refreshed (see
+                batch_runner.shard_ranges). Shards are not checkpointed
+        evaluate : Bool
+                   If True, then the outcome of the Trades taken is assessed
+                   at the end of the run with trade_outcome.evaluate_trades.
+                   This is not done if 'sink' is defined, as the Trades are
+                   not kept. Default: [trade_bot]evaluate if defined, False
+                   otherwise
 
         Returns
         -------
         TradeList object with Trades taken. None if no trades
-        were taken
+        were taken. If 'sink' is defined, then 'sink' is returned
         '''
         tb_logger.info("Running...")
-        conn = Connect(instrument=self.pair,
-                       granularity=self.timeframe)
+        instr.configure()
+        TRADE_MEMO.new_run()
+        conn = self.conn or Connect(instrument=self.pair,
+                                    granularity=self.timeframe)
 
         ser_dir = None
         if CONFIG.has_option('general', 'ser_data_dir'):
             ser_dir = CONFIG.get('general', 'ser_data_dir')
 
-        delta = nhours = None
-        if self.timeframe == "D":
-            nhours = 24
-            delta = timedelta(hours=24)
-        else:
-            p1 = re.compile('^H')
-            m1 = p1.match(self.timeframe)
-            if m1:
-                nhours = int(self.timeframe.replace('H', ''))
-                delta = timedelta(hours=int(nhours))
+        delta = periodToDelta(1, self.timeframe)
+
+        tolerance = candle_tolerance(delta)
+        if bulk is None:
+            bulk = default_bulk(self.timeframe)
 
         # convert to datetime the start and end for this TradeBot
-        startO = pd.datetime.strptime(self.start, '%Y-%m-%d %H:%M:%S')
-        endO = pd.datetime.strptime(self.end, '%Y-%m-%d %H:%M:%S')
+        startO = datetime.strptime(self.start, '%Y-%m-%d %H:%M:%S')
+        endO = datetime.strptime(self.end, '%Y-%m-%d %H:%M:%S')
 
         loop = 0
         tlist = []
@@ -86,118 +514,165 @@ class TradeBot(object):
         delta_period = periodToDelta(CONFIG.getint('trade_bot', 'period_range'),
                                      self.timeframe)
         initc_date = startO-delta_period
+        ckpt = None
+        if shard is not None:
+            startO = datetime.strptime(shard[0], '%Y-%m-%d %H:%M:%S')
+            endO = datetime.strptime(shard[1], '%Y-%m-%d %H:%M:%S')
+        else:
+            ckpt = self.get_checkpoint(bulk, with_sink=sink is not None)
+        if ckpt is not None and resume is True:
+            state = ckpt.load()
+            if state is not None:
+                startO, loop, tend = state['startO'], state['loop'], state['tend']
+                SRlst = state['SRlst']
+                if sink is None:
+                    tlist = state['items']
+                else:
+                    sink.restore(state['sink'], records=state['items'],
+                                 snapshots=state['snapshots'])
         # Get now a CandleList from 'initc_date' to 'startO' which is the
         # total time interval for this TradeBot
-        res = conn.query(start=initc_date.isoformat(),
-                         end=endO.isoformat(),
-                         indir=ser_dir)
-
-        clO = CandleList(res)
-        while startO <= endO:
-
-            if tend is not None:
-                # this means that there is currently an active trade
-                if startO <= tend:
-                    startO = startO + delta
-                    loop += 1
-                    continue
-                else:
-                    tend = None
-            tb_logger.info("Trade bot - analyzing candle: {0}".format(startO.isoformat()))
-            sub_clO = clO.slice(initc_date,
-                                startO)
-            dt_str = startO.strftime("%d_%m_%Y_%H_%M")
-            if loop == 0:
-                outfile_txt = "{0}/srareas/{1}.{2}.{3}.halist.txt".format(CONFIG.get("images", "outdir"),
-                                                                        self.pair, self.timeframe, dt_str)
-                outfile_png = "{0}/srareas/{1}.{2}.{3}.halist.png".format(CONFIG.get("images", "outdir"),
-                                                                          self.pair, self.timeframe, dt_str)
-                SRlst = calc_SR(sub_clO, outfile=outfile_png)
-                f = open(outfile_txt, 'w')
-                res = SRlst.print()
-                # print SR report to file
-                f.write(res)
-                f.close()
-                tb_logger.info("Identified HAreaList for time {0}:".format(startO.isoformat()))
-                tb_logger.info("{0}".format(res))
-            elif loop >= CONFIG.getint('trade_bot',
-                                       'period'):
-                # An entire cycle has occurred. Invoke .calc_SR
-                outfile_txt = "{0}/srareas/{1}.{2}.{3}.halist.txt".format(CONFIG.get("images", "outdir"),
-                                                                      self.pair, self.timeframe, dt_str)
-                outfile_png = "{0}/srareas/{1}.{2}.{3}.halist.png".format(CONFIG.get("images", "outdir"),
-                                                                          self.pair, self.timeframe, dt_str)
-                SRlst = calc_SR(sub_clO, outfile=outfile_png)
-                f = open(outfile_txt, 'w')
-                res = SRlst.print()
-                tb_logger.info("Identified HAreaList for time {0}:".format(startO.isoformat()))
-                tb_logger.info("{0}".format(res))
-                # print SR report to file
-                f.write(res)
-                f.close()
-                loop = 0
-
-            # fetch candle for current datetime
-            res = conn.query(start=startO.isoformat(),
-                             count=1,
-                             indir=ser_dir)
-
-            # this is the current candle that
-            # is being checked
-            c_candle = Candle(dict_data=res['candles'][0])
-            c_candle.time = datetime.strptime(c_candle.time,
-                                              '%Y-%m-%dT%H:%M:%S.%fZ')
-
-            # c_candle.time is not equal to startO
-            # when startO is non-working day, for example
-            delta1hr = timedelta(hours=1)
-            if (c_candle.time != startO) and (abs(c_candle.time-startO) > delta1hr):
-                loop += 1
-                tb_logger.info("Analysed dt {0} is not the same than APIs returned dt {1}."
-                               " Skipping...".format(startO, c_candle.time))
-                startO = startO + delta
-                continue
-
-            #check if there is any HArea overlapping with c_candle
-            HAreaSel, sel_ix = SRlst.onArea(candle=c_candle)
-
-            if HAreaSel is not None:
-                c_candle.set_candle_features()
-                # guess the if trade is 'long' or 'short'
-                newCl = clO.slice(start=initc_date, end=c_candle.time)
-                type = get_trade_type(c_candle.time, newCl)
-                SL = adjust_SL(type, newCl, CONFIG.getint('trade_bot', 'n_SL'))
-                prepare = False
-                if c_candle.indecision_c(ic_perc=CONFIG.getint('general', 'ic_perc')) is True:
-                    prepare = True
-                elif type == 'short' and c_candle.colour == 'red':
-                    prepare = True
-                elif type == 'long' and c_candle.colour == 'green':
-                    prepare = True
-
-                # discard if IC falls on a Saturday
-                if c_candle.time.weekday() == 5 and discard_sat is True:
-                    tb_logger.info("Possible trade at {0} falls on Sat. Skipping...".format(c_candle.time))
-                    prepare = False
-
-                if prepare is True:
-                    t = prepare_trade(
-                        tb_obj=self,
-                        type=type,
-                        SL=SL,
-                        ic=c_candle,
-                        harea_sel=HAreaSel,
-                        delta=delta,
-                        add_pips=CONFIG.getint('trade', 'add_pips'))
-                    t.tot_SR = len(SRlst.halist)
-                    t.rank_selSR = sel_ix
-                    t.SRlst = SRlst
-                    tlist.append(t)
-            startO = startO+delta
-            loop += 1
-
+        # columnar store used for getting the current candle and the
+        # windows of candles. Candle objects are created on demand
+        with instr.span('get_candlestore'):
+            clO = get_candlestore(conn,
+                                  instrument=self.pair,
+                                  granularity=self.timeframe,
+                                  start=initc_date,
+                                  end=endO,
+                                  ser_dir=ser_dir)
+        with instr.span('indicators'):
+            self.indicators = get_indicators(conn, clO, self.pair, self.timeframe,
+                                             start=initc_date, ser_dir=ser_dir)
+        writer = ArtifactWriter()
+        try:
+            if bulk is True:
+                tlist = self.scan(clO,
+                                  startO=startO,
+                                  endO=endO,
+                                  initc_date=initc_date,
+                                  delta_period=delta_period,
+                                  delta=delta,
+                                  writer=writer,
+                                  discard_sat=discard_sat,
+                                  sink=sink,
+                                  ckpt=ckpt,
+                                  tlist=tlist,
+                                  tend=tend)
+            else:
+                try:
+                    while startO <= endO:
+                        if ckpt is not None and ckpt.step():
+                            self.save_checkpoint(ckpt, startO, loop, tend, SRlst, tlist, sink)
+
+                        if tend is not None:
+                            # this means that there is currently an active trade
+                            if startO <= tend:
+                                startO = startO + delta
+                                loop += 1
+                                continue
+                            else:
+                                tend = None
+                        tb_logger.info("Trade bot - analyzing candle: {0}".format(startO.isoformat()))
+                        instr.count('candles')
+                        with instr.span('slice'):
+                            sub_clO = clO.slice(startO - delta_period,
+                                                startO)
+                        if loop == 0:
+                            SRlst = self.calc_SRlst(sub_clO, startO, writer=writer)
+                        elif loop >= CONFIG.getint('trade_bot',
+                                                   'period'):
+                            # An entire cycle has occurred. Invoke .calc_SR
+                            SRlst = self.calc_SRlst(sub_clO, startO, writer=writer)
+                            loop = 0
+
+                        # this is the current candle that
+                        # is being checked
+                        c_candle = c_ix = None
+                        if use_cursor is True:
+                            c_ix = clO.get_ix(startO)
+                            if c_ix is None:
+                                loop += 1
+                                tb_logger.info("No candle available for dt {0}. Skipping...".format(startO))
+                                startO = startO + delta
+                                continue
+                            c_time = clO.get_datetime(c_ix)
+                        else:
+                            # fetch candle for current datetime
+                            with instr.span('query'):
+                                res = conn.query(start=startO.isoformat(),
+                                                 count=1,
+                                                 indir=ser_dir)
+                            c_candle = Candle(dict_data=res['candles'][0])
+                            c_candle.time = datetime.strptime(c_candle.time,
+                                                              '%Y-%m-%dT%H:%M:%S.%fZ')
+                            c_time = c_candle.time
+
+                        # c_time is not equal to startO
+                        # when startO is non-working day, for example
+                        if (c_time != startO) and (abs(c_time-startO) > tolerance):
+                            loop += 1
+                            tb_logger.info("Analysed dt {0} is not the same than APIs returned dt {1}."
+                                           " Skipping...".format(startO, c_time))
+                            startO = startO + delta
+                            continue
+
+                        if c_candle is None:
+                            # skip the Candle creation if the candle is
+                            # not within the price range of any HArea
+                            if clO.on_area(SRlst, c_ix) is False:
+                                startO = startO+delta
+                                loop += 1
+                                continue
+                            c_candle = clO.clist[c_ix]
+
+                        t = evaluate_candle(self,
+                                            c_candle=c_candle,
+                                            SRlst=SRlst,
+                                            clO=clO,
+                                            initc_date=initc_date,
+                                            delta=delta,
+                                            discard_sat=discard_sat)
+                        if t is not None:
+                            if sink is None:
+                                tlist.append(t)
+                            else:
+                                sink.add(t)
+                        startO = startO+delta
+                        loop += 1
+                except BaseException:
+                    if ckpt is not None:
+                        # the candles analysed since the last
+                        # checkpoint are not analysed again
+                        self.save_checkpoint(ckpt, startO, loop, tend, SRlst, tlist, sink)
+                    raise
+
+            if evaluate is None and CONFIG.has_option('trade_bot', 'evaluate'):
+                evaluate = CONFIG.getboolean('trade_bot', 'evaluate')
+            if evaluate is True and sink is not None:
+                tb_logger.warning("The outcome of the Trades is not assessed, as they "
+                                  "are added to a TradeSink and not kept")
+            elif evaluate is True and len(tlist) > 0:
+                # the candles are loaded once per group of overlapping
+                # trades, not once per Trade, with the connection of this run
+                def connect(instrument, granularity):
+                    return resample.for_granularity(conn, granularity) or \
+                        Connect(instrument=instrument, granularity=granularity)
+                with instr.span('evaluate_trades'):
+                    evaluate_trades(tlist, connect=connect)
+        finally:
+            # wait for the pending plots and reports
+            writer.close()
+            instr.export(name=run_key(self.pair, self.timeframe,
+                                      *(shard or (self.start, self.end))))
+            instr.close()
         tb_logger.info("Run done")
 
+        if ckpt is not None:
+            ckpt.done({'ntrades': len(tlist) if sink is None else len(sink)})
+        if sink is not None:
+            sink.flush()
+            return sink
         if len(tlist) == 0:
             return None
         else:
@@ -213,40 +688,50 @@ class TradeDiscover(object):
     pair: str, Required
           Currency pair used in the trade. i.e. AUD_USD
     timeframe: str, Required
-               Timeframe used for the trade. Possible values are: D,H12,H10,H8,H4
+               Timeframe used for the trade. Possible values are: D,H12,H10,H8,H4,H1,M30,M15
+    conn: Connect object, Optional
+          Object used for fetching the candles, i.e. a
+          data_client.PooledConnection. Default: a new Connect object
+    indicators: IndicatorStore object
+                RSI of the candles loaded by 'run', used for the
+                RSI attributes of the Trades
     '''
-    def __init__(self, start, pair, timeframe):
+    def __init__(self, start, pair, timeframe, conn=None):
         self.start = start
         self.pair = pair
         self.timeframe = timeframe
+        self.conn = conn
+        self.indicators = None
 
-    def run(self):
+    def run(self, discard_sat=True, use_cursor=True):
         """
         Run the bot from self.start
 
+        Parameters
+        ----------
+        discard_sat : Bool
+                      If this is set to True, then the Trade wil not
+                      be taken if IC falls on a Saturday. Default: True
+        use_cursor : Bool
+                     If True, then the candle for self.start will be taken
+                     from the preloaded CandleStore if it is there. Default: True
+
         Returns
         -------
         Trade object or none
         """
         tb_logger.info("Running...")
+        instr.configure()
+        TRADE_MEMO.new_run()
 
-        conn = Connect(instrument=self.pair,
-                       granularity=self.timeframe)
+        conn = self.conn or Connect(instrument=self.pair,
+                                    granularity=self.timeframe)
 
         ser_dir = None
         if CONFIG.has_option('general', 'ser_data_dir'):
             ser_dir = CONFIG.get('general', 'ser_data_dir')
 
-        delta = nhours = None
-        if self.timeframe == "D":
-            nhours = 24
-            delta = timedelta(hours=24)
-        else:
-            p1 = re.compile('^H')
-            m1 = p1.match(self.timeframe)
-            if m1:
-                nhours = int(self.timeframe.replace('H', ''))
-                delta = timedelta(hours=int(nhours))
+        delta = periodToDelta(1, self.timeframe)
 
         # calculate the start datetime for the CList that will be used
         # for calculating the S/R areas
@@ -256,61 +741,94 @@ class TradeDiscover(object):
         initc_date = self.start - delta_period
         # Get now a CandleList from 'initc_date' to 'startO' which is the
         # total time interval for this TradeBot
-        res = conn.query(start=initc_date.strftime("%Y-%m-%dT%H:%M:%S"),
-                         end=self.start.strftime("%Y-%m-%dT%H:%M:%S"),
-                         indir=ser_dir)
-        clO = CandleList(res)
+        with instr.span('get_candlestore'):
+            clO = get_candlestore(conn,
+                                  instrument=self.pair,
+                                  granularity=self.timeframe,
+                                  start=initc_date,
+                                  end=self.start,
+                                  ser_dir=ser_dir)
+        with instr.span('indicators'):
+            self.indicators = get_indicators(conn, clO, self.pair, self.timeframe,
+                                             start=initc_date, ser_dir=ser_dir)
         dt_str = self.start.strftime("%d_%m_%Y_%H_%M")
         outfile_png = "{0}/srareas/{1}.{2}.{3}.halist.png".format(CONFIG.get("images", "outdir"),
                                                                   self.pair, self.timeframe, dt_str)
-        SRlst = calc_SR(clO, outfile=outfile_png)
-
-        # fetch candle for current datetime
-        res = conn.query(start=self.start.strftime("%Y-%m-%dT%H:%M:%S"),
-                         count=1,
-                         indir=ser_dir)
+        writer = ArtifactWriter()
+        SRlst = calc_SR_plot(clO.slice(), outfile=outfile_png, writer=writer,
+                             pair=self.pair, timeframe=self.timeframe)
 
         # this is the current candle that
         # is being checked
-        c_candle = Candle(dict_data=res['candles'][0])
-        c_candle.time = datetime.strptime(c_candle.time,
-                                          '%Y-%m-%dT%H:%M:%S.%fZ')
-
-        # check if there is any HArea overlapping with c_candle
-        HAreaSel, sel_ix = SRlst.onArea(candle=c_candle)
-
-        if HAreaSel is not None:
-            c_candle.set_candle_features()
-            # guess the if trade is 'long' or 'short'
-            newCl = clO.slice(start=initc_date, end=c_candle.time)
-            type = get_trade_type(c_candle.time, newCl)
-            SL = adjust_SL(type, newCl, CONFIG.getint('trade_bot', 'n_SL'))
-            prepare = False
-            if c_candle.indecision_c(ic_perc=CONFIG.getint('general', 'ic_perc')) is True:
-                prepare = True
-            elif type == 'short' and c_candle.colour == 'red':
-                prepare = True
-            elif type == 'long' and c_candle.colour == 'green':
-                prepare = True
-
-            # discard if IC falls on a Saturday
-            if c_candle.time.weekday() == 5 and discard_sat is True:
-                tb_logger.info("Possible trade at {0} falls on Sat. Skipping...".format(c_candle.time))
-                prepare = False
-
-            t = None
-            if prepare is True:
-                t = prepare_trade(
-                    tb_obj=self,
-                    type=type,
-                    SL=SL,
-                    ic=c_candle,
-                    harea_sel=HAreaSel,
-                    delta=delta,
-                    add_pips=CONFIG.getint('trade', 'add_pips'))
-                t.tot_SR = len(SRlst.halist)
-                t.rank_selSR = sel_ix
-                t.SRlst = SRlst
-            return t
+        c_candle = None
+        if use_cursor is True:
+            c_ix = clO.get_ix(self.start)
+            if c_ix is not None:
+                c_candle = clO.clist[c_ix]
+        if c_candle is None:
+            # fetch candle for current datetime
+            with instr.span('query'):
+                res = conn.query(start=self.start.strftime("%Y-%m-%dT%H:%M:%S"),
+                                 count=1,
+                                 indir=ser_dir)
+            c_candle = Candle(dict_data=res['candles'][0])
+            c_candle.time = datetime.strptime(c_candle.time,
+                                              '%Y-%m-%dT%H:%M:%S.%fZ')
+
+        t = evaluate_candle(self,
+                            c_candle=c_candle,
+                            SRlst=SRlst,
+                            clO=clO,
+                            initc_date=initc_date,
+                            delta=delta,
+                            discard_sat=discard_sat)
+        writer.close()
+        instr.export(name="{0}.{1}.{2}".format(self.pair, self.timeframe,
+                                               self.start.strftime('%Y-%m-%dT%H%M%S')))
+        instr.close()
         tb_logger.info("Run done")
 
+        return t
+
+def discover_all(pairs, timeframe, start, client=None, discard_sat=True):
+    '''
+    Function to run TradeDiscover for several pairs. The candles of
+    all the pairs are fetched concurrently with a DataClient and then
+    each TradeDiscover is run with the candles already fetched
+
+    Parameters
+    ----------
+    pairs : list, Required
+            List of pairs. i.e. ['AUD_USD', 'EUR_GBP']
+    timeframe : str, Required
+    start : datetime, Required
+    client : DataClient object, Optional
+             Default: a new DataClient, closed when done
+    discard_sat : Bool
+                  Default: True
+
+    Returns
+    -------
+    dict with the Trade object (or None) for each pair
+    '''
+    own_client = client is None
+    client = client or DataClient()
+    initc_date = start - periodToDelta(CONFIG.getint('trade_bot', 'period_range'), timeframe)
+    ser_dir = None
+    if CONFIG.has_option('general', 'ser_data_dir'):
+        ser_dir = CONFIG.get('general', 'ser_data_dir')
+    try:
+        results = client.query_many([(pair, timeframe, {'start': initc_date.isoformat(),
+                                                        'end': start.isoformat(),
+                                                        'indir': ser_dir}) for pair in pairs])
+    finally:
+        if own_client is True:
+            client.close()
+    trades = {}
+    for pair, res in zip(pairs, results):
+        td = TradeDiscover(start=start,
+                           pair=pair,
+                           timeframe=timeframe,
+                           conn=ReplayConnect(pair, timeframe, data=res))
+        trades[pair] = td.run(discard_sat=discard_sat)
+    return trades
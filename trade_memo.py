@@ -0,0 +1,349 @@
+import logging
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import CONFIG
+
+# create logger
+tm_logger = logging.getLogger(__name__)
+tm_logger.setLevel(logging.INFO)
+
+# sections that do not change the trade type or the SL
+IGNORED_SECTIONS = ('images', 'trade_journal', 'pairs_start', 'instrumentation')
+
+def settings_key():
+    '''
+    Function to get the settings that can change the result of
+    'get_trade_type' and 'adjust_SL', so they are part of the memo key
+
+    Returns
+    -------
+    tuple
+    '''
+    return tuple((s, tuple(CONFIG.items(s, raw=True)))
+                 for s in CONFIG.sections() if s not in IGNORED_SECTIONS)
+
+class LRUMemo(object):
+    '''
+    This class represents a memo with a bounded number of entries.
+    The least recently used entry is evicted when it is full
+
+    Class variables
+    ---------------
+    maxsize: int, Optional
+             Maximum number of entries. 0 disables the memo.
+             Default: [trade_bot]memo_size or 1024
+    hits: int
+    misses: int
+    '''
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = self.misses = 0
+
+    @property
+    def maxsize(self):
+        # read when first used, so the settings are not read on import
+        if self._maxsize is None:
+            self._maxsize = 1024
+            if CONFIG.has_option('trade_bot', 'memo_size'):
+                self._maxsize = CONFIG.getint('trade_bot', 'memo_size')
+        return self._maxsize
+
+    def __len__(self):
+        return len(self.data)
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        '''
+        Function to get the value for 'key'. If it is not in the
+        memo, then it is func(*args, **kwargs)
+        '''
+        if self.maxsize == 0:
+            return func(*args, **kwargs)
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            value = func(*args, **kwargs)
+            self.data[key] = value
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+            return value
+        self.hits += 1
+        self.data.move_to_end(key)
+        return value
+
+    def clear(self):
+        self.data.clear()
+        self.hits = self.misses = 0
+
+class WindowExtremes(object):
+    '''
+    This class represents the highest high and the lowest low of
+    the last 'n' candles at each candle of a CandleStore, calculated
+    at once for all the candles. These are the prices 'adjust_SL'
+    looks for, so the SL of consecutive candles are looked up
+    instead of being recalculated from their windows
+
+    Class variables
+    ---------------
+    store: CandleStore object, Required
+    n: int, Required
+       Number of candles
+    highs, lows: numpy array
+                 [general]bit high and low prices of the candles
+    high: numpy array
+          Highest high of the last 'n' candles
+    low: numpy array
+         Lowest low of the last 'n' candles
+    '''
+    def __init__(self, store, n):
+        self.store = store
+        self.time = store.time
+        self.n = n
+        bit = CONFIG.get('general', 'bit')
+        self.highs = store.column('high{0}'.format(bit))
+        self.lows = store.column('low{0}'.format(bit))
+        self.high = self._rolling(self.highs, np.max)
+        self.low = self._rolling(self.lows, np.min)
+
+    def _rolling(self, values, func):
+        out = np.full(len(values), np.nan)
+        if len(values) >= self.n:
+            out[self.n-1:] = func(sliding_window_view(values, self.n), axis=1)
+        return out
+
+    def is_valid(self, store, n):
+        return self.store is store and self.time is store.time and self.n == n
+
+    def SL(self, type, start_ix, end_ix):
+        '''
+        Function to get the SL of a Trade taken at candle 'end_ix'
+
+        Parameters
+        ----------
+        type : str, Required
+               'long' or 'short'
+        start_ix : int, Required
+                   Index of the first candle of the window
+        end_ix : int, Required
+                 Index of the candle being evaluated
+
+        Returns
+        -------
+        float
+        '''
+        values = self.high if type == 'short' else self.low
+        if end_ix - self.n + 1 >= start_ix:
+            return float(values[end_ix])
+        # the window has less than 'n' candles
+        values = self.highs if type == 'short' else self.lows
+        window = values[start_ix:end_ix+1]
+        return float(window.max() if type == 'short' else window.min())
+
+# pivot types, as in zigzag.peak_valley_pivots
+PEAK, VALLEY = 1, -1
+
+def last_pivots(values, th_bounces):
+    '''
+    Function to get, for each price, the type of the last pivot of
+    the ZigZag of the prices until it. i.e. the last item of
+    zigzag.peak_valley_pivots(values[:t+1], th_bounces, -th_bounces)
+    for each 't', calculated in a single pass
+
+    Parameters
+    ----------
+    values : numpy array, Required
+    th_bounces : float, Required
+
+    Returns
+    -------
+    numpy array with PEAK or VALLEY for each price
+    '''
+    out = np.zeros(len(values), dtype=np.int8)
+    up, down = 1 + th_bounces, 1 - th_bounces
+    trend = None
+    for t, x in enumerate(float(v) for v in values):
+        if trend is None:
+            # the first pivot is not known until the price moves
+            # 'th_bounces' from the lowest or the highest price
+            if t == 0:
+                first_x = max_x = min_x = x
+                max_t = min_t = 0
+            elif x / min_x >= up:
+                trend = -(VALLEY if min_t == 0 else PEAK)
+            elif x / max_x <= down:
+                trend = -(PEAK if max_t == 0 else VALLEY)
+            if trend is None:
+                if x > max_x:
+                    max_x, max_t = x, t
+                if x < min_x:
+                    min_x, min_t = x, t
+                # the first pivot depends on the last price and
+                # there are no other pivots until the last price
+                trend_t = -(VALLEY if first_x < x else PEAK)
+                last_t = min_t if trend_t == VALLEY else max_t
+                out[t] = trend_t if last_t == t else -trend_t
+                continue
+            last_t, last_x = (min_t, min_x) if trend == VALLEY else (max_t, max_x)
+        r = x / last_x
+        if trend == VALLEY:
+            if r >= up:
+                trend = PEAK
+                last_x, last_t = x, t
+            elif x < last_x:
+                last_x, last_t = x, t
+        else:
+            if r <= down:
+                trend = VALLEY
+                last_x, last_t = x, t
+            elif x > last_x:
+                last_x, last_t = x, t
+        out[t] = trend if last_t == t else -trend
+    return out
+
+class WindowTrend(object):
+    '''
+    This class represents the trade type guessed by 'get_trade_type'
+    for the windows of a CandleStore starting at the same candle,
+    calculated at once for all the candles. 'get_trade_type' returns
+    'short' when the last pivot of the ZigZag of the window is a peak
+    and 'long' when it is a valley, and the ZigZag of a window is the
+    one of the previous window plus one price, so the windows of a
+    run are not calculated again for each candle
+
+    Class variables
+    ---------------
+    time: numpy array
+          Times of the CandleStore
+    start_ix: int, Required
+              Index of the first candle of the windows
+    pivots: numpy array
+            See 'last_pivots'. With the [general]part prices
+            and [pivots]th_bounces
+    '''
+    def __init__(self, store, start_ix):
+        self.time = store.time
+        self.start_ix = start_ix
+        values = store.column(CONFIG.get('general', 'part'))[start_ix:]
+        self.pivots = last_pivots(values, CONFIG.getfloat('pivots', 'th_bounces'))
+
+    def trade_type(self, end_ix):
+        '''
+        Function to get the trade type for the window ending
+        at candle 'end_ix'
+
+        Returns
+        -------
+        str. i.e. 'long' or 'short'
+        '''
+        return 'short' if self.pivots[end_ix - self.start_ix] == PEAK else 'long'
+
+class TradeMemo(object):
+    '''
+    This class memoizes 'get_trade_type' and 'adjust_SL' for the
+    windows of candles used by the bots. The trade types of the
+    windows of a CandleStore starting at the same candle are looked
+    up in their WindowTrend and the SL in the WindowExtremes of the
+    CandleStore, so they are shared by the candles of a run. Other
+    windows are identified by (pair, timeframe, window start, window
+    end), so the results are reused when the same candle is evaluated
+    again with the same settings
+
+    Class variables
+    ---------------
+    memo: LRUMemo object
+    settings: tuple
+              See 'settings_key'. It is calculated once per run
+              (see 'new_run')
+    extremes: WindowExtremes object
+              For the last CandleStore used
+    '''
+    def __init__(self, maxsize=None):
+        self.memo = LRUMemo(maxsize=maxsize)
+        self.settings = None
+        self.extremes = None
+
+    def new_run(self):
+        '''
+        Function to be called at the start of each run, so the
+        settings of the run are used in the memo keys
+        '''
+        self.settings = settings_key()
+        self.extremes = None
+
+    def get_settings(self):
+        if self.settings is None:
+            self.settings = settings_key()
+        return self.settings
+
+    def trade_type(self, func, pair, timeframe, start, end, clO, store=None):
+        '''
+        Function to get the trade type for the window [start, end]
+
+        Parameters
+        ----------
+        func : function, Required
+               get_trade_type
+        pair : str, Required
+        timeframe : str, Required
+        start : datetime, Required
+                Start of the window
+        end : datetime, Required
+              End of the window (time of the candle being evaluated)
+        clO : CandleList object, Required
+              Candles in the window
+        store : CandleStore object, Optional
+                If defined, then 'clO' is its window [start, end] and
+                the trade type is looked up in the WindowTrend of the
+                windows of 'store' starting at 'start', which is shared
+                by all the candles of a run, instead of calling 'func'
+
+        Returns
+        -------
+        str. i.e. 'long' or 'short'
+        '''
+        if store is not None:
+            start_ix, end_ix = store.bounds(start, end)
+            if end_ix > start_ix:
+                # the WindowTrend keeps a reference to 'store.time',
+                # so its id is not reused while the entry is kept
+                key = ('trend', pair, timeframe, id(store.time), start_ix,
+                       self.get_settings())
+                trend = self.memo.get_or_compute(key, WindowTrend, store, start_ix)
+                return trend.trade_type(end_ix-1)
+        key = ('type', pair, timeframe, start, end, self.get_settings())
+        return self.memo.get_or_compute(key, func, end, clO)
+
+    def SL(self, func, type, pair, timeframe, start, end, clO, n_SL, store=None):
+        '''
+        Function to get the SL for the window [start, end]
+
+        Parameters
+        ----------
+        func : function, Required
+               adjust_SL
+        type : str, Required
+        n_SL : int, Required
+        store : CandleStore object, Optional
+                If defined, then 'clO' is its window [start, end] and
+                the SL is looked up in the WindowExtremes of 'store'
+                instead of calling 'func'
+        See 'trade_type' for the rest
+
+        Returns
+        -------
+        float
+        '''
+        if store is not None:
+            start_ix, end_ix = store.bounds(start, end)
+            if end_ix > start_ix:
+                if self.extremes is None or not self.extremes.is_valid(store, n_SL):
+                    self.extremes = WindowExtremes(store, n_SL)
+                return self.extremes.SL(type, start_ix, end_ix-1)
+        key = ('SL', type, pair, timeframe, start, end, n_SL, self.get_settings())
+        return self.memo.get_or_compute(key, func, type, clO, n_SL)
+
+TRADE_MEMO = TradeMemo()
@@ -0,0 +1,308 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from config import CONFIG
+from data_client import DataClient
+from candle_cache import get_candlestore
+from utils import periodToDelta
+from pips import add_pips, substract_pips, price2pips
+
+# create logger
+to_logger = logging.getLogger(__name__)
+to_logger.setLevel(logging.INFO)
+
+# the candle returned for a datetime falling on a
+# weekend is the first one after the weekend
+WEEKEND = timedelta(days=3)
+
+def trade_start(t):
+    '''
+    Returns
+    -------
+    datetime with the start of Trade 't', which can be
+    a '%Y-%m-%d %H:%M:%S' string as in Trade.run
+    '''
+    if isinstance(t.start, str):
+        return datetime.strptime(t.start, '%Y-%m-%d %H:%M:%S')
+    return t.start
+
+def trade_range(t, numperiods):
+    '''
+    Function to get the datetime range of the candles needed for
+    assessing the outcome of Trade 't'. This covers 'numperiods'
+    candles of the trade's timeframe plus the candle returned for
+    the last of them, which can be after a weekend
+
+    Parameters
+    ----------
+    t : Trade object, Required
+    numperiods : int, Required
+                 Number of candles of the trade's timeframe
+
+    Returns
+    -------
+    tuple (start, end)
+    '''
+    start = trade_start(t)
+    return start, start + periodToDelta(numperiods + 1, t.timeframe) + WEEKEND
+
+def group_trades(trades, numperiods):
+    '''
+    Function to group the trades of the same pair and timeframe
+    whose ranges (see 'trade_range') overlap
+
+    Parameters
+    ----------
+    trades : list of Trade objects, Required
+    numperiods : int, Required
+
+    Returns
+    -------
+    list of (pair, timeframe, start, end, trades) tuples
+    '''
+    bykey = {}
+    for t in trades:
+        bykey.setdefault((t.pair, t.timeframe), []).append((trade_range(t, numperiods), t))
+    groups = []
+    for (pair, timeframe), items in bykey.items():
+        items.sort(key=lambda x: x[0])
+        for (start, end), t in items:
+            if groups and groups[-1][:2] == (pair, timeframe) and start <= groups[-1][3]:
+                groups[-1] = groups[-1][:3] + (max(end, groups[-1][3]), groups[-1][4] + [t])
+            else:
+                groups.append((pair, timeframe, start, end, [t]))
+    return groups
+
+def first_cross(lows, highs, price, pair, hr_pips):
+    '''
+    Function to get the first candle whose range crosses
+    'price' +/- 'hr_pips'
+
+    Parameters
+    ----------
+    lows : numpy array, Required
+    highs : numpy array, Required
+    price : float, Required
+    pair : str, Required
+    hr_pips : int, Required
+
+    Returns
+    -------
+    int with the index or None
+    '''
+    cross = cross_mask(lows, highs, price, pair, hr_pips)
+    if not cross.any():
+        return None
+    return int(cross.argmax())
+
+def cross_mask(lows, highs, price, pair, hr_pips):
+    '''
+    Returns
+    -------
+    numpy bool array with the candles crossing 'price' +/- 'hr_pips'
+    '''
+    upper = add_pips(pair, price, hr_pips)
+    lower = substract_pips(pair, price, hr_pips)
+    return (lows <= upper) & (highs >= lower)
+
+def cross_time(intraday, ctime, delta, price, pair, hr_pips):
+    '''
+    Function to get the time at which the candle starting at 'ctime'
+    crosses 'price', as HArea.get_cross_time does, using the intraday
+    candles within it
+
+    Parameters
+    ----------
+    intraday : CandleStore object, Required
+    ctime : datetime, Required
+    delta : timedelta, Required
+            Duration of the candle
+    price : float, Required
+    pair : str, Required
+    hr_pips : int, Required
+
+    Returns
+    -------
+    datetime or None if no intraday candle crosses 'price'
+    '''
+    bit = CONFIG.get('general', 'bit')
+    start_ix = intraday.bounds(ctime)[0]
+    end_ix = intraday.bounds(ctime + delta)[0]
+    ix = first_cross(intraday.column("low{0}".format(bit))[start_ix:end_ix],
+                     intraday.column("high{0}".format(bit))[start_ix:end_ix],
+                     price, pair, hr_pips)
+    if ix is None:
+        return None
+    return intraday.get_datetime(start_ix + ix)
+
+def evaluate_trade(t, clO, intraday, numperiods=None, hr_pips=None):
+    '''
+    Function to assess the outcome of Trade 't' with the same rules
+    as Trade.run, on preloaded candles. The candles of the trade's
+    timeframe are checked one at a time, from the one at t.start to
+    the one 'numperiods' candles later (Saturdays are skipped).
+    The trade is entered in the first candle crossing the entry
+    price. From that same candle, the first one crossing the SL (or
+    jumping over it) sets a 'failure' and the first one crossing the
+    TP (or jumping over it) a 'success'. The SL is checked before the
+    TP, so a candle crossing both is a 'failure'. The times of the
+    crosses are taken from the intraday candles, as in
+    HArea.get_cross_time. The attributes set in 't' are: entered,
+    start (the candle in which it is entered, with the same type as
+    the original start), entry_time (isoformat string as in
+    Trade.run), outcome, end and pips
+
+    Parameters
+    ----------
+    t : Trade object, Required
+    clO : CandleStore object, Required
+          Candles of the trade's timeframe covering 'trade_range'
+    intraday : CandleStore object, Required
+               Intraday candles ([trade]granularity) covering 'trade_range'
+    numperiods : int, Optional
+                 Default: [trade]numperiods
+    hr_pips : int, Optional
+              Default: [trade]hr_pips
+
+    Returns
+    -------
+    Trade object
+    '''
+    if numperiods is None:
+        numperiods = CONFIG.getint('trade', 'numperiods')
+    if hr_pips is None:
+        hr_pips = CONFIG.getint('trade', 'hr_pips')
+    bit = CONFIG.get('general', 'bit')
+    delta = periodToDelta(1, t.timeframe)
+    # datetimes checked by Trade.run. Each of them is
+    # assessed with the first candle at or after it
+    dates = np.datetime64(trade_start(t), 'us') + np.arange(numperiods) * np.timedelta64(delta)
+    days = dates.astype('datetime64[D]').astype(np.int64)
+    # 1970-01-01 was a Thursday
+    dates = dates[(days + 3) % 7 != 5]
+    ixs = np.searchsorted(clO.time, dates, side='left')
+    dates, ixs = dates[ixs < len(clO)], ixs[ixs < len(clO)]
+    lows = clO.column("low{0}".format(bit))[ixs]
+    highs = clO.column("high{0}".format(bit))[ixs]
+
+    t.entered = False
+    t.outcome = 'n.a.'
+    t.entry_time = t.end = t.pips = None
+    entry_k = None
+    for k in np.flatnonzero(cross_mask(lows, highs, t.entry, t.pair, hr_pips)):
+        t.entry_time = cross_time(intraday, clO.get_datetime(ixs[k]), delta,
+                                  t.entry, t.pair, hr_pips)
+        if t.entry_time is not None:
+            entry_k = k
+            break
+    if entry_k is None:
+        return t
+    t.entered = True
+    # Trade.run moves the start to the candle in which
+    # the trade is entered. The type of t.start is kept
+    start = dates[entry_k].item()
+    t.start = start.strftime('%Y-%m-%d %H:%M:%S') if isinstance(t.start, str) else start
+    t.entry_time = t.entry_time.isoformat()
+
+    long = t.type == 'long'
+    # the price can jump over the SL or the TP
+    SL_gap = highs < t.SL if long else lows > t.SL
+    TP_gap = lows > t.TP if long else highs < t.TP
+    SL_cross = cross_mask(lows, highs, t.SL, t.pair, hr_pips)
+    TP_cross = cross_mask(lows, highs, t.TP, t.pair, hr_pips)
+    hits = (SL_gap | TP_gap | SL_cross | TP_cross)[entry_k:]
+    for k in np.flatnonzero(hits) + entry_k:
+        ctime = clO.get_datetime(ixs[k])
+        for outcome, price, gap, cross in (('failure', t.SL, SL_gap, SL_cross),
+                                           ('success', t.TP, TP_gap, TP_cross)):
+            end = None
+            if gap[k]:
+                end = dates[k].item()
+            elif cross[k]:
+                end = cross_time(intraday, ctime, delta, price, t.pair, hr_pips)
+            if end is not None:
+                t.outcome = outcome
+                t.end = end
+                t.pips = price2pips(t.pair, abs(price - t.entry))
+                if outcome == 'failure':
+                    t.pips = t.pips * -1
+                return t
+    return t
+
+def evaluate_group(pair, timeframe, start, end, trades, numperiods, granularity, connect,
+                   ser_dir=None):
+    '''
+    Function to load once the candles of 'timeframe' and the intraday
+    candles from 'start' to 'end' and to assess the outcome of
+    each of 'trades' with them
+
+    Parameters
+    ----------
+    connect : function, Required
+              Function with 'instrument' and 'granularity' arguments
+              returning the object used for the queries
+
+    Returns
+    -------
+    list of Trade objects
+    '''
+    stores = []
+    for gran in (timeframe, granularity):
+        stores.append(get_candlestore(connect(instrument=pair, granularity=gran),
+                                      instrument=pair,
+                                      granularity=gran,
+                                      start=start,
+                                      end=end,
+                                      ser_dir=ser_dir))
+    return [evaluate_trade(t, stores[0], stores[1], numperiods=numperiods) for t in trades]
+
+def evaluate_trades(trades, workers=None, connect=None):
+    '''
+    Function to assess the outcome of a list of Trades. The trades are
+    grouped by pair, timeframe and overlapping range (see 'group_trades'),
+    so the candles are requested once per group instead of once per
+    trade. The groups are evaluated in a pool of 'workers' threads
+
+    Parameters
+    ----------
+    trades : list of Trade objects, Required
+    workers : int, Optional
+              Number of threads. Default: [trade]workers if
+              defined, 1 otherwise
+    connect : function, Optional
+              Function with 'instrument' and 'granularity' arguments
+              returning the object used for the queries, i.e. the
+              'connection' method of a DataClient. Default: the
+              connections of a new DataClient
+
+    Returns
+    -------
+    list of Trade objects with the outcome set
+    '''
+    numperiods = CONFIG.getint('trade', 'numperiods')
+    granularity = CONFIG.get('trade', 'granularity')
+    ser_dir = None
+    if CONFIG.has_option('general', 'ser_data_dir'):
+        ser_dir = CONFIG.get('general', 'ser_data_dir')
+    if workers is None and CONFIG.has_option('trade', 'workers'):
+        workers = CONFIG.getint('trade', 'workers')
+    client = None
+    if connect is None:
+        client = DataClient()
+        connect = client.connection
+    groups = group_trades(trades, numperiods)
+    to_logger.info("Evaluating {0} trades in {1} groups".format(len(trades), len(groups)))
+    try:
+        with ThreadPoolExecutor(max_workers=workers or 1) as executor:
+            futures = [executor.submit(evaluate_group, pair, timeframe, start, end, gtrades,
+                                       numperiods, granularity, connect, ser_dir=ser_dir)
+                       for pair, timeframe, start, end, gtrades in groups]
+            for future in futures:
+                future.result()
+    finally:
+        if client is not None:
+            client.close()
+    return trades
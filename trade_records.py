@@ -0,0 +1,273 @@
+import logging
+import csv
+import numbers
+import os
+from datetime import datetime
+
+import numpy as np
+
+from config import CONFIG
+
+# create logger
+tr_logger = logging.getLogger(__name__)
+tr_logger.setLevel(logging.INFO)
+
+def get_colnames():
+    '''
+    Returns
+    -------
+    list with the column names in [trade_journal]colnames
+    '''
+    colnames = CONFIG.get('trade_journal', 'colnames')
+    colnames = [c.strip().strip('\\').strip() for c in colnames.split(',')]
+    return [c for c in colnames if c != '']
+
+def arrow_type(pa, values):
+    '''
+    Function to get the Arrow type of a column of the records
+
+    Parameters
+    ----------
+    pa : module, Required
+         pyarrow
+    values : list, Required
+
+    Returns
+    -------
+    pyarrow DataType. Bool, int64, float64 or timestamp if all the
+    values (but None) are of that type and string otherwise
+    '''
+    values = [v for v in values if v is not None]
+    if not values:
+        return pa.string()
+    if all(isinstance(v, (bool, np.bool_)) for v in values):
+        return pa.bool_()
+    if all(isinstance(v, numbers.Integral) and not isinstance(v, (bool, np.bool_))
+           for v in values):
+        return pa.int64()
+    if all(isinstance(v, numbers.Real) and not isinstance(v, (bool, np.bool_))
+           for v in values):
+        return pa.float64()
+    if all(isinstance(v, datetime) for v in values):
+        return pa.timestamp('us')
+    return pa.string()
+
+class TradeRecord(object):
+    '''
+    This class represents a compact copy of a Trade with only the
+    values of the [trade_journal]colnames attributes. The S/R areas
+    are referenced by the id of the snapshot stored in the TradeSink
+
+    Class variables
+    ---------------
+    colnames: tuple, Required
+              Shared by all the records of a TradeSink
+    values: tuple, Required
+            One value per column
+    SR_id: int, Optional
+           Key of the HAreaList in TradeSink.snapshots
+    '''
+    __slots__ = ('colnames', 'values', 'SR_id')
+
+    def __init__(self, colnames, values, SR_id=None):
+        self.colnames = colnames
+        self.values = values
+        self.SR_id = SR_id
+
+    def __getattr__(self, name):
+        if name in TradeRecord.__slots__:
+            raise AttributeError(name)
+        try:
+            return self.values[self.colnames.index(name)]
+        except ValueError:
+            raise AttributeError(name)
+
+    def __getstate__(self):
+        return (self.colnames, self.values, self.SR_id)
+
+    def __setstate__(self, state):
+        self.colnames, self.values, self.SR_id = state
+
+    def to_dict(self):
+        row = dict(zip(self.colnames, self.values))
+        row['SR_id'] = self.SR_id
+        return row
+
+class TradeSink(object):
+    '''
+    This class represents the destination of the Trades found by the
+    bots. Each Trade is converted to a TradeRecord, the HAreaList
+    attached to it is stored once in 'snapshots' and the Trade itself
+    is not kept. If 'outfile' is defined, then the records are written
+    to it every 'batch_size' trades. Otherwise they are kept in 'records'
+
+    Class variables
+    ---------------
+    outfile: str, Optional
+             *.csv or *.parquet file. Parquet needs pyarrow
+    colnames: list, Optional
+              Trade attributes kept. Default: [trade_journal]colnames
+    batch_size: int, Optional
+                Number of records written at once. Default: 1000
+    keep_SR: Bool, Optional
+             If False, then the HAreaLists are not kept. Default: True
+    records: list
+             Records not written yet
+    snapshots: dict
+               HAreaList for each SR_id
+    nrecords: int
+              Number of records added
+    '''
+    def __init__(self, outfile=None, colnames=None, batch_size=1000, keep_SR=True):
+        self.outfile = outfile
+        self.colnames = tuple(colnames or get_colnames())
+        self.batch_size = batch_size
+        self.keep_SR = keep_SR
+        self.records = []
+        self.snapshots = {}
+        self._SR_ids = {}
+        self.nrecords = 0
+        self._writer = None
+        self._f = None
+
+    def add(self, t):
+        '''
+        Function to add a Trade
+
+        Parameters
+        ----------
+        t : Trade object, Required
+
+        Returns
+        -------
+        TradeRecord object
+        '''
+        SR_id = None
+        SRlst = getattr(t, 'SRlst', None)
+        if SRlst is not None and self.keep_SR is True:
+            # the same HAreaList is shared by the trades
+            # found between two S/R refreshes
+            SR_id = self._SR_ids.get(id(SRlst))
+            if SR_id is None:
+                SR_id = self._SR_ids[id(SRlst)] = len(self.snapshots)
+                self.snapshots[SR_id] = SRlst
+        rec = TradeRecord(self.colnames,
+                          tuple([getattr(t, c, None) for c in self.colnames]),
+                          SR_id=SR_id)
+        self.records.append(rec)
+        self.nrecords += 1
+        if self.outfile is not None and len(self.records) >= self.batch_size:
+            self.flush()
+        return rec
+
+    def __len__(self):
+        return self.nrecords
+
+    def flush(self):
+        '''
+        Function to write the pending records to 'outfile'
+        '''
+        if self.outfile is None or not self.records:
+            return
+        if os.path.splitext(self.outfile)[1] == '.parquet':
+            self._write_parquet()
+        else:
+            self._write_csv()
+        self.records = []
+
+    def _write_csv(self):
+        if self._writer is None:
+            self._f = open(self.outfile, 'w', newline='')
+            self._writer = csv.writer(self._f)
+            self._writer.writerow(list(self.colnames) + ['SR_id'])
+        self._writer.writerows([list(r.values) + [r.SR_id] for r in self.records])
+        self._f.flush()
+
+    def _write_parquet(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("pyarrow is needed for writing {0}".format(self.outfile))
+        colnames = list(self.colnames) + ['SR_id']
+        columns = [list(vals) for vals in zip(*[r.values + (r.SR_id,) for r in self.records])]
+        if self._writer is None:
+            # the types of the columns are the ones of the first batch
+            schema = pa.schema([(c, arrow_type(pa, vals)) for c, vals in zip(self.colnames, columns)] +
+                               [('SR_id', pa.int64())])
+            self._writer = pq.ParquetWriter(self.outfile, schema)
+        schema = self._writer.schema
+        arrays = []
+        for c, vals in zip(colnames, columns):
+            type = schema.field(c).type
+            if pa.types.is_string(type):
+                vals = [v if v is None or isinstance(v, str) else str(v) for v in vals]
+            arrays.append(pa.array(vals, type=type))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    def state(self):
+        '''
+        Function to get the state of this sink to be saved in a
+        checkpoint. The pending records are written first. The
+        records not written to 'outfile' and the snapshots are not
+        included, as they are saved incrementally by the Checkpoint
+        (see 'snapshot_list')
+
+        Returns
+        -------
+        dict
+        '''
+        self.flush()
+        position = None
+        if self._f is not None:
+            position = self._f.tell()
+        elif self._writer is not None:
+            raise Exception("Parquet files can not be resumed from a checkpoint")
+        return {'nrecords': self.nrecords,
+                'position': position}
+
+    def snapshot_list(self):
+        '''
+        Returns
+        -------
+        list with the HAreaList of each SR_id. The snapshots are only
+        added, so the ones saved by a checkpoint are at its start
+        '''
+        return [self.snapshots[SR_id] for SR_id in range(len(self.snapshots))]
+
+    def restore(self, state, records=None, snapshots=None):
+        '''
+        Function to restore the state returned by 'state'. The records
+        written to 'outfile' after the checkpoint are discarded
+
+        Parameters
+        ----------
+        state : dict, Required
+                If None, then the sink is left empty
+        records : list, Optional
+                  Records not written to 'outfile' when 'state' was saved
+        snapshots : list, Optional
+                    Snapshots saved until 'state' (see 'snapshot_list')
+        '''
+        if state is None:
+            return
+        self.records = list(records or [])
+        self.snapshots = dict(enumerate(snapshots or []))
+        self._SR_ids = {id(SRlst): SR_id for SR_id, SRlst in self.snapshots.items()}
+        self.nrecords = state['nrecords']
+        if state['position'] is not None:
+            self._f = open(self.outfile, 'r+', newline='')
+            self._f.truncate(state['position'])
+            self._f.seek(state['position'])
+            self._writer = csv.writer(self._f)
+
+    def close(self):
+        '''
+        Function to write the pending records and close 'outfile'
+        '''
+        self.flush()
+        if self._f is not None:
+            self._f.close()
+        elif self._writer is not None:
+            self._writer.close()
+        self._writer = self._f = None
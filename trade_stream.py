@@ -0,0 +1,266 @@
+'''
+Watch several instruments and timeframes for new trades as soon
+as each new candle is closed
+
+Usage: python trade_stream.py --pairs AUD_USD,EUR_GBP --timeframes D,H4
+'''
+import logging
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from oanda.connect import Connect
+from config import CONFIG
+from utils import periodToDelta
+from candle_cache import get_candlestore
+from candle_store import CandleStore
+from artifacts import ArtifactWriter
+from trade_bot import TradeDiscover, evaluate_candle, calc_SR_plot
+from trade_memo import TRADE_MEMO
+
+# create logger
+ts_logger = logging.getLogger(__name__)
+ts_logger.setLevel(logging.INFO)
+
+class InstrumentWatcher(object):
+    '''
+    This class represents a watcher of the new candles of an
+    instrument and timeframe. The candles of the last
+    [trade_bot]period_range are kept in memory, so only the new
+    candle is fetched and evaluated when it is closed. The S/R areas
+    are calculated with calc_SR as TradeDiscover does, every
+    [trade_bot]period candles as TradeBot does. They are kept between
+    the candles
+
+    Class variables
+    ---------------
+    pair: str, Required
+          Currency pair. i.e. AUD_USD
+    timeframe: str, Required
+               Timeframe. i.e. D,H12,H8,H4
+    on_trade: function, Optional
+              Function called with each Trade that is found.
+              Default: log the Trade
+    discard_sat: Bool, Optional
+                 If True, then the Trade wil not be taken if IC falls
+                 on a Saturday. Default: True
+    conn: Connect object, Optional
+          Object used for fetching the candles, i.e. a
+          data_client.PooledConnection or a ReplayConnect.
+          Default: a new Connect object
+    clO: CandleStore object
+         Candles of the last [trade_bot]period_range
+    SRlst: HAreaList object
+           S/R areas of the last refresh
+    nsince: int
+            Number of candles evaluated since the last refresh
+    '''
+    def __init__(self, pair, timeframe, on_trade=None, discard_sat=True, conn=None):
+        self.pair = pair
+        self.timeframe = timeframe
+        self.on_trade = on_trade or self.log_trade
+        self.discard_sat = discard_sat
+        self.conn = conn or Connect(instrument=pair,
+                                    granularity=timeframe)
+        self.delta = periodToDelta(1, timeframe)
+        self.period_range = CONFIG.getint('trade_bot', 'period_range')
+        self.period = max(CONFIG.getint('trade_bot', 'period'), 1)
+        self.delta_period = periodToDelta(self.period_range, timeframe)
+        self.clO = self.SRlst = None
+        self.nsince = 0
+
+    def log_trade(self, t):
+        ts_logger.info("New trade for {0} {1}: {2}".format(self.pair, self.timeframe, t))
+
+    def load(self, now=None):
+        '''
+        Function to load the candles of the last [trade_bot]period_range
+
+        Parameters
+        ----------
+        now : datetime, Optional
+              Default: current UTC time
+        '''
+        now = now or datetime.utcnow()
+        TRADE_MEMO.new_run()
+        self.SRlst = None
+        self.nsince = 0
+        self.clO = get_candlestore(self.conn,
+                                   instrument=self.pair,
+                                   granularity=self.timeframe,
+                                   start=now - self.delta_period,
+                                   end=now)
+        if not self.clO.complete.all():
+            # the last candle could be still open
+            self.clO = CandleStore.from_records(self.clO.to_records()[self.clO.complete],
+                                                instrument=self.pair,
+                                                granularity=self.timeframe)
+
+    def last_time(self):
+        '''
+        Returns
+        -------
+        datetime of the last closed candle or None
+        '''
+        if len(self.clO) == 0:
+            return None
+        return self.clO.get_datetime(len(self.clO)-1)
+
+    def poll(self):
+        '''
+        Function to fetch the candles closed after the last one
+        in 'clO'. This is blocking, so it is run in an executor
+
+        Returns
+        -------
+        dict as returned by Connect.query with the closed candles
+        '''
+        now = datetime.utcnow()
+        if self.last_time() is None:
+            # no candles were loaded
+            start = now - self.delta_period
+        else:
+            start = self.last_time() + self.delta
+        try:
+            res = self.conn.query(start=start.isoformat(),
+                                  end=now.isoformat())
+        except Exception as e:
+            ts_logger.warning("Candles for {0} {1} could not be fetched: {2}".format(self.pair,
+                                                                                    self.timeframe, e))
+            return None
+        res['candles'] = [c for c in res['candles'] if c.get('complete', True) is True]
+        return res
+
+    def get_SRlst(self, c_time, writer=None):
+        '''
+        Function to get the HAreaList at 'c_time'. The areas are
+        calculated again every [trade_bot]period candles
+
+        Parameters
+        ----------
+        c_time : datetime, Required
+                 Time of the last candle in 'clO' used
+        writer : ArtifactWriter object, Optional
+
+        Returns
+        -------
+        HAreaList object
+        '''
+        if self.SRlst is not None and self.nsince < self.period:
+            self.nsince += 1
+            return self.SRlst
+        dt_str = c_time.strftime("%d_%m_%Y_%H_%M")
+        outfile_png = "{0}/srareas/{1}.{2}.{3}.halist.png".format(CONFIG.get("images", "outdir"),
+                                                                  self.pair, self.timeframe, dt_str)
+        self.SRlst = calc_SR_plot(self.clO.slice(c_time - self.delta_period, c_time),
+                                  outfile=outfile_png, writer=writer,
+                                  pair=self.pair, timeframe=self.timeframe)
+        self.nsince = 1
+        return self.SRlst
+
+    def on_candles(self, res):
+        '''
+        Function to evaluate each of the new candles in 'res'.
+        Then the candles older than [trade_bot]period_range
+        are removed from 'clO'
+
+        Parameters
+        ----------
+        res : dict, Required
+              Dictionary as returned by Connect.query
+
+        Returns
+        -------
+        list of Trade objects found
+        '''
+        first_ix = len(self.clO)
+        self.clO.extend(res)
+        tlist = []
+        writer = ArtifactWriter()
+        for ix in range(first_ix, len(self.clO)):
+            c_time = self.clO.get_datetime(ix)
+            SRlst = self.get_SRlst(c_time, writer=writer)
+            if self.clO.on_area(SRlst, ix) is False:
+                continue
+            td = TradeDiscover(start=c_time, pair=self.pair, timeframe=self.timeframe,
+                               conn=self.conn)
+            t = evaluate_candle(td,
+                                c_candle=self.clO.clist[ix],
+                                SRlst=SRlst,
+                                clO=self.clO,
+                                initc_date=c_time - self.delta_period,
+                                delta=self.delta,
+                                discard_sat=self.discard_sat)
+            if t is not None:
+                self.on_trade(t)
+                tlist.append(t)
+        writer.close()
+        # the window of the next candle has at most
+        # period_range+1 candles
+        self.clO.truncate(self.period_range + 1)
+        return tlist
+
+    async def watch(self, poll_interval=1.0):
+        '''
+        Coroutine to wait for each new candle and evaluate it. The
+        candles are polled every 'poll_interval' seconds once the
+        next candle is expected to be closed. If it does not arrive
+        within a minute (i.e. market is closed), then they are polled
+        every minute
+
+        Parameters
+        ----------
+        poll_interval : float
+                        Seconds between polls. Default: 1
+        '''
+        loop = asyncio.get_running_loop()
+        if self.clO is None:
+            await loop.run_in_executor(None, self.load)
+        while True:
+            late = timedelta(0)
+            if self.last_time() is not None:
+                # a candle is closed 'delta' after its time
+                next_close = self.last_time() + 2*self.delta
+                wait = (next_close - datetime.utcnow()).total_seconds()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                late = datetime.utcnow() - next_close
+            res = await loop.run_in_executor(None, self.poll)
+            if res is None or len(res['candles']) == 0:
+                await asyncio.sleep(poll_interval if late < timedelta(minutes=1) else 60)
+                continue
+            # calc_SR is blocking, so the other watchers
+            # keep running while the candles are evaluated
+            await loop.run_in_executor(None, self.on_candles, res)
+
+async def watch_all(watchers, poll_interval=1.0):
+    '''
+    Coroutine to run several InstrumentWatchers concurrently
+
+    Parameters
+    ----------
+    watchers : list of InstrumentWatcher, Required
+    poll_interval : float
+                    Seconds between polls. Default: 1
+    '''
+    await asyncio.gather(*[w.watch(poll_interval=poll_interval) for w in watchers])
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch instruments for new trades')
+    parser.add_argument('--pairs', type=str,
+                        help='Comma-separated list of pairs. Default: all pairs in [pairs_start]')
+    parser.add_argument('--timeframes', type=str, default='D',
+                        help='Comma-separated list of timeframes. Default: D')
+    parser.add_argument('--poll_interval', type=float, default=1.0,
+                        help='Seconds between polls once a candle is expected. Default: 1')
+    args = parser.parse_args()
+
+    if args.pairs is None:
+        pairs = [p.upper() for p in CONFIG.options('pairs_start')]
+    else:
+        pairs = args.pairs.split(',')
+    watchers = [InstrumentWatcher(p, tf) for p in pairs for tf in args.timeframes.split(',')]
+    asyncio.run(watch_all(watchers, poll_interval=args.poll_interval))
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,9 @@
 import datetime
 import re
-import pdb
 from datetime import datetime,timedelta
 
+from pips import price2pips, add_pips, substract_pips
+
 def try_parsing_date(text):
     '''
     Function to parse a string that can be formatted in
@@ -22,7 +23,7 @@ def try_parsing_date(text):
 def calculate_pips(pair, price):
     '''
     Function to calculate the number of pips
-    for a given price
+    for a given price. See pips.price2pips
 
     Parameters
     ----------
@@ -35,20 +36,12 @@ def calculate_pips(pair, price):
     float
           Number of pips
     '''
-
-    pips = None
-    (first, second) = pair.split("_")
-    if first == 'JPY' or second == 'JPY':
-        pips = price * 100
-    else:
-        pips = price * 10000
-
-    return '%.1f' % pips
+    return price2pips(pair, price)
 
 def add_pips2price(pair, price, pips):
     '''
     Function that gets a price value and adds
-    a certain number of pips to the price
+    a certain number of pips to the price. See pips.add_pips
 
     Parameters
     ----------
@@ -62,26 +55,12 @@ def add_pips2price(pair, price, pips):
     -------
     float value
     '''
-
-    (first, second) = pair.split("_")
-    round_number = None
-    divisor = None
-    if first == 'JPY' or second == 'JPY':
-        round_number = 2
-        divisor = 100
-    else:
-        round_number = 4
-        divisor = 10000
-    price = round(price, round_number)
-
-    iprice = price + (pips / divisor)
-
-    return iprice
+    return add_pips(pair, price, pips)
 
 def substract_pips2price(pair, price, pips):
     '''
     Function that gets a price value and substracts
-    a certain number of pips to the price
+    a certain number of pips to the price. See pips.substract_pips
 
     Parameters
     ----------
@@ -95,21 +74,7 @@ def substract_pips2price(pair, price, pips):
     -------
     float value
     '''
-
-    (first, second) = pair.split("_")
-    round_number = None
-    divisor = None
-    if first == 'JPY' or second == 'JPY':
-        round_number = 2
-        divisor = 100
-    else:
-        round_number = 4
-        divisor = 10000
-    price = round(price, round_number)
-
-    dprice = price - (pips / divisor)
-
-    return dprice
+    return substract_pips(pair, price, pips)
 
 def periodToDelta(ncandles, timeframe):
     '''
@@ -120,30 +85,56 @@ def periodToDelta(ncandles, timeframe):
     ----------
     ncandles: Number of candles for which the timedelta will be retrieved. Required
     timeframe: str, Required
-               Timeframe used for getting the delta object. Possible values are: 2D,D,H12,H10,H8,H4
+               Timeframe used for getting the delta object. Possible values are:
+               D,H12,H10,H8,H4,H1,M30,M15,...
 
     Returns
     -------
     datetime timedelta object
     '''
 
-    patt=re.compile("(\d)D")
+    patt=re.compile(r"(\d)D")
+    m = re.match(r"^([HM])(\d+)$", timeframe)
 
     delta = None
     if patt.match(timeframe):
         raise Exception("{0} is not valid. Oanda rest service does not take it".format(timeframe))
     elif timeframe=='D':
         delta = timedelta(hours=24 * ncandles)
+    elif m is None:
+        raise Exception("{0} is not a valid timeframe".format(timeframe))
+    elif m.group(1) == 'H':
+        delta = timedelta(hours=int(m.group(2)) * ncandles)
     else:
-        fgran = timeframe.replace('H', '')
-        delta = timedelta(hours=int(fgran) * ncandles)
+        delta = timedelta(minutes=int(m.group(2)) * ncandles)
 
     return delta
 
+def candle_tolerance(delta):
+    '''
+    Function to get the maximum difference between a datetime
+    and the time of the candle returned for it. The hourly and
+    daily candles can be shifted by 1 hour because of the DST,
+    the minute candles must match exactly
+
+    Parameters
+    ----------
+    delta : timedelta, Required
+            Duration of a candle
+
+    Returns
+    -------
+    datetime timedelta object
+    '''
+    if delta < timedelta(hours=1):
+        return timedelta(0)
+    return timedelta(hours=1)
+
 def get_ixfromdatetimes_list(datetimes_list, d):
     '''
     Function to get the index of the element that is closest
-    to the passed datetime
+    to the passed datetime. The list does not need to be sorted.
+    For repeated lookups on a sorted list, use candle_access.TimeIndex
 
     Parameters
     ----------
@@ -185,14 +176,16 @@ def correct_timeframe(settings, timeframe):
     Parameters
     ----------
     settings: ConfigParser object
-    timeframe : D,H12,H8,4
+    timeframe : D,H12,H8,H4,H1,M30,M15
 
     Returns
     -------
-    settings : ConfigParser object timeframe corrected
+    settings : ConfigParser object timeframe corrected. The
+               pips settings greater than 0 are at least 1
     """
-    timeframe = int(timeframe.replace('H', ''))
-    ratio = round(timeframe/24, 2)
+    ratio = periodToDelta(1, timeframe) / timedelta(hours=24)
+    if not timeframe.startswith('M'):
+        ratio = round(ratio, 2)
 
     p = re.compile('.*pips')
 
@@ -202,6 +195,10 @@ def correct_timeframe(settings, timeframe):
                 continue
             if p.match(key):
                 new_pips = int(round(ratio*int(value), 0))
+                if int(value) > 0:
+                    # the areas collapse with 0 pips in the
+                    # minute timeframes
+                    new_pips = max(new_pips, 1)
                 settings.set(section_name, key, str(new_pips))
 
     return settings